@@ -14,6 +14,9 @@ from comfyui_jh_xmp_metadata_nodes.jh_get_widget_value_nodes import (
 from comfyui_jh_xmp_metadata_nodes.jh_load_image_with_xmp_metadata_node import (
     JHLoadImageWithXMPMetadataNode,
 )
+from comfyui_jh_xmp_metadata_nodes.jh_load_images_with_xmp_metadata_batch_node import (
+    JHLoadImagesWithXMPMetadataBatchNode,
+)
 from comfyui_jh_xmp_metadata_nodes.jh_path_to_stem_node import JHPathToStemNode
 from comfyui_jh_xmp_metadata_nodes.jh_save_image_with_xmp_metadata_node import (
     JHSaveImageWithXMPMetadataNode,
@@ -24,6 +27,7 @@ NODE_CLASS_MAPPINGS: dict[str, Any] = {
     "JHPathToStemNode": JHPathToStemNode,
     "JHSaveImageWithXMPMetadata": JHSaveImageWithXMPMetadataNode,
     "JHLoadImageWithXMPMetadataNode": JHLoadImageWithXMPMetadataNode,
+    "JHLoadImagesWithXMPMetadataBatchNode": JHLoadImagesWithXMPMetadataBatchNode,
     "JHGetWidgetValueStringNode": JHGetWidgetValueStringNode,
     "JHGetWidgetValueIntNode": JHGetWidgetValueIntNode,
     "JHGetWidgetValueFloatNode": JHGetWidgetValueFloatNode,
@@ -34,6 +38,7 @@ NODE_DISPLAY_NAME_MAPPINGS: dict[str, str] = {
     "JHPathToStemNode": "Path to Stem",
     "JHSaveImageWithXMPMetadata": "Save Image With XMP Metadata",
     "JHLoadImageWithXMPMetadataNode": "Load Image With XMP Metadata",
+    "JHLoadImagesWithXMPMetadataBatchNode": "Load Images With XMP Metadata (Batch)",
     "JHGetWidgetValueStringNode": "Get Widget Value (String)",
     "JHGetWidgetValueIntNode": "Get Widget Value (Integer)",
     "JHGetWidgetValueFloatNode": "Get Widget Value (Float)",
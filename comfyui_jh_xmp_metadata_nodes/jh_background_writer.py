@@ -0,0 +1,162 @@
+import atexit
+import threading
+import weakref
+from collections.abc import Callable
+from concurrent.futures import ThreadPoolExecutor
+
+
+class JHBackgroundWriter:
+    """
+    A bounded queue of write jobs that run on background threads.
+
+    `submit` returns as soon as a job has been queued, so the caller can get
+    on with other work while images are still being compressed and written.
+    To keep memory in check, `submit` blocks while too many images, or too
+    many bytes, are still waiting to be written.
+
+    A failed job doesn't raise anywhere on its own. Its exception is kept
+    and raised by the next call to `submit`, `flush` or `raise_errors`.
+    Every writer that is still open when the interpreter exits is flushed,
+    so queued writes aren't lost on shutdown.
+
+    Example:
+        writer = JHBackgroundWriter(max_pending_images=8)
+        writer.submit(lambda: image.save(path), size=image_size)
+        ...
+        writer.flush()  # Wait for everything and raise any errors
+    """
+
+    def __init__(
+        self,
+        max_workers: int = 1,
+        max_pending_images: int = 16,
+        max_pending_bytes: int = 1 << 30,
+    ) -> None:
+        if max_workers < 1:
+            raise ValueError("max_workers must be at least 1")
+        if max_pending_images < 1:
+            raise ValueError("max_pending_images must be at least 1")
+        if max_pending_bytes < 1:
+            raise ValueError("max_pending_bytes must be at least 1")
+
+        self.max_workers: int = max_workers
+        self.max_pending_images: int = max_pending_images
+        self.max_pending_bytes: int = max_pending_bytes
+
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_workers, thread_name_prefix="JHBackgroundWriter"
+        )
+        self._condition = threading.Condition()
+        self._pending_images: int = 0
+        self._pending_bytes: int = 0
+        self._errors: list[BaseException] = []
+        self._closed: bool = False
+
+        _open_writers.add(self)
+
+    @property
+    def pending_images(self) -> int:
+        with self._condition:
+            return self._pending_images
+
+    @property
+    def pending_bytes(self) -> int:
+        with self._condition:
+            return self._pending_bytes
+
+    def submit(self, job: Callable[[], None], size: int = 0) -> None:
+        """
+        Queues `job` to run on a background thread.
+
+        `size` is roughly how many bytes the job holds on to until it has
+        run, and counts against `max_pending_bytes`. A job that is larger
+        than `max_pending_bytes` on its own is still accepted, but only
+        once the queue is empty.
+
+        Raises:
+            RuntimeError: If the writer has been closed, or if an earlier
+                job failed. The original exception is chained as the cause.
+        """
+        self.raise_errors()
+        with self._condition:
+            if self._closed:
+                raise RuntimeError("Can't submit to a closed background writer")
+            self._condition.wait_for(lambda: self._has_room_for(size))
+            self._pending_images += 1
+            self._pending_bytes += size
+        self._executor.submit(self._run, job, size)
+
+    def _has_room_for(self, size: int) -> bool:
+        if self._pending_images == 0:
+            return True
+        return (
+            self._pending_images < self.max_pending_images
+            and self._pending_bytes + size <= self.max_pending_bytes
+        )
+
+    def _run(self, job: Callable[[], None], size: int) -> None:
+        try:
+            job()
+        except BaseException as e:
+            with self._condition:
+                self._errors.append(e)
+        finally:
+            with self._condition:
+                self._pending_images -= 1
+                self._pending_bytes -= size
+                self._condition.notify_all()
+
+    def raise_errors(self) -> None:
+        """
+        Raises the errors of any jobs that have failed since the last call.
+
+        Raises:
+            RuntimeError: If a job failed. The first failure is chained as
+                the cause.
+        """
+        with self._condition:
+            errors, self._errors = self._errors, []
+        if errors:
+            raise RuntimeError(
+                f"{len(errors)} background image write(s) failed: {errors[0]!r}"
+            ) from errors[0]
+
+    def flush(self, timeout: float | None = None) -> bool:
+        """
+        Waits for every queued job to finish, then raises any errors.
+
+        Returns False if `timeout` ran out first, otherwise True.
+        """
+        with self._condition:
+            done: bool = self._condition.wait_for(
+                lambda: self._pending_images == 0, timeout
+            )
+        self.raise_errors()
+        return done
+
+    def close(self) -> None:
+        """
+        Stops accepting jobs, waits for the queued ones to finish and shuts
+        down the worker threads. Any errors are raised as for `flush`.
+        """
+        with self._condition:
+            self._closed = True
+        _open_writers.discard(self)
+        self._executor.shutdown(wait=True)
+        self.raise_errors()
+
+
+_open_writers: "weakref.WeakSet[JHBackgroundWriter]" = weakref.WeakSet()
+
+
+@atexit.register
+def _close_open_writers() -> None:
+    # Close every writer even if one of them has failed writes to report
+    first_error: RuntimeError | None = None
+    for writer in list(_open_writers):
+        try:
+            writer.close()
+        except RuntimeError as e:
+            first_error = first_error or e
+    if first_error is not None:
+        raise first_error
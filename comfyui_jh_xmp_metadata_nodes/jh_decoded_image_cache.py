@@ -0,0 +1,103 @@
+import threading
+from collections import OrderedDict
+from collections.abc import Hashable
+from typing import Generic, NamedTuple, TypeVar
+
+V = TypeVar("V")
+
+
+class JHDecodedImageCacheInfo(NamedTuple):
+    hits: int
+    misses: int
+    evictions: int
+    max_bytes: int
+    current_bytes: int
+    entries: int
+
+
+class JHDecodedImageCache(Generic[V]):
+    """
+    A least-recently-used cache bounded by the total size of its values,
+    rather than by how many of them there are.
+
+    Every value is stored along with its size in bytes. Storing a value
+    evicts the least recently used ones until everything fits in
+    `max_bytes`. A value larger than `max_bytes` on its own isn't stored at
+    all, and a `max_bytes` of 0 turns the cache off.
+
+    Values are handed out as they are, not copied, so they mustn't be
+    modified. The cache is safe to use from several threads.
+
+    Example:
+        cache = JHDecodedImageCache(max_bytes=1 << 30)
+        result = cache.get(key)
+        if result is None:
+            result = decode(path)
+            cache.put(key, result, size=result.nbytes)
+    """
+
+    def __init__(self, max_bytes: int) -> None:
+        if max_bytes < 0:
+            raise ValueError("max_bytes must not be negative")
+        self.max_bytes: int = max_bytes
+
+        self._lock = threading.Lock()
+        self._entries: OrderedDict[Hashable, tuple[V, int]] = OrderedDict()
+        self._current_bytes: int = 0
+        self._hits: int = 0
+        self._misses: int = 0
+        self._evictions: int = 0
+
+    def get(self, key: Hashable) -> V | None:
+        """
+        Returns the value stored under `key` and marks it as the most
+        recently used, or returns None if there isn't one.
+        """
+        with self._lock:
+            entry: tuple[V, int] | None = self._entries.get(key)
+            if entry is None:
+                self._misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self._hits += 1
+            return entry[0]
+
+    def put(self, key: Hashable, value: V, size: int) -> None:
+        """
+        Stores `value`, which takes up `size` bytes, under `key`, evicting
+        least recently used values to make room for it.
+        """
+        with self._lock:
+            old_entry: tuple[V, int] | None = self._entries.pop(key, None)
+            if old_entry is not None:
+                self._current_bytes -= old_entry[1]
+            if size > self.max_bytes:
+                return
+            while self._current_bytes + size > self.max_bytes:
+                _, (_, evicted_size) = self._entries.popitem(last=False)
+                self._current_bytes -= evicted_size
+                self._evictions += 1
+            self._entries[key] = (value, size)
+            self._current_bytes += size
+
+    def cache_info(self) -> JHDecodedImageCacheInfo:
+        with self._lock:
+            return JHDecodedImageCacheInfo(
+                self._hits,
+                self._misses,
+                self._evictions,
+                self.max_bytes,
+                self._current_bytes,
+                len(self._entries),
+            )
+
+    def cache_clear(self) -> None:
+        """
+        Removes every value and resets the statistics.
+        """
+        with self._lock:
+            self._entries.clear()
+            self._current_bytes = 0
+            self._hits = 0
+            self._misses = 0
+            self._evictions = 0
@@ -0,0 +1,223 @@
+import hashlib
+import os
+import shutil
+import tempfile
+import threading
+import time
+from typing import Final, NamedTuple
+
+import numpy as np
+
+from .jh_decoded_image_cache import JHDecodedImageCacheInfo
+
+
+class JHDiskCacheEntry(NamedTuple):
+    image: np.ndarray
+    mask: np.ndarray
+    xml_string: str
+
+
+class JHDecodedTensorDiskCache:
+    """
+    Keeps decoded images on disk as raw `.npy` files, so they survive a
+    restart, and maps them back into memory instead of reading them.
+
+    Every entry is a directory holding the image and mask arrays and the
+    XMP packet, named after a hash of its key. An entry is written to a
+    temporary directory first and renamed into place with `os.replace`, so
+    a reader never sees one half-written, even if the process dies while
+    writing it. An entry that can't be read anyway is deleted and treated
+    as missing.
+
+    Reading an entry bumps its modification time, and after every write
+    the least recently used entries are deleted until the rest fit in
+    `max_bytes`.
+
+    Example:
+        cache = JHDecodedTensorDiskCache("/var/cache/jh-xmp", max_bytes=1 << 32)
+        entry = cache.get(key)
+        if entry is None:
+            entry = JHDiskCacheEntry(*decode(path))
+            cache.put(key, entry)
+        image = torch.from_numpy(entry.image)
+    """
+
+    IMAGE_FILE: Final = "image.npy"
+    MASK_FILE: Final = "mask.npy"
+    XMP_FILE: Final = "xmp.xml"
+    TEMPORARY_PREFIX: Final = ".tmp-"
+
+    # Temporary directories this old were left behind by a process that
+    # died while writing them, and are deleted by the next sweep
+    STALE_TEMPORARY_SECONDS: Final = 3600
+
+    def __init__(self, directory: str | os.PathLike, max_bytes: int) -> None:
+        if max_bytes < 0:
+            raise ValueError("max_bytes must not be negative")
+        self.directory: str = os.fspath(directory)
+        self.max_bytes: int = max_bytes
+        os.makedirs(self.directory, exist_ok=True)
+
+        self._lock = threading.Lock()
+        self._hits: int = 0
+        self._misses: int = 0
+        self._evictions: int = 0
+
+    def entry_path(self, key: tuple) -> str:
+        name: str = hashlib.sha256(repr(key).encode("utf-8")).hexdigest()
+        return os.path.join(self.directory, name)
+
+    def get(self, key: tuple) -> JHDiskCacheEntry | None:
+        """
+        Returns the entry stored under `key`, with its arrays mapped from
+        disk, or None if there isn't one.
+
+        The arrays are mapped copy-on-write, so writing to them changes
+        the copy in memory but never the file.
+        """
+        path: str = self.entry_path(key)
+        try:
+            entry = JHDiskCacheEntry(
+                np.load(os.path.join(path, self.IMAGE_FILE), mmap_mode="c"),
+                np.load(os.path.join(path, self.MASK_FILE), mmap_mode="c"),
+                self._read_text(os.path.join(path, self.XMP_FILE)),
+            )
+            os.utime(path)
+        except FileNotFoundError:
+            entry = None
+        except (OSError, ValueError, UnicodeDecodeError):
+            # Damaged by something other than this class, since entries are
+            # only ever renamed into place once they're complete
+            shutil.rmtree(path, ignore_errors=True)
+            entry = None
+
+        with self._lock:
+            if entry is None:
+                self._misses += 1
+            else:
+                self._hits += 1
+        return entry
+
+    def put(self, key: tuple, entry: JHDiskCacheEntry) -> None:
+        """
+        Stores `entry` under `key`, then evicts the least recently used
+        entries until the cache fits in `max_bytes` again.
+        """
+        size: int = entry.image.nbytes + entry.mask.nbytes
+        if size > self.max_bytes:
+            return
+
+        path: str = self.entry_path(key)
+        temporary_path: str = tempfile.mkdtemp(
+            prefix=self.TEMPORARY_PREFIX, dir=self.directory
+        )
+        try:
+            self._write_array(
+                os.path.join(temporary_path, self.IMAGE_FILE), entry.image
+            )
+            self._write_array(os.path.join(temporary_path, self.MASK_FILE), entry.mask)
+            with open(os.path.join(temporary_path, self.XMP_FILE), "wb") as f:
+                f.write(entry.xml_string.encode("utf-8"))
+                os.fsync(f.fileno())
+            # Whatever was stored under this key before is dropped; it can't
+            # be replaced directly, because directories aren't replaced
+            # unless they're empty
+            shutil.rmtree(path, ignore_errors=True)
+            try:
+                os.replace(temporary_path, path)
+            except OSError:
+                # Another process stored the same entry in the meantime
+                pass
+        finally:
+            shutil.rmtree(temporary_path, ignore_errors=True)
+
+        self.sweep()
+
+    def sweep(self) -> None:
+        """
+        Deletes the least recently used entries until the rest fit in
+        `max_bytes`, along with any stale temporary directories.
+        """
+        now: float = time.time()
+        entries: list[tuple[float, int, str]] = []
+        with os.scandir(self.directory) as scanned:
+            for dir_entry in scanned:
+                try:
+                    mtime: float = dir_entry.stat().st_mtime
+                    if dir_entry.name.startswith(self.TEMPORARY_PREFIX):
+                        if now - mtime > self.STALE_TEMPORARY_SECONDS:
+                            shutil.rmtree(dir_entry.path, ignore_errors=True)
+                        continue
+                    if dir_entry.is_dir(follow_symlinks=False):
+                        entries.append(
+                            (mtime, self._entry_size(dir_entry.path), dir_entry.path)
+                        )
+                except FileNotFoundError:
+                    continue  # Evicted by another process
+
+        entries.sort()
+        total_bytes: int = sum(size for _, size, _ in entries)
+        evictions: int = 0
+        for _, size, path in entries:
+            if total_bytes <= self.max_bytes:
+                break
+            shutil.rmtree(path, ignore_errors=True)
+            total_bytes -= size
+            evictions += 1
+
+        with self._lock:
+            self._evictions += evictions
+
+    def cache_info(self) -> JHDecodedImageCacheInfo:
+        current_bytes: int = 0
+        entries: int = 0
+        with os.scandir(self.directory) as scanned:
+            for dir_entry in scanned:
+                if not dir_entry.name.startswith(
+                    self.TEMPORARY_PREFIX
+                ) and dir_entry.is_dir(follow_symlinks=False):
+                    current_bytes += self._entry_size(dir_entry.path)
+                    entries += 1
+        with self._lock:
+            return JHDecodedImageCacheInfo(
+                self._hits,
+                self._misses,
+                self._evictions,
+                self.max_bytes,
+                current_bytes,
+                entries,
+            )
+
+    def cache_clear(self) -> None:
+        """
+        Deletes every entry and resets the statistics.
+        """
+        with os.scandir(self.directory) as scanned:
+            for dir_entry in scanned:
+                if dir_entry.is_dir(follow_symlinks=False):
+                    shutil.rmtree(dir_entry.path, ignore_errors=True)
+        with self._lock:
+            self._hits = 0
+            self._misses = 0
+            self._evictions = 0
+
+    def _entry_size(self, path: str) -> int:
+        # Only the .npy files count towards the cap; the XMP packet is too
+        # small to matter
+        size: int = 0
+        for name in (self.IMAGE_FILE, self.MASK_FILE):
+            try:
+                size += os.stat(os.path.join(path, name)).st_size
+            except FileNotFoundError:
+                pass
+        return size
+
+    def _write_array(self, path: str, array: np.ndarray) -> None:
+        with open(path, "wb") as f:
+            np.save(f, array, allow_pickle=False)
+            f.flush()
+            os.fsync(f.fileno())
+
+    def _read_text(self, path: str) -> str:
+        with open(path, "rb") as f:
+            return f.read().decode("utf-8")
@@ -0,0 +1,123 @@
+import functools
+import hashlib
+import logging
+import os
+import zlib
+from enum import StrEnum
+from typing import Final
+
+logger = logging.getLogger(__name__)
+
+
+class JHFingerprintAlgorithm(StrEnum):
+    """
+    The digests `JHFileFingerprint` can compute.
+
+    `SHA256` is what ComfyUI's own loaders use. `CRC32` is several times
+    faster and plenty to tell whether a file has changed, but it is not
+    collision resistant.
+    """
+
+    SHA256 = "sha256"
+    CRC32 = "crc32"
+
+    @classmethod
+    def from_environment(cls) -> "JHFingerprintAlgorithm":
+        """
+        Returns the algorithm named by `JH_XMP_FINGERPRINT`, regardless of
+        case, or `SHA256` (with a warning) if it names none.
+        """
+        value: str = os.environ.get("JH_XMP_FINGERPRINT", cls.SHA256).strip().lower()
+        try:
+            return cls(value)
+        except ValueError:
+            logger.warning(
+                "Unknown JH_XMP_FINGERPRINT %r, using %r instead",
+                value,
+                cls.SHA256.value,
+            )
+            return cls.SHA256
+
+
+class JHFileFingerprint:
+    """
+    Computes content digests of files, remembering them for files that
+    haven't changed since.
+
+    A digest is cached against the file's path, inode, size and
+    modification time (in nanoseconds), so checking an unchanged file costs
+    a single `os.stat`. A file rewritten in place with the same size within
+    the filesystem's timestamp resolution can't be told apart from the
+    original; this is the same trade-off `make` and `rsync` make.
+
+    Files are hashed in fixed-size chunks, so memory use doesn't grow with
+    the size of the file.
+    """
+
+    CHUNK_SIZE: Final = 1 << 20
+    CACHE_SIZE: Final = 4096
+
+    @classmethod
+    def fingerprint(
+        cls,
+        path: str | os.PathLike,
+        algorithm: JHFingerprintAlgorithm = JHFingerprintAlgorithm.SHA256,
+    ) -> str:
+        """
+        Returns the hex digest of the file at `path`, from the cache if the
+        file hasn't changed since it was last hashed.
+
+        Raises:
+            OSError: If the file can't be stat'ed or read.
+        """
+        path = os.fspath(path)
+        stat_result: os.stat_result = os.stat(path)
+        return cls._cached_digest(
+            path,
+            stat_result.st_ino,
+            stat_result.st_size,
+            stat_result.st_mtime_ns,
+            JHFingerprintAlgorithm(algorithm),
+        )
+
+    @classmethod
+    @functools.lru_cache(maxsize=CACHE_SIZE)
+    def _cached_digest(
+        cls,
+        path: str,
+        inode: int,
+        size: int,
+        mtime_ns: int,
+        algorithm: JHFingerprintAlgorithm,
+    ) -> str:
+        # The stat fields are only here to be part of the cache key
+        return cls.digest(path, algorithm)
+
+    @classmethod
+    def digest(
+        cls,
+        path: str | os.PathLike,
+        algorithm: JHFingerprintAlgorithm = JHFingerprintAlgorithm.SHA256,
+    ) -> str:
+        """
+        Returns the hex digest of the file at `path`, bypassing the cache.
+        """
+        with open(path, "rb") as f:
+            match JHFingerprintAlgorithm(algorithm):
+                case JHFingerprintAlgorithm.SHA256:
+                    return hashlib.file_digest(f, "sha256").hexdigest()
+                case JHFingerprintAlgorithm.CRC32:
+                    crc: int = 0
+                    buffer = bytearray(cls.CHUNK_SIZE)
+                    view = memoryview(buffer)
+                    while size := f.readinto(buffer):
+                        crc = zlib.crc32(view[:size], crc)
+                    return f"{crc:08x}"
+
+    @classmethod
+    def cache_info(cls) -> functools._CacheInfo:
+        return cls._cached_digest.cache_info()
+
+    @classmethod
+    def cache_clear(cls) -> None:
+        cls._cached_digest.cache_clear()
@@ -1,3 +1,4 @@
+import functools
 import textwrap
 from typing import Final
 
@@ -20,6 +21,7 @@ class JHFormatMetadataNode:
     ).strip()
 
     @classmethod
+    @functools.cache
     def INPUT_TYPES(cls) -> jh_types.JHInputTypesType:
         # fmt: off
         return {
@@ -1,3 +1,4 @@
+import functools
 from typing import Any
 
 from comfyui_jh_xmp_metadata_nodes import jh_types
@@ -5,6 +6,7 @@ from comfyui_jh_xmp_metadata_nodes import jh_types
 
 class JHGetWidgetValueNode:
     @classmethod
+    @functools.cache
     def INPUT_TYPES(cls) -> jh_types.JHInputTypesType:
         # fmt: off
         return {
@@ -1,23 +1,88 @@
-import hashlib
+import functools
+import logging
+import math
 import os
-from typing import NamedTuple
+import tempfile
+import threading
+import time
+from collections import deque
+from collections.abc import Iterable, Iterator
+from concurrent.futures import Future, ThreadPoolExecutor
+from enum import StrEnum
+from typing import ClassVar, Final, NamedTuple
 from unittest.mock import MagicMock
 
 import numpy as np
 import PIL.Image
 import PIL.ImageOps
-import PIL.ImageSequence
 import torch
 
 from comfyui_jh_xmp_metadata_nodes import jh_types
 
+from .jh_decoded_image_cache import JHDecodedImageCache
+from .jh_decoded_tensor_disk_cache import JHDecodedTensorDiskCache, JHDiskCacheEntry
+from .jh_file_fingerprint import JHFileFingerprint, JHFingerprintAlgorithm
 from .jh_xmp_metadata import JHXMPMetadata
+from .jh_xmp_packet_scanner import JHXMPPacketScanner
 
 try:
     import folder_paths  # pyright: ignore[reportMissingImports]
 except ImportError:
     folder_paths = MagicMock()
 
+logger = logging.getLogger(__name__)
+
+
+def _megabytes_from_environment(name: str, default: int) -> int:
+    """
+    Returns the number of megabytes in the environment variable `name`, in
+    bytes, or `default` megabytes (with a warning) if it doesn't hold a
+    whole number that isn't negative.
+    """
+    value: str = os.environ.get(name, str(default)).strip()
+    try:
+        megabytes: int = int(value)
+    except ValueError:
+        megabytes = -1
+    if megabytes < 0:
+        logger.warning("Invalid %s %r, using %r instead", name, value, default)
+        megabytes = default
+    return megabytes << 20
+
+
+class JHOutputDType(StrEnum):
+    """
+    The element types the load node can produce its IMAGE and MASK in.
+
+    `FLOAT32` is what every ComfyUI node expects. `FLOAT16` halves the
+    memory at the cost of precision. `UINT8` takes a quarter of the memory
+    and keeps values in [0, 255] instead of [0, 1], so it is only for
+    nodes that know to expect it.
+    """
+
+    FLOAT32 = "float32"
+    FLOAT16 = "float16"
+    UINT8 = "uint8"
+
+    @property
+    def torch_dtype(self) -> torch.dtype:
+        return getattr(torch, self.value)
+
+
+class JHOverBudgetPolicy(StrEnum):
+    """
+    What the load node does when IMAGE and MASK would need more memory than
+    its `memory_budget_mb`.
+
+    `ERROR` refuses to load the image. `DOWNSCALE` lowers `max_dimension`
+    until they fit. `DISK` keeps them in a temporary file mapped into
+    memory instead of in RAM, so the operating system can page them out.
+    """
+
+    ERROR = "error"
+    DOWNSCALE = "downscale"
+    DISK = "disk"
+
 
 class JHLoadImageWithXMPMetadataResultTuple(NamedTuple):
     IMAGE: torch.Tensor
@@ -35,30 +100,250 @@ class JHLoadImageWithXMPMetadataResultTuple(NamedTuple):
 
 
 class JHLoadImageWithXMPMetadataNode:
+    # Whether the image list includes files in subfolders of the input
+    # directory, and which file extensions it includes (None for all of
+    # them). Set JH_XMP_INPUT_RECURSIVE=1 and, for example,
+    # JH_XMP_INPUT_EXTENSIONS=.png,.jpg,.jpeg,.webp to change them.
+    input_recursive: bool = os.environ.get("JH_XMP_INPUT_RECURSIVE", "0") == "1"
+    input_extensions: frozenset[str] | None = (
+        frozenset(
+            extension.strip().lower()
+            for extension in os.environ["JH_XMP_INPUT_EXTENSIONS"].split(",")
+            if extension.strip()
+        )
+        if os.environ.get("JH_XMP_INPUT_EXTENSIONS")
+        else None
+    )
+
+    # Listing a directory with a lot of files in it can take seconds, and
+    # ComfyUI calls INPUT_TYPES on every /object_info request. So listings
+    # are cached along with the mtime of every directory they came from.
+    # Adding, removing or renaming a file changes its directory's mtime.
+    _image_files_cache: ClassVar[
+        dict[tuple[str, bool, frozenset[str] | None], tuple[dict[str, int], list[str]]]
+    ] = {}
+
+    # A directory modified less than this long before it was listed might
+    # be modified again without its mtime changing (on filesystems with
+    # coarse timestamps), so such listings aren't cached.
+    _RACY_MTIME_NS: Final = 2_000_000_000
+
     @classmethod
     def INPUT_TYPES(cls) -> jh_types.JHInputTypesType:
+        # Only the list of files changes from one call to the next
+        input_types: jh_types.JHInputTypesType = cls._static_input_types()
+        _, image_options = input_types["required"]["image"]
+        return {
+            **input_types,
+            "required": {
+                **input_types["required"],
+                "image": (cls.get_image_files(), image_options),
+            },
+        }
+
+    @classmethod
+    @functools.cache
+    def get_disk_cache(cls) -> JHDecodedTensorDiskCache | None:
+        """
+        Returns the cache that keeps decoded images on disk, so they survive
+        a restart of ComfyUI, or None if it's turned off. Set
+        JH_XMP_DISK_CACHE_DIR to a directory to turn it on, and
+        JH_XMP_DISK_CACHE_MB to change how much it may hold.
+
+        The cache is created the first time it's needed rather than on
+        import. If its directory can't be created, it stays off.
+        """
+        directory: str = os.environ.get("JH_XMP_DISK_CACHE_DIR", "")
+        if not directory:
+            return None
+        try:
+            return JHDecodedTensorDiskCache(
+                directory,
+                max_bytes=_megabytes_from_environment("JH_XMP_DISK_CACHE_MB", 4096),
+            )
+        except OSError as e:
+            logger.warning(
+                "Can't use JH_XMP_DISK_CACHE_DIR %r, so the disk cache is off: %s",
+                directory,
+                e,
+            )
+            return None
+
+    @classmethod
+    @functools.cache
+    def _static_input_types(cls) -> jh_types.JHInputTypesType:
         # fmt: off
         return {
             "required": {
                 "image": (
-                    cls.get_image_files(),
+                    [],
                     {
                         "image_upload": True
                     }
                 )
             },
+            "optional": {
+                "metadata_only": (
+                    jh_types.JHNodeInputOutputTypeEnum.BOOLEAN,
+                    {
+                        "default": False,
+                        "tooltip": "Only read the XMP metadata and skip decoding the pixels, which is much faster. IMAGE and MASK are then blank 64x64 placeholders.",  # noqa: E501
+                    },
+                ),
+                "output_dtype": (
+                    [x for x in JHOutputDType],
+                    {
+                        "default": JHOutputDType.FLOAT32,
+                        "tooltip": "The precision of IMAGE and MASK. float16 halves their memory. uint8 quarters it but holds values from 0 to 255, which most nodes don't expect.",  # noqa: E501
+                    },
+                ),
+                "max_dimension": (
+                    jh_types.JHNodeInputOutputTypeEnum.INT,
+                    {
+                        "default": 0,
+                        "min": 0,
+                        "max": 16384,
+                        "tooltip": "Downscale the image while it's decoded so neither side is longer than this, keeping the aspect ratio. JPEGs are decoded at reduced size to begin with. 0 loads the image at full size.",  # noqa: E501
+                    },
+                ),
+                "start_frame": (
+                    jh_types.JHNodeInputOutputTypeEnum.INT,
+                    {
+                        "default": 0,
+                        "min": 0,
+                        "max": 0xFFFFFFFF,
+                        "tooltip": "The first frame of an animation or multi-page image to load, counting from 0.",  # noqa: E501
+                    },
+                ),
+                "frame_stride": (
+                    jh_types.JHNodeInputOutputTypeEnum.INT,
+                    {
+                        "default": 1,
+                        "min": 1,
+                        "max": 0xFFFFFFFF,
+                        "tooltip": "Load every nth frame from start_frame on. 1 loads every frame.",  # noqa: E501
+                    },
+                ),
+                "max_frames": (
+                    jh_types.JHNodeInputOutputTypeEnum.INT,
+                    {
+                        "default": 0,
+                        "min": 0,
+                        "max": 0xFFFFFFFF,
+                        "tooltip": "The most frames to load. 0 loads every selected frame.",  # noqa: E501
+                    },
+                ),
+                "decode_workers": (
+                    jh_types.JHNodeInputOutputTypeEnum.INT,
+                    {
+                        "default": 1,
+                        "min": 1,
+                        "max": 64,
+                        "tooltip": "How many frames of an animation or multi-page image to decode and convert at the same time. TIFF pages are decoded fully in parallel; the frames of other formats are decoded in order and only converted in parallel.",  # noqa: E501
+                    },
+                ),
+                "memory_budget_mb": (
+                    jh_types.JHNodeInputOutputTypeEnum.INT,
+                    {
+                        "default": 0,
+                        "min": 0,
+                        "max": 0xFFFFFFFF,
+                        "tooltip": "The most memory IMAGE and MASK may take up, in megabytes. over_budget decides what happens to images that need more. 0 means no limit.",  # noqa: E501
+                    },
+                ),
+                "over_budget": (
+                    [x for x in JHOverBudgetPolicy],
+                    {
+                        "default": JHOverBudgetPolicy.ERROR,
+                        "tooltip": "What to do when an image needs more than memory_budget_mb. error refuses to load it, downscale lowers max_dimension until it fits, and disk keeps it in a temporary file instead of RAM.",  # noqa: E501
+                    },
+                ),
+            },
         }
         # fmt: on
 
     @classmethod
-    def get_image_files(cls) -> list[str]:
+    def get_image_files(
+        cls,
+        recursive: bool | None = None,
+        extensions: Iterable[str] | None = None,
+    ) -> list[str]:
+        """
+        Returns the sorted names of the files in the input directory.
+
+        With `recursive`, files in subfolders are included too, named by
+        their path relative to the input directory with "/" separators.
+        With `extensions`, only files whose extension (compared without
+        regard to case) is one of them are included. Both default to the
+        class's `input_recursive` and `input_extensions` settings.
+        """
         input_dir: str = folder_paths.get_input_directory()
-        files: list[str] = [
-            f
-            for f in os.listdir(input_dir)
-            if os.path.isfile(os.path.join(input_dir, f))
-        ]
-        return sorted(files)
+        if recursive is None:
+            recursive = cls.input_recursive
+        if extensions is None:
+            extensions = cls.input_extensions
+        if extensions is not None:
+            extensions = frozenset(extension.lower() for extension in extensions)
+
+        cache_key = (input_dir, recursive, extensions)
+        cached = cls._image_files_cache.get(cache_key)
+        if cached is not None and cls._mtimes_unchanged(cached[0]):
+            return list(cached[1])
+
+        listed_at_ns: int = time.time_ns()
+        directory_mtimes: dict[str, int] = {}
+        files: list[str] = sorted(
+            cls._scan_directory(input_dir, "", recursive, extensions, directory_mtimes)
+        )
+
+        if all(
+            listed_at_ns - mtime_ns > cls._RACY_MTIME_NS
+            for mtime_ns in directory_mtimes.values()
+        ):
+            cls._image_files_cache[cache_key] = (directory_mtimes, files)
+        else:
+            cls._image_files_cache.pop(cache_key, None)
+        return list(files)
+
+    @classmethod
+    def _scan_directory(
+        cls,
+        directory: str,
+        prefix: str,
+        recursive: bool,
+        extensions: frozenset[str] | None,
+        directory_mtimes: dict[str, int],
+    ) -> Iterator[str]:
+        # os.scandir gets each entry's type along with its name, so unlike
+        # os.path.isfile this doesn't need a stat call per file (except for
+        # symlinks, which are followed).
+        with os.scandir(directory) as entries:
+            directory_mtimes[directory] = os.stat(directory).st_mtime_ns
+            for entry in entries:
+                if entry.is_file():
+                    if (
+                        extensions is None
+                        or os.path.splitext(entry.name)[1].lower() in extensions
+                    ):
+                        yield prefix + entry.name
+                elif recursive and entry.is_dir(follow_symlinks=False):
+                    yield from cls._scan_directory(
+                        entry.path,
+                        f"{prefix}{entry.name}/",
+                        recursive,
+                        extensions,
+                        directory_mtimes,
+                    )
+
+    @classmethod
+    def _mtimes_unchanged(cls, directory_mtimes: dict[str, int]) -> bool:
+        try:
+            return all(
+                os.stat(directory).st_mtime_ns == mtime_ns
+                for directory, mtime_ns in directory_mtimes.items()
+            )
+        except OSError:
+            return False
 
     RETURN_TYPES = (
         jh_types.JHNodeInputOutputTypeEnum.IMAGE,
@@ -88,15 +373,161 @@ class JHLoadImageWithXMPMetadataNode:
         "ext_description",
         "xml_string",
     )
+    TIFF_BITS_PER_SAMPLE: Final = 258
+
+    # Formats whose frames can be decoded independently of each other, and
+    # so by several threads at once, each with a file handle of its own
+    INDEPENDENT_FRAME_FORMATS: Final = frozenset({"TIFF"})
+
+    # How much larger than the target size a frame is still allowed to be
+    # before it's resampled, when scaling down to `max_dimension`. Pillow's
+    # own thumbnail() uses the same value.
+    REDUCING_GAP: Final = 2.0
+
+    # Formats whose XMP packet Pillow puts in `info["xmp"]`. For anything
+    # else we fall back to scanning the file's bytes for the packet.
+    PILLOW_XMP_FORMATS = frozenset({"JPEG", "MPO", "PNG", "TIFF", "WEBP"})
+
+    # The digest IS_CHANGED uses to tell whether the image file has changed.
+    # Set JH_XMP_FINGERPRINT=crc32 for a faster, non-cryptographic one.
+    fingerprint_algorithm: JHFingerprintAlgorithm = (
+        JHFingerprintAlgorithm.from_environment()
+    )
+
+    # Decoded images are kept across prompts, so that an image reused by a
+    # lot of queued prompts is only decoded once. The cache is shared by
+    # every instance of the node. Set JH_XMP_DECODED_CACHE_MB to change its
+    # size, or to 0 to turn it off.
+    decoded_cache: ClassVar[
+        JHDecodedImageCache["JHLoadImageWithXMPMetadataResultTuple"]
+    ] = JHDecodedImageCache(
+        max_bytes=_megabytes_from_environment("JH_XMP_DECODED_CACHE_MB", 512)
+    )
+
     FUNCTION = "load_image"
     CATEGORY = "XMP Metadata Nodes"
     OUTPUT_NODE = False
 
-    def load_image(self, image: str) -> JHLoadImageWithXMPMetadataResultTuple:
+    def load_image(
+        self,
+        image: str,
+        metadata_only: bool = False,
+        output_dtype: JHOutputDType = JHOutputDType.FLOAT32,
+        max_dimension: int = 0,
+        start_frame: int = 0,
+        frame_stride: int = 1,
+        max_frames: int = 0,
+        decode_workers: int = 1,
+        memory_budget_mb: int = 0,
+        over_budget: JHOverBudgetPolicy = JHOverBudgetPolicy.ERROR,
+    ) -> JHLoadImageWithXMPMetadataResultTuple:
         # `image` here is a string, the name of the image file on disk;
         # just the filename, not the full path.
         image_path = folder_paths.get_annotated_filepath(image)
+        dtype: torch.dtype = JHOutputDType(output_dtype).torch_dtype
+
+        if metadata_only:
+            return self._load_metadata_only(image_path, dtype)
+
+        # The decoded image is cached against the file's stat info, just
+        # like its fingerprint, and against every input that changes it
+        stat_result: os.stat_result = os.stat(image_path)
+        decode_options: tuple[
+            torch.dtype, int, int, int, int, int, JHOverBudgetPolicy
+        ] = (
+            dtype,
+            max_dimension,
+            start_frame,
+            frame_stride,
+            max_frames,
+            memory_budget_mb,
+            JHOverBudgetPolicy(over_budget),
+        )
+        cache_key: tuple = (
+            image_path,
+            stat_result.st_ino,
+            stat_result.st_size,
+            stat_result.st_mtime_ns,
+            *decode_options,
+        )
+        result: JHLoadImageWithXMPMetadataResultTuple | None = self.decoded_cache.get(
+            cache_key
+        )
+        if result is None:
+            disk_cache: JHDecodedTensorDiskCache | None = self.get_disk_cache()
+            if disk_cache is None:
+                result = self._decode_image(image_path, *decode_options, decode_workers)
+            else:
+                result = self._decode_image_through_disk_cache(
+                    disk_cache,
+                    image_path,
+                    stat_result.st_size,
+                    decode_options,
+                    decode_workers,
+                )
+            self.decoded_cache.put(
+                cache_key,
+                result,
+                size=result.IMAGE.untyped_storage().nbytes()
+                + result.MASK.untyped_storage().nbytes(),
+            )
+        return result
 
+    def _decode_image_through_disk_cache(
+        self,
+        disk_cache: JHDecodedTensorDiskCache,
+        image_path: str,
+        file_size: int,
+        decode_options: tuple[torch.dtype, int, int, int, int, int, JHOverBudgetPolicy],
+        decode_workers: int,
+    ) -> JHLoadImageWithXMPMetadataResultTuple:
+        # Unlike the in-memory cache, the disk cache has to outlive the
+        # inode and mtime of the file, so it's keyed by the file's content.
+        # Entries outlive a change of JH_XMP_FINGERPRINT too, and a CRC32
+        # collision would hand out another image's pixels, so the key always
+        # uses SHA-256, whichever digest IS_CHANGED uses.
+        disk_cache_key: tuple = (
+            JHFileFingerprint.fingerprint(image_path, JHFingerprintAlgorithm.SHA256),
+            file_size,
+            *decode_options,
+        )
+        entry: JHDiskCacheEntry | None = disk_cache.get(disk_cache_key)
+        if entry is not None:
+            xml_string: str = entry.xml_string
+            xmp_metadata = JHXMPMetadata()
+            if xml_string:  # Can't parse an empty string
+                xmp_metadata = JHXMPMetadata.from_string(xml_string)
+            # These share their memory with the mapped files, without a copy
+            return self._result_tuple(
+                torch.from_numpy(entry.image),
+                torch.from_numpy(entry.mask),
+                xml_string,
+                xmp_metadata,
+            )
+
+        result: JHLoadImageWithXMPMetadataResultTuple = self._decode_image(
+            image_path, *decode_options, decode_workers
+        )
+        disk_cache.put(
+            disk_cache_key,
+            JHDiskCacheEntry(
+                result.IMAGE.numpy(), result.MASK.numpy(), result.xml_string
+            ),
+        )
+        return result
+
+    def _decode_image(
+        self,
+        image_path: str,
+        dtype: torch.dtype,
+        max_dimension: int,
+        start_frame: int,
+        frame_stride: int,
+        max_frames: int,
+        memory_budget_mb: int,
+        over_budget: JHOverBudgetPolicy,
+        decode_workers: int,
+    ) -> JHLoadImageWithXMPMetadataResultTuple:
         # This call to PIL.Image.open can raise a variety of exceptions
         # depending on the image format and the state of the file. We
         # deliberately don't catch these exceptions but instead let them
@@ -106,47 +537,402 @@ class JHLoadImageWithXMPMetadataNode:
         # https://pillow.readthedocs.io/en/stable/reference/Image.html#PIL.Image.open
         image_object = PIL.Image.open(image_path)
 
-        first_frame: PIL.Image.Image | None = None
-        output_images = []
-        output_masks = []
-
+        # MPO files hold a second view (or a preview) after the main image,
+        # which we don't want, so only their first frame is loaded.
         excluded_formats = ["MPO"]
+        total_frames: int = (
+            1
+            if image_object.format in excluded_formats
+            else getattr(image_object, "n_frames", 1)
+        )
+        frame_indices: range = self._frame_indices(
+            total_frames, start_frame, frame_stride, max_frames
+        )
+        if not frame_indices:
+            raise ValueError(
+                f"start_frame is {start_frame}, but the image only has "
+                f"{total_frames} frame(s)"
+            )
+        frame_count: int = len(frame_indices)
 
-        xml_string: str = str()
-        xmp_metadata = JHXMPMetadata()
+        spill_to_disk: bool = False
+        if memory_budget_mb > 0:
+            max_dimension, spill_to_disk = self._apply_memory_budget(
+                image_object.size,
+                frame_count,
+                dtype,
+                max_dimension,
+                memory_budget_mb,
+                over_budget,
+            )
+
+        # JPEGs can be decoded at 1/2, 1/4 or 1/8 scale in the DCT domain,
+        # which is much faster than decoding at full size and scaling down.
+        # draft() picks the smallest scale that's still at least as large as
+        # the requested size, and does nothing for other formats.
+        reduced_size = self._reduced_size(image_object.size, max_dimension)
+        if reduced_size is not None:
+            image_object.draft(image_object.mode, reduced_size)
+
+        # The metadata belongs to the file, so it's read from the first
+        # frame whichever frames are loaded
+        xml_string, xmp_metadata = self.read_xmp(
+            image_object, image_path, image_object.format
+        )
+
+        if decode_workers > 1 and frame_count > 2:
+            with ThreadPoolExecutor(
+                max_workers=decode_workers,
+                thread_name_prefix="JHLoadImageWithXMPMetadata",
+            ) as executor:
+                output_image, output_mask, loaded_frames = self._load_frames(
+                    image_object,
+                    image_path,
+                    frame_indices,
+                    dtype,
+                    max_dimension,
+                    executor,
+                    max_pending=2 * decode_workers,
+                    spill_to_disk=spill_to_disk,
+                )
+        else:
+            output_image, output_mask, loaded_frames = self._load_frames(
+                image_object,
+                image_path,
+                frame_indices,
+                dtype,
+                max_dimension,
+                spill_to_disk=spill_to_disk,
+            )
 
-        for raw_frame in PIL.ImageSequence.Iterator(image_object):
-            if first_frame is None:
-                first_frame = raw_frame.copy()
-
-            # Extract XMP metadata from the first frame, if available
-            if len(output_images) == 0:
-                xmp_data: bytes | str | None = raw_frame.info.get("xmp", None)
-                if isinstance(xmp_data, bytes):
-                    xml_string = xmp_data.decode("utf-8")
-                if xml_string:  # Can't parse None or an empty string
-                    xmp_metadata = JHXMPMetadata.from_string(xml_string)
-
-            # Skip frames with different sizes than the first frame
-            # (This is pretty much the unlikeliest of all edge cases)
-            if raw_frame.size != first_frame.size:
-                continue
-
-            # Convert the frame to image and mask tensors
-            image_tensor, mask_tensor = self._frame_to_tensors(raw_frame)
-
-            # Append the processed image and mask to the outputs
-            output_images.append(image_tensor)
-            output_masks.append(mask_tensor.unsqueeze(0))
-
-        # Combine frames into a single tensor if multiple frames exist
-        if len(output_images) > 1 and image_object.format not in excluded_formats:
-            output_image = torch.cat(output_images, dim=0)
-            output_mask = torch.cat(output_masks, dim=0)
+        # Drop the slots of any skipped frames (this is a view, not a copy)
+        output_image = output_image[:loaded_frames]
+        if output_mask is None:
+            output_mask = torch.zeros(
+                (loaded_frames, 64, 64), dtype=dtype, device="cpu"
+            )
         else:
-            output_image = output_images[0]
-            output_mask = output_masks[0]
+            output_mask = output_mask[:loaded_frames]
+
+        return self._result_tuple(output_image, output_mask, xml_string, xmp_metadata)
+
+    def _load_frames(
+        self,
+        image_object: PIL.Image.Image,
+        image_path: str,
+        frame_indices: range,
+        dtype: torch.dtype,
+        max_dimension: int,
+        executor: ThreadPoolExecutor | None = None,
+        max_pending: int = 0,
+        spill_to_disk: bool = False,
+    ) -> tuple[torch.Tensor, torch.Tensor | None, int]:
+        frame_count: int = len(frame_indices)
+
+        # The frames are converted straight into tensors that are allocated
+        # up front for the whole sequence, rather than concatenated at the
+        # end, which would need twice the memory at its peak.
+        output_image: torch.Tensor | None = None
+        output_mask: torch.Tensor | None = None
+        first_frame_size: tuple[int, int] | None = None
+        loaded_frames: int = 0
+
+        # With an executor, every frame after the first is converted on its
+        # threads instead. The frames are still read, checked and given
+        # their slots here, in order, so the output is the same either way.
+        pending: deque[Future] = deque()
+        page_handles = threading.local()
+        open_pages: list[PIL.Image.Image] = []
+        try:
+            for raw_frame in self._seek_frames(image_object, frame_indices):
+                if first_frame_size is None:
+                    first_frame_size = raw_frame.size
+
+                # Skip frames with different sizes than the first frame
+                # (This is pretty much the unlikeliest of all edge cases)
+                elif raw_frame.size != first_frame_size:
+                    continue
+
+                # Convert the frame to image and mask tensors
+                has_alpha: bool = "A" in raw_frame.getbands()
+
+                if output_image is None:
+                    # The first frame decides the output size (after any EXIF
+                    # rotation). A single frame is used as it is, unless it
+                    # has to go to disk; otherwise it's copied into the
+                    # first slot.
+                    image_tensor, mask_tensor = self.frame_to_tensors(
+                        raw_frame, dtype=dtype, max_dimension=max_dimension
+                    )
+                    if frame_count == 1 and not spill_to_disk:
+                        output_image = image_tensor
+                    elif spill_to_disk:
+                        output_image = self._allocate_on_disk(
+                            (frame_count, *image_tensor.shape[1:]), dtype
+                        )
+                        output_image[0] = image_tensor[0]
+                    else:
+                        output_image = torch.empty(
+                            (frame_count, *image_tensor.shape[1:]),
+                            dtype=dtype,
+                            device="cpu",
+                        )
+                        output_image[0] = image_tensor[0]
+                    if has_alpha and frame_count == 1 and not spill_to_disk:
+                        output_mask = mask_tensor.unsqueeze(0)
+                    elif has_alpha:
+                        output_mask = self._allocate_mask(
+                            output_image, frame_count, spill_to_disk
+                        )
+                        output_mask[0] = mask_tensor
+                else:
+                    # Frames without an alpha channel get an all-zero mask, so
+                    # the mask tensor is only allocated once a frame has one.
+                    if has_alpha and output_mask is None:
+                        output_mask = self._allocate_mask(
+                            output_image, frame_count, spill_to_disk
+                        )
+                    image_out: torch.Tensor = output_image[loaded_frames]
+                    mask_out: torch.Tensor | None = (
+                        output_mask[loaded_frames] if has_alpha else None
+                    )
+                    if executor is None:
+                        self.frame_to_tensors(
+                            raw_frame,
+                            image_out=image_out,
+                            mask_out=mask_out,
+                            max_dimension=max_dimension,
+                        )
+                    else:
+                        pending.append(
+                            self._submit_frame(
+                                executor,
+                                raw_frame,
+                                image_path,
+                                page_handles,
+                                open_pages,
+                                image_out=image_out,
+                                mask_out=mask_out,
+                                max_dimension=max_dimension,
+                            )
+                        )
+                        # Don't let decoded frames pile up faster than the
+                        # workers can convert them
+                        while len(pending) > max_pending:
+                            pending.popleft().result()
+
+                loaded_frames += 1
+
+            # Re-raise the first error, if any
+            while pending:
+                pending.popleft().result()
+        finally:
+            # The workers may still be reading from their pages if a frame
+            # failed, so let them finish before the pages are closed
+            for future in pending:
+                future.exception()
+            for page in open_pages:
+                page.close()
+
+        return output_image, output_mask, loaded_frames
+
+    def _submit_frame(
+        self,
+        executor: ThreadPoolExecutor,
+        raw_frame: PIL.Image.Image,
+        image_path: str,
+        page_handles: threading.local,
+        open_pages: list[PIL.Image.Image],
+        **kwargs: object,
+    ) -> Future:
+        if raw_frame.format in self.INDEPENDENT_FRAME_FORMATS:
+            return executor.submit(
+                self._convert_page,
+                image_path,
+                raw_frame.tell(),
+                page_handles,
+                open_pages,
+                **kwargs,
+            )
+        # The frames of other formats build on the ones before them, so
+        # they're decoded here, in order, and only converted by the workers.
+        # copy() decodes the frame and keeps it safe from the next seek.
+        return executor.submit(self.frame_to_tensors, raw_frame.copy(), **kwargs)
+
+    def _convert_page(
+        self,
+        image_path: str,
+        index: int,
+        page_handles: threading.local,
+        open_pages: list[PIL.Image.Image],
+        **kwargs: object,
+    ) -> None:
+        # Every worker thread reads the file through a handle of its own, so
+        # that pages can be decoded at the same time
+        page: PIL.Image.Image | None = getattr(page_handles, "page", None)
+        if page is None:
+            page = page_handles.page = PIL.Image.open(image_path)
+            open_pages.append(page)
+        page.seek(index)
+        self.frame_to_tensors(page, **kwargs)
+
+    def _frame_indices(
+        self, total_frames: int, start_frame: int, frame_stride: int, max_frames: int
+    ) -> range:
+        frame_indices = range(start_frame, total_frames, max(1, frame_stride))
+        return frame_indices[:max_frames] if max_frames > 0 else frame_indices
+
+    def _seek_frames(
+        self, image_object: PIL.Image.Image, frame_indices: range
+    ) -> Iterator[PIL.Image.Image]:
+        # Seeking straight to each wanted frame lets formats with random
+        # access to their frames, like TIFF, skip the others entirely.
+        # Formats whose frames build on the ones before them, like GIF and
+        # animated WebP and PNG, still decode the frames in between inside
+        # Pillow, but none of them is converted.
+        for index in frame_indices:
+            image_object.seek(index)
+            yield image_object
+
+    def _allocate_mask(
+        self, output_image: torch.Tensor, frame_count: int, spill_to_disk: bool = False
+    ) -> torch.Tensor:
+        if spill_to_disk:
+            return self._allocate_on_disk(
+                (frame_count, *output_image.shape[1:3]), output_image.dtype
+            )
+        return torch.zeros(
+            (frame_count, *output_image.shape[1:3]),
+            dtype=output_image.dtype,
+            device="cpu",
+        )
+
+    def _allocate_on_disk(
+        self, shape: tuple[int, ...], dtype: torch.dtype
+    ) -> torch.Tensor:
+        # A zero-filled tensor backed by a temporary file rather than RAM,
+        # so the operating system can write its pages out and drop them.
+        # The file is deleted as soon as it's created (or closed, on
+        # Windows), and the space is freed once the tensor is.
+        #
+        # The file goes in ComfyUI's temp directory rather than the
+        # system's, which is often a tmpfs whose files are held in RAM
+        # anyway. Set JH_XMP_SPILL_DIR to put it somewhere else.
+        directory: str = (
+            os.environ.get("JH_XMP_SPILL_DIR") or folder_paths.get_temp_directory()
+        )
+        os.makedirs(directory, exist_ok=True)
+        with tempfile.TemporaryFile(prefix="jh_xmp_", dir=directory) as f:
+            array = np.memmap(
+                f,
+                dtype=torch.empty(0, dtype=dtype).numpy().dtype,
+                mode="w+",
+                shape=shape,
+            )
+        return torch.from_numpy(array)
+
+    def _apply_memory_budget(
+        self,
+        size: tuple[int, int],
+        frame_count: int,
+        dtype: torch.dtype,
+        max_dimension: int,
+        memory_budget_mb: int,
+        over_budget: JHOverBudgetPolicy,
+    ) -> tuple[int, bool]:
+        # Returns the max_dimension to load the frames at, and whether they
+        # have to go to disk. Every frame is counted with a mask, since
+        # whether the frames have an alpha channel isn't known up front.
+        budget_bytes: int = memory_budget_mb << 20
+        bytes_per_pixel: int = 4 * dtype.itemsize
+        width, height = self._reduced_size(size, max_dimension) or size
+        needed_bytes: int = frame_count * width * height * bytes_per_pixel
+        if needed_bytes <= budget_bytes:
+            return max_dimension, False
 
+        max_pixels: int = budget_bytes // (frame_count * bytes_per_pixel)
+        match JHOverBudgetPolicy(over_budget):
+            case JHOverBudgetPolicy.DISK:
+                return max_dimension, True
+            case JHOverBudgetPolicy.DOWNSCALE if max_pixels >= 1:
+                return self._fit_max_dimension(size, max_pixels), False
+            case JHOverBudgetPolicy.DOWNSCALE:
+                advice = "Lower max_frames, or set over_budget to disk."
+            case _:
+                advice = (
+                    "Lower max_dimension or max_frames, or set over_budget to "
+                    "downscale or disk."
+                )
+        raise ValueError(
+            f"Loading {frame_count} frame(s) of {width}x{height} pixels needs "
+            f"{math.ceil(needed_bytes / (1 << 20))} MB, but memory_budget_mb is "
+            f"{memory_budget_mb}. {advice}"
+        )
+
+    def _fit_max_dimension(self, size: tuple[int, int], max_pixels: int) -> int:
+        # The largest max_dimension that scales `size` down to at most
+        # `max_pixels` pixels. Scaling rounds each side, so the estimate is
+        # nudged until it's the largest that fits; at 1 everything does.
+        def reduced_pixels(max_dimension: int) -> int:
+            width, height = self._reduced_size(size, max_dimension) or size
+            return width * height
+
+        max_dimension: int = max(
+            1, math.isqrt(max(size) ** 2 * max_pixels // (size[0] * size[1]))
+        )
+        while max_dimension > 1 and reduced_pixels(max_dimension) > max_pixels:
+            max_dimension -= 1
+        while (
+            max_dimension < max(size)
+            and reduced_pixels(max_dimension + 1) <= max_pixels
+        ):
+            max_dimension += 1
+        return max_dimension
+
+    def _load_metadata_only(
+        self, image_path: str, dtype: torch.dtype = torch.float32
+    ) -> JHLoadImageWithXMPMetadataResultTuple:
+        # PIL.Image.open only reads the file's header, where the common
+        # formats keep their XMP packet, so no pixels are decoded here.
+        # Exceptions propagate for the same reasons as in `load_image`.
+        with PIL.Image.open(image_path) as image_object:
+            xml_string, xmp_metadata = self.read_xmp(
+                image_object, image_path, image_object.format
+            )
+
+        return self._result_tuple(
+            torch.zeros((1, 64, 64, 3), dtype=dtype, device="cpu"),
+            torch.zeros((1, 64, 64), dtype=dtype, device="cpu"),
+            xml_string,
+            xmp_metadata,
+        )
+
+    def read_xmp(
+        self, frame: PIL.Image.Image, image_path: str, image_format: str | None
+    ) -> tuple[str, JHXMPMetadata]:
+        """
+        Returns the XMP packet of the image at `image_path`, of which `frame`
+        is an open frame, along with its parsed metadata. Both are empty if
+        the image has no packet.
+        """
+        xml_string: str = str()
+        xmp_metadata = JHXMPMetadata()
+        xmp_data: bytes | str | None = frame.info.get("xmp", None)
+        if xmp_data is None and image_format not in self.PILLOW_XMP_FORMATS:
+            xmp_data = JHXMPPacketScanner.scan_file(image_path)
+        if isinstance(xmp_data, bytes):
+            xml_string = xmp_data.decode("utf-8")
+        if xml_string:  # Can't parse None or an empty string
+            xmp_metadata = JHXMPMetadata.from_string(xml_string)
+        return xml_string, xmp_metadata
+
+    def _result_tuple(
+        self,
+        output_image: torch.Tensor,
+        output_mask: torch.Tensor,
+        xml_string: str,
+        xmp_metadata: JHXMPMetadata,
+    ) -> JHLoadImageWithXMPMetadataResultTuple:
         return JHLoadImageWithXMPMetadataResultTuple(
             output_image,
             output_mask,
@@ -162,52 +948,189 @@ class JHLoadImageWithXMPMetadataNode:
             xml_string,
         )
 
-    def _frame_to_tensors(
-        self, raw_frame: PIL.Image.Image
+    def frame_to_tensors(
+        self,
+        raw_frame: PIL.Image.Image,
+        image_out: torch.Tensor | None = None,
+        mask_out: torch.Tensor | None = None,
+        dtype: torch.dtype = torch.float32,
+        max_dimension: int = 0,
+        size: tuple[int, int] | None = None,
     ) -> tuple[torch.Tensor, torch.Tensor]:
+        """
+        Converts a frame to an image tensor of shape [1, H, W, 3] and a mask
+        tensor of shape [H, W] of the given `dtype`. Float tensors have
+        values in [0, 1], uint8 ones in [0, 255].
+
+        If given, `image_out` (an [H, W, 3] CPU tensor, which may be a view
+        into a larger one) and `mask_out` ([H, W]) receive the results, and
+        the returned tensors are views of them; their dtype then takes the
+        place of `dtype`. `mask_out` is left alone if the frame has no alpha
+        channel.
+
+        With a `max_dimension` above 0, frames with a longer side are
+        scaled down to fit before they're converted. A `size` (width and
+        height, before any EXIF rotation) resizes the frame to exactly that
+        size instead.
+        """
+        # The bit depth of integer frames has to be read off the original
+        # frame; a resized copy no longer has its TIFF tags.
+        integer_maximum: int | None = (
+            self._integer_maximum(raw_frame) if raw_frame.mode.startswith("I") else None
+        )
+        if size is None:
+            raw_frame = self._reduce(raw_frame, max_dimension)
+        elif raw_frame.size != size:
+            raw_frame = self._resize(raw_frame, size)
+
         # Fix image orientation based on EXIF metadata. Do this in
         # place to avoid creating a new image object for each frame.
         PIL.ImageOps.exif_transpose(raw_frame, in_place=True)
 
-        # If the image is a 32-bit integer image, we need to convert it
-        # to a floating point image. The point() method applies a
-        # transformation to each pixel value, and we use a lambda
-        # function to divide each pixel value by 255. This is equivalent
-        # to dividing the whole image by 255, but it's done on a pixel-by-pixel
-        # basis. This is necessary because the image is stored as an
-        # unsigned 32-bit integer, and we want to treat it as a float
-        # in the range [0, 1].
-
-        if raw_frame.mode.startswith("I"):
-            raw_frame = raw_frame.point(lambda i: i * (1 / 255))
-
-        # Convert the image to RGB
-        if raw_frame.mode != "RGB":
-            rgb_frame = raw_frame.convert("RGB")
+        # High bit depth frames hold a single channel of 16 or 32-bit
+        # integers. Read them straight out of Pillow and scale them by their
+        # own maximum, which keeps all of their precision.
+        if integer_maximum is not None:
+            gray: np.ndarray = np.asarray(raw_frame)
+            image_array: np.ndarray = (
+                image_out.numpy()
+                if image_out is not None
+                else torch.empty((*gray.shape, 3), dtype=dtype).numpy()
+            )
+            self._normalize_integers(gray, image_array, integer_maximum)
+            image_tensor = torch.from_numpy(image_array)[None,]
+            mask_tensor = torch.zeros((64, 64), dtype=image_tensor.dtype, device="cpu")
+            return image_tensor, mask_tensor
+
+        # Get the frame's pixels as a uint8 array. np.asarray wraps the one
+        # copy of the pixel data Pillow hands out without copying it again.
+        # An RGBA frame already holds the RGB channels and the alpha channel
+        # side by side, so it doesn't need converting at all.
+        alpha: np.ndarray | None = None
+        if raw_frame.mode == "RGBA":
+            rgba: np.ndarray = np.asarray(raw_frame)
+            rgb, alpha = rgba[..., :3], rgba[..., 3]
         else:
-            rgb_frame = raw_frame
+            rgb = np.asarray(
+                raw_frame if raw_frame.mode == "RGB" else raw_frame.convert("RGB")
+            )
+            if "A" in raw_frame.getbands():
+                alpha = np.asarray(raw_frame.getchannel("A"))
 
-        # Normalize the image to a tensor with values in [0, 1]
-        np_array = np.array(rgb_frame).astype(np.float32) / 255.0
-        image_tensor = torch.from_numpy(np_array)[None,]
+        # Normalize the image to [0, 1], converting and scaling in a single
+        # pass straight into the output buffer
+        image_array = (
+            image_out.numpy()
+            if image_out is not None
+            else torch.empty(rgb.shape, dtype=dtype).numpy()
+        )
+        self._normalize(rgb, image_array)
+        image_tensor = torch.from_numpy(image_array)[None,]
 
-        # Go back to the original raw frame and extract the alpha
-        # channel as a mask
-        if "A" in raw_frame.getbands():
-            np_array = np.array(raw_frame.getchannel("A")).astype(np.float32) / 255.0
-            mask_tensor = 1.0 - torch.from_numpy(np_array)
+        # The mask is the inverse of the alpha channel, computed in place
+        if alpha is not None:
+            mask_array: np.ndarray = (
+                mask_out.numpy()
+                if mask_out is not None
+                else torch.empty(alpha.shape, dtype=image_tensor.dtype).numpy()
+            )
+            self._invert_alpha(alpha, mask_array)
+            mask_tensor = torch.from_numpy(mask_array)
         else:
-            mask_tensor = torch.zeros((64, 64), dtype=torch.float32, device="cpu")
+            mask_tensor = torch.zeros((64, 64), dtype=image_tensor.dtype, device="cpu")
 
         return image_tensor, mask_tensor
 
+    def _normalize(self, values: np.ndarray, out: np.ndarray) -> None:
+        if out.dtype == np.uint8:
+            np.copyto(out, values)
+        else:
+            # Computed in float32 even for float16 output, so every value
+            # is only rounded once.
+            np.divide(values, 255.0, out=out, dtype=np.float32)
+
+    def _reduced_size(
+        self, size: tuple[int, int], max_dimension: int
+    ) -> tuple[int, int] | None:
+        # The size that fits `size` within `max_dimension`, or None if it
+        # already does
+        if max_dimension <= 0 or max(size) <= max_dimension:
+            return None
+        scale: float = max_dimension / max(size)
+        return (
+            max(1, round(size[0] * scale)),
+            max(1, round(size[1] * scale)),
+        )
+
+    def _reduce(self, frame: PIL.Image.Image, max_dimension: int) -> PIL.Image.Image:
+        reduced_size = self._reduced_size(frame.size, max_dimension)
+        if reduced_size is None:
+            return frame
+        return self._resize(frame, reduced_size)
+
+    def _resize(self, frame: PIL.Image.Image, size: tuple[int, int]) -> PIL.Image.Image:
+        # With a reducing gap, Pillow first shrinks the frame by a whole
+        # factor with a fast box filter and only resamples what's left.
+        # Image.reduce() doesn't support the I;16 modes, though, and
+        # resampling in mode I overflows for values past 24 bits, so those
+        # frames are resampled as floats instead.
+        reducing_gap: float | None = (
+            None if frame.mode.startswith("I;16") else self.REDUCING_GAP
+        )
+        if frame.mode == "I":
+            frame = frame.convert("F")
+        return frame.resize(
+            size, PIL.Image.Resampling.LANCZOS, reducing_gap=reducing_gap
+        )
+
+    def _integer_maximum(self, frame: PIL.Image.Image) -> int:
+        # The I;16 modes are 16-bit by definition. Mode I is a 32-bit
+        # container, so go by the TIFF BitsPerSample tag if there is one and
+        # assume 16 bits otherwise; older versions of Pillow open 16-bit PNGs
+        # in mode I.
+        bits: int = 16
+        if frame.mode == "I" and hasattr(frame, "tag_v2"):
+            bits_per_sample = frame.tag_v2.get(self.TIFF_BITS_PER_SAMPLE, bits)
+            if isinstance(bits_per_sample, tuple):
+                bits_per_sample = bits_per_sample[0]
+            bits = int(bits_per_sample)
+        return min((1 << bits) - 1, np.iinfo(np.int32).max)
+
+    def _normalize_integers(
+        self, gray: np.ndarray, out: np.ndarray, maximum: int
+    ) -> None:
+        if gray.dtype.kind != "u":
+            # Mode I is signed and may hold more bits than it claims to, and
+            # resampled frames can overshoot
+            gray = np.clip(gray, 0, maximum)
+        # Filling each channel on its own is faster than broadcasting the
+        # gray values across all three at once
+        if out.dtype == np.uint8:
+            gray = np.rint(np.divide(gray, maximum / 255, dtype=np.float32))
+            for channel in range(3):
+                np.copyto(out[..., channel], gray, casting="unsafe")
+        else:
+            for channel in range(3):
+                np.divide(gray, float(maximum), out=out[..., channel], dtype=np.float32)
+
+    def _invert_alpha(self, alpha: np.ndarray, out: np.ndarray) -> None:
+        match out.dtype:
+            case np.uint8:
+                np.subtract(255, alpha, out=out)
+            case np.float32:
+                np.divide(alpha, 255.0, out=out, dtype=np.float32)
+                np.subtract(1.0, out, out=out)
+            case _:
+                # 255 - alpha is exact in uint8, so this rounds only once
+                np.divide(255 - alpha, 255.0, out=out, dtype=np.float32)
+
     @classmethod
-    def IS_CHANGED(cls, image: str) -> str:
+    def IS_CHANGED(cls, image: str, **kwargs: object) -> str:
+        # ComfyUI passes every input here, not just `image`
+        # ComfyUI calls this for every queued prompt, so the digest is cached
+        # for as long as the file's stat info doesn't change.
         image_path = folder_paths.get_annotated_filepath(image)
-        m = hashlib.sha256()
-        with open(image_path, "rb") as f:
-            m.update(f.read())
-        return m.digest().hex()
+        return JHFileFingerprint.fingerprint(image_path, cls.fingerprint_algorithm)
 
     @classmethod
     def VALIDATE_INPUTS(cls, image: str) -> str | bool:
@@ -0,0 +1,435 @@
+import functools
+import hashlib
+import os
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from enum import StrEnum
+from pathlib import Path
+from typing import Final, NamedTuple
+from unittest.mock import MagicMock
+
+import PIL.Image
+import torch
+
+from comfyui_jh_xmp_metadata_nodes import jh_types
+
+from .jh_load_image_with_xmp_metadata_node import (
+    JHLoadImageWithXMPMetadataNode,
+    JHOutputDType,
+)
+from .jh_xmp_metadata import JHXMPMetadata
+
+try:
+    import folder_paths  # pyright: ignore[reportMissingImports]
+except ImportError:
+    folder_paths = MagicMock()
+
+
+class JHSortOrder(StrEnum):
+    """
+    The orders the batch loader can load a directory's images in.
+    """
+
+    NAME = "name"
+    MODIFIED = "modified"
+    SIZE = "size"
+
+
+class JHSizePolicy(StrEnum):
+    """
+    What the batch loader does with images that aren't all the same size.
+
+    `PAD` pads every image at the bottom and right to the size of the
+    largest one and masks the padding out. `RESIZE` resizes every image to
+    the size of the first one. `SPLIT` leaves every image at its own size.
+    """
+
+    PAD = "pad"
+    RESIZE = "resize"
+    SPLIT = "split"
+
+
+class JHBatchImageProbe(NamedTuple):
+    """
+    What the batch loader learns about an image from its header, before
+    any pixels are decoded.
+    """
+
+    path: str
+    size: tuple[int, int]  # After any EXIF rotation
+    transposed: bool  # Whether EXIF rotation swaps the width and height
+    has_alpha: bool
+    xml_string: str
+    xmp_metadata: JHXMPMetadata
+
+
+class JHLoadImagesWithXMPMetadataBatchResultTuple(NamedTuple):
+    IMAGE: list[torch.Tensor]
+    MASK: list[torch.Tensor]
+    path: list[str]
+    creator: list[str | None]
+    rights: list[str | None]
+    title: list[str | None]
+    description: list[str | None]
+    subject: list[str | None]
+    instructions: list[str | None]
+    comment: list[str | None]
+    alt_text: list[str | None]
+    ext_description: list[str | None]
+    xml_string: list[str]
+
+
+class JHLoadImagesWithXMPMetadataBatchNode:
+    """
+    Loads every image in a directory that matches a glob pattern, along
+    with its XMP metadata.
+
+    Every output is a list with one entry per image: IMAGE and MASK hold a
+    batch of one image each, in the same order as the paths and metadata
+    fields. ComfyUI runs the nodes they're connected to once per image, so
+    each image reaches, say, a save node along with its own metadata. Only
+    the first frame of an animation or multi-page image is loaded.
+
+    The images' headers are read first, so that they can be allocated up
+    front, in one batch per run of images that end up the same size. Then
+    the images are decoded and converted straight into their slots on a
+    pool of threads, a few images ahead of the one being waited on. The
+    entries of IMAGE and MASK are views into those batches.
+    """
+
+    # EXIF orientations that rotate an image by 90 degrees one way or the
+    # other, and so swap its width and height
+    EXIF_ORIENTATION: Final = 0x0112
+    TRANSPOSING_ORIENTATIONS: Final = frozenset({5, 6, 7, 8})
+
+    def __init__(self) -> None:
+        self.image_loader = JHLoadImageWithXMPMetadataNode()
+
+    @classmethod
+    @functools.cache
+    def INPUT_TYPES(cls) -> jh_types.JHInputTypesType:
+        # fmt: off
+        return {
+            "required": {
+                "directory": (
+                    jh_types.JHNodeInputOutputTypeEnum.STRING,
+                    {
+                        "default": "",
+                        "tooltip": "The directory to load images from. A relative path is relative to ComfyUI's input directory.",  # noqa: E501
+                    },
+                ),
+                "pattern": (
+                    jh_types.JHNodeInputOutputTypeEnum.STRING,
+                    {
+                        "default": "*.png",
+                        "tooltip": "Which files in the directory to load, as a glob pattern. Use **/ to include subdirectories, as in **/*.jpg.",  # noqa: E501
+                    },
+                ),
+                "sort_by": (
+                    [x for x in JHSortOrder],
+                    {
+                        "default": JHSortOrder.NAME,
+                    },
+                ),
+                "offset": (
+                    jh_types.JHNodeInputOutputTypeEnum.INT,
+                    {
+                        "default": 0,
+                        "min": 0,
+                        "max": 0xFFFFFFFF,
+                        "tooltip": "How many of the sorted files to skip.",
+                    },
+                ),
+                "limit": (
+                    jh_types.JHNodeInputOutputTypeEnum.INT,
+                    {
+                        "default": 0,
+                        "min": 0,
+                        "max": 0xFFFFFFFF,
+                        "tooltip": "The most files to load. 0 loads all of them.",
+                    },
+                ),
+                "size_policy": (
+                    [x for x in JHSizePolicy],
+                    {
+                        "default": JHSizePolicy.SPLIT,
+                        "tooltip": "What to do with images of different sizes. pad pads them to the largest size and masks out the padding, resize resizes them to the size of the first image, and split leaves every image at its own size.",  # noqa: E501
+                    },
+                ),
+            },
+            "optional": {
+                "output_dtype": (
+                    [x for x in JHOutputDType],
+                    {
+                        "default": JHOutputDType.FLOAT32,
+                        "tooltip": "The precision of IMAGE and MASK. float16 halves their memory. uint8 quarters it but holds values from 0 to 255, which most nodes don't expect.",  # noqa: E501
+                    },
+                ),
+                "decode_workers": (
+                    jh_types.JHNodeInputOutputTypeEnum.INT,
+                    {
+                        "default": 4,
+                        "min": 1,
+                        "max": 64,
+                        "tooltip": "How many images to read and decode at the same time.",  # noqa: E501
+                    },
+                ),
+            },
+        }
+        # fmt: on
+
+    RETURN_TYPES = (
+        jh_types.JHNodeInputOutputTypeEnum.IMAGE,
+        jh_types.JHNodeInputOutputTypeEnum.MASK,
+        jh_types.JHNodeInputOutputTypeEnum.STRING,
+        jh_types.JHNodeInputOutputTypeEnum.STRING,
+        jh_types.JHNodeInputOutputTypeEnum.STRING,
+        jh_types.JHNodeInputOutputTypeEnum.STRING,
+        jh_types.JHNodeInputOutputTypeEnum.STRING,
+        jh_types.JHNodeInputOutputTypeEnum.STRING,
+        jh_types.JHNodeInputOutputTypeEnum.STRING,
+        jh_types.JHNodeInputOutputTypeEnum.STRING,
+        jh_types.JHNodeInputOutputTypeEnum.STRING,
+        jh_types.JHNodeInputOutputTypeEnum.STRING,
+        jh_types.JHNodeInputOutputTypeEnum.STRING,
+    )
+    RETURN_NAMES = (
+        "IMAGE",
+        "MASK",
+        "path",
+        "creator",
+        "rights",
+        "title",
+        "description",
+        "subject",
+        "instructions",
+        "comment",
+        "alt_text",
+        "ext_description",
+        "xml_string",
+    )
+    OUTPUT_IS_LIST = (True,) * len(RETURN_TYPES)
+    FUNCTION = "load_images"
+    CATEGORY = "XMP Metadata Nodes"
+    OUTPUT_NODE = False
+
+    def load_images(
+        self,
+        directory: str,
+        pattern: str,
+        sort_by: JHSortOrder = JHSortOrder.NAME,
+        offset: int = 0,
+        limit: int = 0,
+        size_policy: JHSizePolicy = JHSizePolicy.SPLIT,
+        output_dtype: JHOutputDType = JHOutputDType.FLOAT32,
+        decode_workers: int = 4,
+    ) -> JHLoadImagesWithXMPMetadataBatchResultTuple:
+        paths: list[str] = self.list_files(directory, pattern, sort_by, offset, limit)
+        if not paths:
+            raise FileNotFoundError(
+                f"No files matching {pattern!r} in {self.resolve_directory(directory)}"
+            )
+        dtype: torch.dtype = JHOutputDType(output_dtype).torch_dtype
+        size_policy = JHSizePolicy(size_policy)
+
+        with ThreadPoolExecutor(
+            max_workers=max(1, decode_workers),
+            thread_name_prefix="JHLoadImagesWithXMPMetadataBatch",
+        ) as executor:
+            probes: list[JHBatchImageProbe] = list(executor.map(self._probe, paths))
+            images: list[torch.Tensor] = []
+            masks: list[torch.Tensor] = []
+            pending: deque[Future] = deque()
+            try:
+                for group in self._group(probes, size_policy):
+                    image, mask = self._allocate_batch(group, size_policy, dtype)
+                    for i, probe in enumerate(group):
+                        images.append(image[i : i + 1])
+                        masks.append(mask[i : i + 1])
+                        pending.append(
+                            executor.submit(
+                                self._decode_into,
+                                probe,
+                                image[i],
+                                mask[i],
+                                size_policy,
+                            )
+                        )
+                        # Read ahead by a couple of images per worker, but
+                        # no further
+                        while len(pending) > 2 * decode_workers:
+                            pending.popleft().result()
+                while pending:
+                    pending.popleft().result()
+            finally:
+                for future in pending:
+                    future.cancel()
+
+        return JHLoadImagesWithXMPMetadataBatchResultTuple(
+            images,
+            masks,
+            [probe.path for probe in probes],
+            [probe.xmp_metadata.creator for probe in probes],
+            [probe.xmp_metadata.rights for probe in probes],
+            [probe.xmp_metadata.title for probe in probes],
+            [probe.xmp_metadata.description for probe in probes],
+            [probe.xmp_metadata.subject for probe in probes],
+            [probe.xmp_metadata.instructions for probe in probes],
+            [probe.xmp_metadata.comment for probe in probes],
+            [probe.xmp_metadata.alt_text for probe in probes],
+            [probe.xmp_metadata.ext_description for probe in probes],
+            [probe.xml_string for probe in probes],
+        )
+
+    @classmethod
+    def resolve_directory(cls, directory: str) -> Path:
+        path = Path(directory).expanduser()
+        if not path.is_absolute():
+            path = Path(folder_paths.get_input_directory()) / path
+        return path
+
+    @classmethod
+    def list_files(
+        cls,
+        directory: str,
+        pattern: str,
+        sort_by: JHSortOrder = JHSortOrder.NAME,
+        offset: int = 0,
+        limit: int = 0,
+    ) -> list[str]:
+        """
+        Returns the paths of the files in `directory` that match the glob
+        `pattern`, sorted, with the first `offset` of them left out and at
+        most `limit` of them (if `limit` is above 0).
+        """
+        files: list[Path] = [
+            path
+            for path in cls.resolve_directory(directory).glob(pattern)
+            if path.is_file()
+        ]
+        match JHSortOrder(sort_by):
+            case JHSortOrder.NAME:
+                files.sort()
+            case JHSortOrder.MODIFIED:
+                files.sort(key=lambda path: (path.stat().st_mtime_ns, path))
+            case JHSortOrder.SIZE:
+                files.sort(key=lambda path: (path.stat().st_size, path))
+        files = files[offset:]
+        if limit > 0:
+            files = files[:limit]
+        return [str(path) for path in files]
+
+    def _probe(self, path: str) -> JHBatchImageProbe:
+        with PIL.Image.open(path) as image_object:
+            xml_string, xmp_metadata = self.image_loader.read_xmp(
+                image_object, path, image_object.format
+            )
+            width, height = image_object.size
+            transposed: bool = (
+                self._orientation(image_object) in self.TRANSPOSING_ORIENTATIONS
+            )
+            return JHBatchImageProbe(
+                path,
+                (height, width) if transposed else (width, height),
+                transposed,
+                "A" in image_object.getbands(),
+                xml_string,
+                xmp_metadata,
+            )
+
+    def _orientation(self, image_object: PIL.Image.Image) -> int | None:
+        # A PNG's getexif() decodes the whole image in case the EXIF chunk
+        # comes after the pixels. Pillow writes it before them, so only
+        # look at EXIF that's already been read.
+        if image_object.format == "PNG" and "exif" not in image_object.info:
+            return None
+        return image_object.getexif().get(self.EXIF_ORIENTATION)
+
+    def _group(
+        self, probes: list[JHBatchImageProbe], size_policy: JHSizePolicy
+    ) -> list[list[JHBatchImageProbe]]:
+        if size_policy != JHSizePolicy.SPLIT:
+            return [probes]
+        # Runs of consecutive images, so the batches stay in the same order
+        # as the metadata lists
+        groups: list[list[JHBatchImageProbe]] = []
+        for probe in probes:
+            if groups and groups[-1][0].size == probe.size:
+                groups[-1].append(probe)
+            else:
+                groups.append([probe])
+        return groups
+
+    def _allocate_batch(
+        self,
+        group: list[JHBatchImageProbe],
+        size_policy: JHSizePolicy,
+        dtype: torch.dtype,
+    ) -> tuple[torch.Tensor, torch.Tensor]:
+        if size_policy == JHSizePolicy.PAD:
+            width: int = max(probe.size[0] for probe in group)
+            height: int = max(probe.size[1] for probe in group)
+        else:
+            width, height = group[0].size
+        padded: bool = any(probe.size != (width, height) for probe in group)
+
+        if padded and size_policy == JHSizePolicy.PAD:
+            # The padding is black, and masked out
+            image = torch.zeros((len(group), height, width, 3), dtype=dtype)
+            mask = torch.full(
+                (len(group), height, width),
+                255 if dtype == torch.uint8 else 1,
+                dtype=dtype,
+            )
+        else:
+            image = torch.empty((len(group), height, width, 3), dtype=dtype)
+            mask = torch.zeros((len(group), height, width), dtype=dtype)
+        return image, mask
+
+    def _decode_into(
+        self,
+        probe: JHBatchImageProbe,
+        image_out: torch.Tensor,
+        mask_out: torch.Tensor,
+        size_policy: JHSizePolicy,
+    ) -> None:
+        height, width = image_out.shape[:2]
+        with PIL.Image.open(probe.path) as image_object:
+            target_size: tuple[int, int] | None = None
+            if probe.size == (width, height):
+                pass
+            elif size_policy == JHSizePolicy.RESIZE:
+                # The image is scaled before it's rotated, so the target
+                # size has to be rotated the other way first. The loader
+                # does the resizing, since 16 and 32-bit frames need care.
+                target_size = (height, width) if probe.transposed else (width, height)
+                image_object.draft(image_object.mode, target_size)
+            else:
+                # The image only fills the top left of its padded slot
+                image_out = image_out[: probe.size[1], : probe.size[0]]
+                mask_out = mask_out[: probe.size[1], : probe.size[0]]
+                if not probe.has_alpha:
+                    mask_out.zero_()
+            self.image_loader.frame_to_tensors(
+                image_object, image_out=image_out, mask_out=mask_out, size=target_size
+            )
+
+    @classmethod
+    def IS_CHANGED(
+        cls,
+        directory: str,
+        pattern: str,
+        sort_by: JHSortOrder = JHSortOrder.NAME,
+        offset: int = 0,
+        limit: int = 0,
+        **kwargs: object,
+    ) -> str:
+        # Changes whenever a matching file is added, removed, renamed or
+        # rewritten, without reading any of them
+        digest = hashlib.sha256()
+        for path in cls.list_files(directory, pattern, sort_by, offset, limit):
+            stat_result: os.stat_result = os.stat(path)
+            digest.update(
+                f"{path}\0{stat_result.st_size}\0{stat_result.st_mtime_ns}\n".encode()
+            )
+        return digest.hexdigest()
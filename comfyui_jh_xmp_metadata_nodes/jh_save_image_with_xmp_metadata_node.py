@@ -1,7 +1,9 @@
+import functools
 import json
+from concurrent.futures import ThreadPoolExecutor
 from enum import StrEnum
 from pathlib import Path
-from typing import Any
+from typing import Any, Final
 from unittest.mock import MagicMock
 
 import numpy as np
@@ -12,6 +14,7 @@ from PIL.PngImagePlugin import PngInfo
 
 from comfyui_jh_xmp_metadata_nodes import jh_types
 
+from .jh_background_writer import JHBackgroundWriter
 from .jh_xmp_metadata import JHXMPMetadata
 
 try:
@@ -29,6 +32,13 @@ class JHSupportedImageTypes(StrEnum):
 
 
 class JHSaveImageWithXMPMetadataNode:
+    # How many values `images_to_uint8` scales at a time. Bounds the float
+    # scratch buffer to 4 MiB however large the images are.
+    UINT8_CONVERSION_CHUNK_SIZE: int = 1 << 20
+
+    # Pillow modes for HxWxC uint8 arrays, by number of channels
+    UINT8_IMAGE_MODES: Final[dict[int, str]] = {1: "L", 2: "LA", 3: "RGB", 4: "RGBA"}
+
     def __init__(self, output_dir: str | None = None) -> None:
         self.output_dir: str = (
             output_dir
@@ -39,7 +49,28 @@ class JHSaveImageWithXMPMetadataNode:
         self.prefix_append: str = ""
         self.compress_level: int = 0
 
+        # How often a batch could reuse an XMP packet that had already been
+        # rendered for an earlier image in the same batch (a hit) versus
+        # having to render a new one (a miss). Cumulative for the lifetime
+        # of the node.
+        self.xmp_cache_hits: int = 0
+        self.xmp_cache_misses: int = 0
+
+        # Limits for the background writer used when `background_write` is
+        # on. Once this many images, or bytes of decoded pixels, are waiting
+        # to be written, `save_images` blocks until some have been.
+        self.max_pending_images: int = 16
+        self.max_pending_bytes: int = 1 << 30
+        self.background_writer: JHBackgroundWriter | None = None
+
+        # The next free counter for each output folder and filename, so that
+        # files still waiting in the background writer aren't overwritten by
+        # the next batch. `folder_paths.get_save_image_path` only counts the
+        # files that are already on disk.
+        self._next_counters: dict[tuple[str, str], int] = {}
+
     @classmethod
+    @functools.cache
     def INPUT_TYPES(cls) -> jh_types.JHInputTypesType:
         # fmt: off
         return {
@@ -134,6 +165,22 @@ class JHSaveImageWithXMPMetadataNode:
                         "forceInput": True,
                     },
                 ),
+                "save_workers": (
+                    jh_types.JHNodeInputOutputTypeEnum.INT,
+                    {
+                        "default": 1,
+                        "min": 1,
+                        "max": 64,
+                        "tooltip": "How many images to encode and write at the same time. Image encoders release the GIL, so values above 1 can speed up large batches on multi-core machines.",  # noqa: E501
+                    },
+                ),
+                "background_write": (
+                    jh_types.JHNodeInputOutputTypeEnum.BOOLEAN,
+                    {
+                        "default": False,
+                        "tooltip": "Write the images on a background thread and return right away, so the next prompt can start while this batch is still being compressed and saved. Errors from a background write are reported on the next run. No previews are shown, since the files don't exist yet when the node returns.",  # noqa: E501
+                    },
+                ),
             },
             "hidden": {
                 "prompt": jh_types.JHNodeInputOutputTypeEnum.PROMPT,
@@ -162,12 +209,18 @@ class JHSaveImageWithXMPMetadataNode:
         alt_text: str | list | None = None,
         ext_description: str | list | None = None,
         xml_string: str | None = None,
-        prompt: str | None = None,
+        save_workers: int = 1,
+        background_write: bool = False,
+        prompt: dict | str | bytes | None = None,
         extra_pnginfo: dict | None = None,
     ) -> dict:
         if images is None or len(images) == 0:
             raise ValueError("No images to save.")
 
+        # Report any failed writes from a previous background run
+        if self.background_writer is not None:
+            self.background_writer.raise_errors()
+
         filename_prefix += self.prefix_append
         full_output_folder: str
         filename: str
@@ -180,49 +233,173 @@ class JHSaveImageWithXMPMetadataNode:
         )
         results: list = []
 
+        if background_write or (
+            self.background_writer is not None
+            and self.background_writer.pending_images > 0
+        ):
+            counter = max(
+                counter, self._next_counters.get((full_output_folder, filename), 0)
+            )
+            self._next_counters[(full_output_folder, filename)] = counter + len(images)
+
         filename_extension: str = self.extension_for_type(image_type)
 
+        xmps: list[str] | list[bytes] = self.inputs_to_xml_batch(
+            creator,
+            rights,
+            title,
+            description,
+            subject,
+            instructions,
+            comment,
+            alt_text,
+            ext_description,
+            xml_string,
+            len(images),
+        )
+        if image_type == JHSupportedImageTypes.JPEG:
+            xmps = self.encode_xmp_packets(xmps)
+
+        # The prompt and workflow are the same for every image in the batch
+        # and can be hundreds of KB of JSON, so encode them just once.
+        pnginfo_texts: dict[str, bytes] | None = None
+        if image_type == JHSupportedImageTypes.PNG_WITH_WORKFLOW:
+            pnginfo_texts = self.encode_pnginfo_texts(prompt, extra_pnginfo)
+
+        # Work out every filename up front, in batch order, so that the
+        # counter and the UI results don't depend on the order in which
+        # the images actually get written.
+        jobs: list[tuple[np.ndarray, Path, str | bytes]] = []
         batch_number: int = 0
-        image: torch.Tensor
+        image: np.ndarray
 
-        for batch_number, image in enumerate(images):
-            i: np.ndarray = 255.0 * image.cpu().numpy()
-            img: Image = PIL.Image.fromarray(np.clip(i, 0, 255).astype(np.uint8))
+        for batch_number, image in enumerate(self.images_to_uint8(images)):
             filename_with_batch_num: str = filename.replace(
                 "%batch_num%", str(batch_number)
             )
             file: str = f"{filename_with_batch_num}_{counter:05}_.{filename_extension}"
-
-            xmp = self.inputs_to_xml(
-                creator,
-                rights,
-                title,
-                description,
-                subject,
-                instructions,
-                comment,
-                alt_text,
-                ext_description,
-                xml_string,
-                batch_number,
+            jobs.append((image, Path(full_output_folder) / file, xmps[batch_number]))
+            results.append(
+                {"filename": file, "subfolder": subfolder, "type": self.type}
             )
+            counter += 1
 
+        def write_job(img: Image, to_path: Path, xmp: str | bytes) -> None:
             self.save_image(
                 img,
                 image_type,
-                Path(full_output_folder) / file,
+                to_path,
                 xmp,
                 prompt,
                 extra_pnginfo,
+                pnginfo_texts=pnginfo_texts,
             )
 
-            results.append(
-                {"filename": file, "subfolder": subfolder, "type": self.type}
-            )
-            counter += 1
+        def save_job(job: tuple[np.ndarray, Path, str | bytes]) -> None:
+            image, to_path, xmp = job
+            write_job(self.uint8_to_pil_image(image), to_path, xmp)
 
+        if background_write:
+            # The pixels are already on the CPU, so the queued jobs don't hold
+            # on to (possibly GPU) tensors. Leave the compressing and writing
+            # to the background writer.
+            writer: JHBackgroundWriter = self.get_background_writer(save_workers)
+            for image, to_path, xmp in jobs:
+                img: Image = self.uint8_to_pil_image(image)
+                writer.submit(
+                    functools.partial(write_job, img, to_path, xmp),
+                    size=len(img.getbands()) * img.width * img.height,
+                )
+        elif save_workers > 1 and len(jobs) > 1:
+            with ThreadPoolExecutor(
+                max_workers=min(save_workers, len(jobs)),
+                thread_name_prefix="JHSaveImageWithXMPMetadata",
+            ) as executor:
+                # Consuming the iterator re-raises the first error, if any
+                for _ in executor.map(save_job, jobs):
+                    pass
+        else:
+            for job in jobs:
+                save_job(job)
+
+        # Background writes leave out the previews: the frontend would fetch
+        # them straight away, before the files exist
+        if background_write:
+            results = []
         return {"result": (images,), "ui": {"images": results}}
 
+    def images_to_uint8(self, images: torch.Tensor | list) -> list[np.ndarray]:
+        """
+        Converts a batch of images with values in [0, 1] to uint8 arrays.
+
+        The result matches `np.clip(255.0 * image, 0, 255).astype(np.uint8)`
+        for every image, but is computed without any full-size float
+        temporaries: the values are scaled and clamped in place, a chunk at a
+        time, in a small float32 scratch buffer and written straight into a
+        single preallocated uint8 buffer for the whole batch. The returned
+        arrays are views into that buffer.
+
+        A list of images with different shapes can't share a buffer, so
+        each image gets its own.
+        """
+        if len({tuple(image.shape) for image in images}) > 1:
+            return [
+                array for image in images for array in self.images_to_uint8([image])
+            ]
+
+        buffer: np.ndarray = np.empty((len(images), *images[0].shape), dtype=np.uint8)
+        flat_buffer: torch.Tensor = torch.from_numpy(buffer).view(len(images), -1)
+        scratch: torch.Tensor = torch.empty(
+            min(self.UINT8_CONVERSION_CHUNK_SIZE, flat_buffer.shape[1]),
+            dtype=torch.float32,
+        )
+
+        for flat_image, image in zip(flat_buffer, images, strict=True):
+            values: torch.Tensor = image.reshape(-1)
+            for start in range(0, values.numel(), scratch.numel()):
+                chunk: torch.Tensor = values[start : start + scratch.numel()]
+                chunk_scratch: torch.Tensor = scratch[: chunk.numel()]
+                chunk_scratch.copy_(chunk)  # Also moves it to the CPU
+                chunk_scratch.mul_(255.0).clamp_(0, 255)
+                # Truncates towards zero, just like `astype(np.uint8)`
+                flat_image[start : start + chunk.numel()].copy_(chunk_scratch)
+
+        return list(buffer)
+
+    def uint8_to_pil_image(self, array: np.ndarray) -> Image:
+        """
+        Wraps an HxW or HxWxC uint8 array in a PIL image, sharing its memory
+        where Pillow can (L and RGBA images) instead of copying it.
+        """
+        mode: str | None = (
+            "L" if array.ndim == 2 else self.UINT8_IMAGE_MODES.get(array.shape[-1])
+        )
+        if mode is None or array.ndim not in (2, 3) or not array.flags.c_contiguous:
+            return PIL.Image.fromarray(array)
+        return PIL.Image.frombuffer(
+            mode, (array.shape[1], array.shape[0]), array, "raw", mode, 0, 1
+        )
+
+    def get_background_writer(self, max_workers: int = 1) -> JHBackgroundWriter:
+        """
+        Returns the node's background writer, creating it on first use.
+
+        If `max_workers` has changed since the writer was created, the old
+        writer is flushed and closed and a new one takes its place.
+        """
+        writer: JHBackgroundWriter | None = self.background_writer
+        if writer is not None and writer.max_workers != max_workers:
+            self.background_writer = None
+            writer.close()
+            writer = None
+        if writer is None:
+            writer = self.background_writer = JHBackgroundWriter(
+                max_workers=max_workers,
+                max_pending_images=self.max_pending_images,
+                max_pending_bytes=self.max_pending_bytes,
+            )
+        return writer
+
     def get_batch_value(
         self, prop: str | list[str] | None, batch_number: int
     ) -> str | None:
@@ -245,23 +422,156 @@ class JHSaveImageWithXMPMetadataNode:
         xml_string: str | None,
         batch_number: int,
     ) -> str:
+        """
+        Returns the XMP packet for the image at `batch_number` in a batch,
+        built the same way as by `inputs_to_xml_batch`.
+        """
         if xml_string is not None:
-            xml: str = xml_string
-        else:
-            xmpmetadata = JHXMPMetadata()
-            xmpmetadata.creator = self.get_batch_value(creator, batch_number)
-            xmpmetadata.rights = self.get_batch_value(rights, batch_number)
-            xmpmetadata.title = self.get_batch_value(title, batch_number)
-            xmpmetadata.description = self.get_batch_value(description, batch_number)
-            xmpmetadata.subject = self.get_batch_value(subject, batch_number)
-            xmpmetadata.instructions = self.get_batch_value(instructions, batch_number)
-            xmpmetadata.comment = self.get_batch_value(comment, batch_number)
-            xmpmetadata.alt_text = self.get_batch_value(alt_text, batch_number)
-            xmpmetadata.ext_description = self.get_batch_value(
-                ext_description, batch_number
+            return xml_string
+        fields: dict[str, str | list[str] | None] = {
+            "creator": creator,
+            "rights": rights,
+            "title": title,
+            "description": description,
+            "subject": subject,
+            "instructions": instructions,
+            "comment": comment,
+            "alt_text": alt_text,
+            "ext_description": ext_description,
+        }
+        return JHXMPMetadata.build_packets(
+            {
+                name: self.get_batch_value(value, batch_number)
+                for name, value in fields.items()
+            },
+            1,
+        )[0]
+
+    def inputs_to_xml_batch(
+        self,
+        creator: str | list[str] | None,
+        rights: str | list[str] | None,
+        title: str | list[str] | None,
+        description: str | list[str] | None,
+        subject: str | list[str] | None,
+        instructions: str | list[str] | None,
+        comment: str | list[str] | None,
+        alt_text: str | list[str] | None,
+        ext_description: str | list[str] | None,
+        xml_string: str | None,
+        batch_size: int,
+    ) -> list[str]:
+        """
+        Returns the XMP packet for every image in a batch.
+
+        Identical packets are only rendered once per call. When all of the
+        metadata inputs are scalars (the common case), a single packet is
+        rendered and shared by the whole batch. Otherwise the per-image
+        values of the list inputs are used as a cache key, so images whose
+        values match an earlier image reuse that image's packet. Images
+        that share a packet share the same string object.
+
+        Raises:
+            ValueError: If a list input has fewer values than there are
+                images in the batch.
+        """
+        if xml_string is not None:
+            self._count_xmp_cache(batch_size, 1)
+            return [xml_string] * batch_size
+
+        fields: dict[str, str | list[str] | None] = {
+            "creator": creator,
+            "rights": rights,
+            "title": title,
+            "description": description,
+            "subject": subject,
+            "instructions": instructions,
+            "comment": comment,
+            "alt_text": alt_text,
+            "ext_description": ext_description,
+        }
+        columns: dict[str, list[str]] = {
+            name: value for name, value in fields.items() if isinstance(value, list)
+        }
+
+        if not columns:
+            self._count_xmp_cache(batch_size, 1)
+            return JHXMPMetadata.build_packets(fields, 1) * batch_size
+
+        for name, value in columns.items():
+            if len(value) < batch_size:
+                raise ValueError(
+                    f"Input '{name}' has {len(value)} values but the batch has "
+                    f"{batch_size} images"
+                )
+
+        rows: list[tuple[str | None, ...]] = [
+            tuple(
+                self.get_batch_value(value, batch_number) for value in columns.values()
             )
-            xml = xmpmetadata.to_wrapped_string()
-        return xml
+            for batch_number in range(batch_size)
+        ]
+        unique_rows: list[tuple[str | None, ...]] = list(dict.fromkeys(rows))
+        self._count_xmp_cache(batch_size, len(unique_rows))
+
+        packets: list[str] = JHXMPMetadata.build_packets(
+            {
+                **fields,
+                **{
+                    name: [row[column] for row in unique_rows]
+                    for column, name in enumerate(columns)
+                },
+            },
+            len(unique_rows),
+        )
+        cache: dict[tuple[str | None, ...], str] = dict(
+            zip(unique_rows, packets, strict=True)
+        )
+        return [cache[row] for row in rows]
+
+    def _count_xmp_cache(self, batch_size: int, rendered: int) -> None:
+        self.xmp_cache_misses += rendered
+        self.xmp_cache_hits += batch_size - rendered
+
+    def encode_xmp_packets(self, xmps: list[str]) -> list[bytes]:
+        # Images that share a packet share the same string object (see
+        # `inputs_to_xml_batch`), so each distinct packet is only encoded
+        # once.
+        encoded: dict[int, bytes] = {}
+        result: list[bytes] = []
+        for xmp in xmps:
+            data = encoded.get(id(xmp))
+            if data is None:
+                data = encoded[id(xmp)] = xmp.encode("utf-8")
+            result.append(data)
+        return result
+
+    def encode_pnginfo_texts(
+        self,
+        prompt: dict | str | bytes | None,
+        extra_pnginfo: dict[str, Any] | None,
+    ) -> dict[str, bytes]:
+        """
+        Encodes the prompt and workflow as the PNG text chunk payloads
+        ComfyUI expects, ready to be shared by every image in a batch.
+
+        Either value may already be encoded: bytes are used as-is, so a
+        caller that has the JSON on hand can skip encoding entirely.
+        """
+        texts: dict[str, bytes] = {}
+        if prompt is not None:
+            texts["prompt"] = self._encode_json_text(prompt)
+        if extra_pnginfo is not None:
+            texts["workflow"] = self._encode_json_text(extra_pnginfo["workflow"])
+        return texts
+
+    @staticmethod
+    def _encode_json_text(value: Any) -> bytes:  # noqa: ANN401
+        if isinstance(value, bytes):
+            return value
+        # json.dumps escapes everything outside ASCII, so this is exactly
+        # what PngInfo.add_text would have written for the string.
+        return json.dumps(value).encode("latin-1")
 
     def extension_for_type(self, image_type: JHSupportedImageTypes) -> str:
         filename_extension: str
@@ -283,18 +593,22 @@ class JHSaveImageWithXMPMetadataNode:
         image: Image,
         image_type: JHSupportedImageTypes,
         to_path: Path,
-        xmp: str,
-        prompt: str | None = None,
+        xmp: str | bytes,
+        prompt: dict | str | bytes | None = None,
         extra_pnginfo: dict[str, Any] | None = None,
+        pnginfo_texts: dict[str, bytes] | None = None,
     ) -> None:
+        if isinstance(xmp, bytes) and image_type != JHSupportedImageTypes.JPEG:
+            xmp = xmp.decode("utf-8")
+
         match image_type:
             case JHSupportedImageTypes.PNG_WITH_WORKFLOW:
                 pnginfo: PngInfo = PngInfo()
                 pnginfo.add_text("XML:com.adobe.xmp", xmp)
-                if prompt is not None:
-                    pnginfo.add_text("prompt", json.dumps(prompt))
-                if extra_pnginfo is not None:
-                    pnginfo.add_text("workflow", json.dumps(extra_pnginfo["workflow"]))
+                if pnginfo_texts is None:
+                    pnginfo_texts = self.encode_pnginfo_texts(prompt, extra_pnginfo)
+                for key, value in pnginfo_texts.items():
+                    pnginfo.add_text(key, value)
                 image.save(
                     to_path,
                     pnginfo=pnginfo,
@@ -313,7 +627,7 @@ class JHSaveImageWithXMPMetadataNode:
             case JHSupportedImageTypes.JPEG:
                 image.save(
                     to_path,
-                    xmp=xmp.encode("utf-8"),
+                    xmp=xmp if isinstance(xmp, bytes) else xmp.encode("utf-8"),
                 )
 
             case JHSupportedImageTypes.LOSSLESS_WEBP:
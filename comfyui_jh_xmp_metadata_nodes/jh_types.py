@@ -23,6 +23,7 @@ class JHNodeInputOutputTypeEnum(StrEnum):
     STRING = "STRING"
     INT = "INT"
     FLOAT = "FLOAT"
+    BOOLEAN = "BOOLEAN"
 
     PRIMITIVE = "STRING,FLOAT,INT,BOOLEAN"
 
@@ -40,7 +41,7 @@ JHTypesNodeInputOutputType = JHNodeInputOutputTypeEnum | JHAnyType | list[str]
 
 class JHNodeInputOutputTypeOptions(TypedDict, total=False):
     tooltip: str
-    default: str
+    default: str | int | float | bool
     placeholder: str
     multiline: bool
     dynamicPrompts: bool
@@ -60,6 +61,8 @@ class JHNodeInputOutputTypeOptions(TypedDict, total=False):
     image_upload: bool
 
 
+# The nodes memoize INPUT_TYPES with functools.cache, so the dicts they return
+# are shared between calls and must never be modified.
 class JHInputTypesType(TypedDict, total=False):
     required: Required[
         dict[str, tuple[JHTypesNodeInputOutputType, JHNodeInputOutputTypeOptions]]
@@ -57,11 +57,49 @@ print(parsed_metadata.title)  # Outputs: A Beautiful Sunset"""
 
 # pylint: disable=c-extension-no-member
 
+import functools
+import logging
+import os
 import re
+from enum import StrEnum
 from typing import Final
 
 from lxml import etree
 
+logger = logging.getLogger(__name__)
+
+
+class JHXMPSerializer(StrEnum):
+    """
+    The backends `JHXMPMetadata` can use to turn its properties into XML.
+
+    Both produce byte-for-byte identical output. `LXML` builds a real
+    element tree and hands it to `etree.tostring`; `TEMPLATE` glues
+    together precompiled string fragments, which is much cheaper when a
+    packet has to be written for every image in a large batch.
+
+    The default for new objects comes from the `JH_XMP_SERIALIZER`
+    environment variable ("lxml" or "template") and falls back to `LXML`.
+    """
+
+    LXML = "lxml"
+    TEMPLATE = "template"
+
+    @classmethod
+    def from_environment(cls) -> "JHXMPSerializer":
+        """
+        Returns the serializer named by `JH_XMP_SERIALIZER`, regardless of
+        case, or `LXML` (with a warning) if it names none.
+        """
+        value: str = os.environ.get("JH_XMP_SERIALIZER", cls.LXML).strip().lower()
+        try:
+            return cls(value)
+        except ValueError:
+            logger.warning(
+                "Unknown JH_XMP_SERIALIZER %r, using %r instead", value, cls.LXML.value
+            )
+            return cls.LXML
+
 
 class JHXMPMetadata:
     NAMESPACES: Final = {
@@ -76,7 +114,94 @@ class JHXMPMetadata:
         "Iptc4xmpExt": "http://iptc.org/std/Iptc4xmpExt/2008-02-29/",
     }
 
-    def __init__(self) -> None:
+    # Clark-notation ("{namespace}local") tags for the supported
+    # properties, mapped to (property name, rdf container tag, is a list).
+    # A container tag of None means the value is the element's own text.
+    _RDF_LI_TAG: Final = f"{{{NAMESPACES['rdf']}}}li"
+    _PROPERTY_TAGS: Final[dict[str, tuple[str, str | None, bool]]] = {
+        f"{{{NAMESPACES['dc']}}}creator": (
+            "creator",
+            f"{{{NAMESPACES['rdf']}}}Seq",
+            True,
+        ),
+        f"{{{NAMESPACES['dc']}}}rights": (
+            "rights",
+            f"{{{NAMESPACES['rdf']}}}Alt",
+            False,
+        ),
+        f"{{{NAMESPACES['dc']}}}title": (
+            "title",
+            f"{{{NAMESPACES['rdf']}}}Alt",
+            False,
+        ),
+        f"{{{NAMESPACES['dc']}}}description": (
+            "description",
+            f"{{{NAMESPACES['rdf']}}}Alt",
+            False,
+        ),
+        f"{{{NAMESPACES['dc']}}}subject": (
+            "subject",
+            f"{{{NAMESPACES['rdf']}}}Bag",
+            True,
+        ),
+        f"{{{NAMESPACES['photoshop']}}}Instructions": (
+            "instructions",
+            None,
+            False,
+        ),
+        f"{{{NAMESPACES['exif']}}}UserComment": (
+            "comment",
+            f"{{{NAMESPACES['rdf']}}}Alt",
+            False,
+        ),
+        f"{{{NAMESPACES['Iptc4xmpCore']}}}AltTextAccessibility": (
+            "alt_text",
+            None,
+            False,
+        ),
+        f"{{{NAMESPACES['Iptc4xmpCore']}}}ExtDescrAccessibility": (
+            "ext_description",
+            None,
+            False,
+        ),
+    }
+
+    # The same table keyed by property name, in canonical order:
+    # property name -> (property tag, rdf container tag, is a list).
+    _PROPERTIES: Final[dict[str, tuple[str, str | None, bool]]] = {
+        name: (tag, container_tag, is_list)
+        for tag, (name, container_tag, is_list) in _PROPERTY_TAGS.items()
+    }
+
+    XMPTK: Final = "Adobe XMP Core 6.0-c002 79.164861, 2016/09/14-01:09:01"
+    DIGITAL_SOURCE_TYPE: Final = (
+        "http://cv.iptc.org/newscodes/digitalsourcetype/trainedAlgorithmicMedia"
+    )
+
+    # Characters that may not appear in an XML 1.0 document at all. lxml
+    # refuses to serialize them, and so does the template serializer.
+    _XML_INVALID_CHARACTERS: Final = re.compile(
+        "[^\t\n\r\x20-\ud7ff\ue000-\ufffd\U00010000-\U0010ffff]"
+    )
+    # What `etree.tostring` escapes in text content. Non-ASCII characters
+    # become decimal character references, which `_escape_text` handles
+    # with the "xmlcharrefreplace" codec error handler.
+    _XML_TEXT_ESCAPES: Final = {
+        ord("&"): "&amp;",
+        ord("<"): "&lt;",
+        ord(">"): "&gt;",
+        ord("\r"): "&#13;",
+    }
+
+    XPACKET_BEGIN: Final = '<?xpacket begin="\ufeff" id="W5M0MpCehiHzreSzNTczkc9d"?>'
+    XPACKET_END: Final = '<?xpacket end="w"?>'
+
+    serializer: JHXMPSerializer = JHXMPSerializer.from_environment()
+
+    def __init__(self, serializer: JHXMPSerializer | None = None) -> None:
+        if serializer is not None:
+            self.serializer = JHXMPSerializer(serializer)
+
         self._creator: str | None = None
         self._rights: str | None = None
         self._title: str | None = None
@@ -87,46 +212,26 @@ class JHXMPMetadata:
         self._alt_text: str | None = None
         self._ext_description: str | None = None
 
-        # Set up the empty XMP metadata tree. We will add (and remove) elements
-        # as needed.
-        self._xmpmetadata = etree.Element(
-            "{adobe:ns:meta/}xmpmeta", nsmap=self.NAMESPACES, attrib={}
-        )
-        self._xmpmetadata.set(
-            "{adobe:ns:meta/}xmptk",
-            "Adobe XMP Core 6.0-c002 79.164861, 2016/09/14-01:09:01",
-        )
-        self._rdf = etree.SubElement(
-            self._xmpmetadata,
-            etree.QName(self.NAMESPACES["rdf"], "RDF"),
-            nsmap=self.NAMESPACES,
-            attrib={},
-        )
-        self._rdf_description = etree.SubElement(
-            self._rdf,
-            etree.QName(self.NAMESPACES["rdf"], "Description"),
-            nsmap=self.NAMESPACES,
-            attrib={"{http://www.w3.org/1999/02/22-rdf-syntax-ns#}about": ""},
-        )
-        self._digital_source_type = etree.SubElement(
-            self._rdf_description,
-            etree.QName(self.NAMESPACES["Iptc4xmpExt"], "DigitalSourceType"),
-            nsmap=self.NAMESPACES,
-            attrib={},
-        )
-        self._digital_source_type.text = (
-            "http://cv.iptc.org/newscodes/digitalsourcetype/trainedAlgorithmicMedia"
-        )
-
-        self._dc_creator_element = None
-        self._dc_rights_element = None
-        self._dc_title_element = None
-        self._dc_description_element = None
-        self._dc_subject_element = None
-        self._photoshop_instructions_element = None
-        self._exif_usercomment_element = None
-        self._Iptc4xmpCore_alt_text_element = None
-        self._Iptc4xmpCore_ext_description_element = None
+        # The properties above are the source of truth. The XML tree is
+        # only built when the metadata is serialized, and the resulting
+        # string is cached here until one of the properties changes.
+        # Objects that are only ever read from (e.g. the result of
+        # `from_string`) never build a tree at all.
+        self._xml_string: str | None = None
+
+        # Once built, the tree (or, for the template serializer, the
+        # rendered fragment for each property) is kept around and
+        # patched in place. Setters only record which properties
+        # changed; the next serialization updates just those, each in
+        # its own fixed slot. However many times a property is
+        # reassigned, the object holds at most one element (or fragment)
+        # per property.
+        self._tree: etree._Element | None = None
+        self._rdf_description: etree._Element | None = None
+        self._property_elements: dict[str, etree._Element] = {}
+        self._stale_elements: set[str] = set()
+        self._property_fragments: dict[str, str] = {}
+        self._stale_fragments: set[str] = set()
 
     @property
     def creator(self) -> str | None:
@@ -134,33 +239,10 @@ class JHXMPMetadata:
 
     @creator.setter
     def creator(self, value: str | None) -> None:
-        if value is None or value == "" or value.strip() == "":
-            self._creator = None
-            if self._dc_creator_element is not None:
-                self._rdf_description.remove(self._dc_creator_element)
-        else:
+        value = self._normalize_value(value)
+        if value != self._creator:
             self._creator = value
-            _creators = self._string_to_list(self._creator)
-            self._dc_creator_element = etree.SubElement(
-                self._rdf_description,
-                etree.QName(self.NAMESPACES["dc"], "creator"),
-                nsmap=self.NAMESPACES,
-                attrib={},
-            )
-            _seq = etree.SubElement(
-                self._dc_creator_element,
-                etree.QName(self.NAMESPACES["rdf"], "Seq"),
-                nsmap=self.NAMESPACES,
-                attrib={},
-            )
-            for _creator in _creators:
-                _li = etree.SubElement(
-                    _seq,
-                    etree.QName(self.NAMESPACES["rdf"], "li"),
-                    nsmap=self.NAMESPACES,
-                    attrib={etree.QName(self.NAMESPACES["xml"], "lang"): "x-default"},
-                )
-                _li.text = _creator
+            self._property_changed("creator")
 
     @property
     def rights(self) -> str | None:
@@ -168,31 +250,10 @@ class JHXMPMetadata:
 
     @rights.setter
     def rights(self, value: str | None) -> None:
-        if value is None or value == "" or value.strip() == "":
-            self._rights = None
-            if self._dc_rights_element is not None:
-                self._rdf_description.remove(self._dc_rights_element)
-        else:
+        value = self._normalize_value(value)
+        if value != self._rights:
             self._rights = value
-            self._dc_rights_element = etree.SubElement(
-                self._rdf_description,
-                etree.QName(self.NAMESPACES["dc"], "rights"),
-                nsmap=self.NAMESPACES,
-                attrib={},
-            )
-            _alt = etree.SubElement(
-                self._dc_rights_element,
-                etree.QName(self.NAMESPACES["rdf"], "Alt"),
-                nsmap=self.NAMESPACES,
-                attrib={},
-            )
-            _li = etree.SubElement(
-                _alt,
-                etree.QName(self.NAMESPACES["rdf"], "li"),
-                nsmap=self.NAMESPACES,
-                attrib={etree.QName(self.NAMESPACES["xml"], "lang"): "x-default"},
-            )
-            _li.text = self._rights
+            self._property_changed("rights")
 
     @property
     def title(self) -> str | None:
@@ -200,31 +261,10 @@ class JHXMPMetadata:
 
     @title.setter
     def title(self, value: str | None) -> None:
-        if value is None or value == "" or value.strip() == "":
-            self._title = None
-            if self._dc_title_element is not None:
-                self._rdf_description.remove(self._dc_title_element)
-        else:
+        value = self._normalize_value(value)
+        if value != self._title:
             self._title = value
-            self._dc_title_element = etree.SubElement(
-                self._rdf_description,
-                etree.QName(self.NAMESPACES["dc"], "title"),
-                nsmap=self.NAMESPACES,
-                attrib={},
-            )
-            _alt = etree.SubElement(
-                self._dc_title_element,
-                etree.QName(self.NAMESPACES["rdf"], "Alt"),
-                nsmap=self.NAMESPACES,
-                attrib={},
-            )
-            _li = etree.SubElement(
-                _alt,
-                etree.QName(self.NAMESPACES["rdf"], "li"),
-                nsmap=self.NAMESPACES,
-                attrib={etree.QName(self.NAMESPACES["xml"], "lang"): "x-default"},
-            )
-            _li.text = self._title
+            self._property_changed("title")
 
     @property
     def description(self) -> str | None:
@@ -232,31 +272,10 @@ class JHXMPMetadata:
 
     @description.setter
     def description(self, value: str | None) -> None:
-        if value is None or value == "" or value.strip() == "":
-            self._description = None
-            if self._dc_description_element is not None:
-                self._rdf_description.remove(self._dc_description_element)
-        else:
+        value = self._normalize_value(value)
+        if value != self._description:
             self._description = value
-            self._dc_description_element = etree.SubElement(
-                self._rdf_description,
-                etree.QName(self.NAMESPACES["dc"], "description"),
-                nsmap=self.NAMESPACES,
-                attrib={},
-            )
-            _alt = etree.SubElement(
-                self._dc_description_element,
-                etree.QName(self.NAMESPACES["rdf"], "Alt"),
-                nsmap=self.NAMESPACES,
-                attrib={},
-            )
-            _li = etree.SubElement(
-                _alt,
-                etree.QName(self.NAMESPACES["rdf"], "li"),
-                nsmap=self.NAMESPACES,
-                attrib={etree.QName(self.NAMESPACES["xml"], "lang"): "x-default"},
-            )
-            _li.text = self._description
+            self._property_changed("description")
 
     @property
     def subject(self) -> str | None:
@@ -264,33 +283,10 @@ class JHXMPMetadata:
 
     @subject.setter
     def subject(self, value: str | None) -> None:
-        if value is None or value == "" or value.strip() == "":
-            self._subject = None
-            if self._dc_subject_element is not None:
-                self._rdf_description.remove(self._dc_subject_element)
-        else:
+        value = self._normalize_value(value)
+        if value != self._subject:
             self._subject = value
-            _subjects = self._string_to_list(self._subject)
-            self._dc_subject_element = etree.SubElement(
-                self._rdf_description,
-                etree.QName(self.NAMESPACES["dc"], "subject"),
-                nsmap=self.NAMESPACES,
-                attrib={},
-            )
-            _bag = etree.SubElement(
-                self._dc_subject_element,
-                etree.QName(self.NAMESPACES["rdf"], "Bag"),
-                nsmap=self.NAMESPACES,
-                attrib={},
-            )
-            for _subject in _subjects:
-                _li = etree.SubElement(
-                    _bag,
-                    etree.QName(self.NAMESPACES["rdf"], "li"),
-                    nsmap=self.NAMESPACES,
-                    attrib={etree.QName(self.NAMESPACES["xml"], "lang"): "x-default"},
-                )
-                _li.text = _subject
+            self._property_changed("subject")
 
     @property
     def instructions(self) -> str | None:
@@ -298,19 +294,10 @@ class JHXMPMetadata:
 
     @instructions.setter
     def instructions(self, value: str | None) -> None:
-        if value is None or value == "" or value.strip() == "":
-            self._instructions = None
-            if self._photoshop_instructions_element is not None:
-                self._rdf_description.remove(self._photoshop_instructions_element)
-        else:
+        value = self._normalize_value(value)
+        if value != self._instructions:
             self._instructions = value
-            self._photoshop_instructions_element = etree.SubElement(
-                self._rdf_description,
-                etree.QName(self.NAMESPACES["photoshop"], "Instructions"),
-                nsmap=self.NAMESPACES,
-                attrib={},
-            )
-            self._photoshop_instructions_element.text = self._instructions
+            self._property_changed("instructions")
 
     @property
     def comment(self) -> str | None:
@@ -318,31 +305,10 @@ class JHXMPMetadata:
 
     @comment.setter
     def comment(self, value: str | None) -> None:
-        if value is None or value == "" or value.strip() == "":
-            self._comment = None
-            if self._exif_usercomment_element is not None:
-                self._rdf_description.remove(self._exif_usercomment_element)
-        else:
+        value = self._normalize_value(value)
+        if value != self._comment:
             self._comment = value
-            self._exif_usercomment_element = etree.SubElement(
-                self._rdf_description,
-                etree.QName(self.NAMESPACES["exif"], "UserComment"),
-                nsmap=self.NAMESPACES,
-                attrib={},
-            )
-            _alt = etree.SubElement(
-                self._exif_usercomment_element,
-                etree.QName(self.NAMESPACES["rdf"], "Alt"),
-                nsmap=self.NAMESPACES,
-                attrib={},
-            )
-            _li = etree.SubElement(
-                _alt,
-                etree.QName(self.NAMESPACES["rdf"], "li"),
-                nsmap=self.NAMESPACES,
-                attrib={etree.QName(self.NAMESPACES["xml"], "lang"): "x-default"},
-            )
-            _li.text = self._comment
+            self._property_changed("comment")
 
     @property
     def alt_text(self) -> str | None:
@@ -350,19 +316,10 @@ class JHXMPMetadata:
 
     @alt_text.setter
     def alt_text(self, value: str | None) -> None:
-        if value is None or value == "" or value.strip() == "":
-            self._alt_text = None
-            if self._Iptc4xmpCore_alt_text_element is not None:
-                self._rdf_description.remove(self._Iptc4xmpCore_alt_text_element)
-        else:
+        value = self._normalize_value(value)
+        if value != self._alt_text:
             self._alt_text = value
-            self._Iptc4xmpCore_alt_text_element = etree.SubElement(
-                self._rdf_description,
-                etree.QName(self.NAMESPACES["Iptc4xmpCore"], "AltTextAccessibility"),
-                nsmap=self.NAMESPACES,
-                attrib={},
-            )
-            self._Iptc4xmpCore_alt_text_element.text = self._alt_text
+            self._property_changed("alt_text")
 
     @property
     def ext_description(self) -> str | None:
@@ -370,28 +327,353 @@ class JHXMPMetadata:
 
     @ext_description.setter
     def ext_description(self, value: str | None) -> None:
-        if value is None or value == "" or value.strip() == "":
-            self._ext_description = None
-            if self._Iptc4xmpCore_ext_description_element is not None:
-                self._rdf_description.remove(self._Iptc4xmpCore_ext_description_element)
-        else:
+        value = self._normalize_value(value)
+        if value != self._ext_description:
             self._ext_description = value
-            self._Iptc4xmpCore_ext_description_element = etree.SubElement(
+            self._property_changed("ext_description")
+
+    @staticmethod
+    def _normalize_value(value: str | None) -> str | None:
+        if value is None or value == "" or value.strip() == "":
+            return None
+        return value
+
+    def _string_to_list(self, string: str) -> list[str]:
+        return re.split(r"[;,]\s*", string)
+
+    def _property_changed(self, name: str) -> None:
+        self._xml_string = None
+        self._stale_elements.add(name)
+        self._stale_fragments.add(name)
+
+    def _build_tree(self) -> etree._Element:
+        """
+        Returns the lxml tree for the current property values, building
+        the document skeleton the first time and otherwise updating only
+        the properties that changed since the last call.
+        """
+        if self._tree is None:
+            self._tree = etree.Element(
+                "{adobe:ns:meta/}xmpmeta", nsmap=self.NAMESPACES, attrib={}
+            )
+            self._tree.set("{adobe:ns:meta/}xmptk", self.XMPTK)
+            rdf = etree.SubElement(
+                self._tree,
+                etree.QName(self.NAMESPACES["rdf"], "RDF"),
+                nsmap=self.NAMESPACES,
+                attrib={},
+            )
+            self._rdf_description = etree.SubElement(
+                rdf,
+                etree.QName(self.NAMESPACES["rdf"], "Description"),
+                nsmap=self.NAMESPACES,
+                attrib={"{http://www.w3.org/1999/02/22-rdf-syntax-ns#}about": ""},
+            )
+            digital_source_type = etree.SubElement(
                 self._rdf_description,
-                etree.QName(self.NAMESPACES["Iptc4xmpCore"], "ExtDescrAccessibility"),
+                etree.QName(self.NAMESPACES["Iptc4xmpExt"], "DigitalSourceType"),
                 nsmap=self.NAMESPACES,
                 attrib={},
             )
-            self._Iptc4xmpCore_ext_description_element.text = self._ext_description
+            digital_source_type.text = self.DIGITAL_SOURCE_TYPE
+            self._stale_elements.update(self._PROPERTIES)
+
+        for name in self._PROPERTIES:
+            if name in self._stale_elements:
+                self._update_property_element(self._rdf_description, name)
+        self._stale_elements.clear()
+
+        return self._tree
+
+    def _update_property_element(
+        self, rdf_description: etree._Element, name: str
+    ) -> None:
+        tag, container_tag, is_list = self._PROPERTIES[name]
+        value: str | None = getattr(self, name)
+        element = self._property_elements.get(name)
+
+        if value is None:
+            if element is not None:
+                rdf_description.remove(element)
+                del self._property_elements[name]
+            return
+
+        if element is None:
+            # Keep the canonical property order: the new element goes
+            # right after DigitalSourceType and whichever properties that
+            # come before it are present.
+            index = 1
+            for other in self._PROPERTIES:
+                if other == name:
+                    break
+                if other in self._property_elements:
+                    index += 1
+            element = etree.Element(tag, nsmap=self.NAMESPACES, attrib={})
+            if container_tag is not None:
+                etree.SubElement(
+                    element, container_tag, nsmap=self.NAMESPACES, attrib={}
+                )
+            rdf_description.insert(index, element)
+            self._property_elements[name] = element
+
+        if container_tag is None:
+            element.text = value
+            return
+
+        # Reuse the existing rdf:li items, adding or dropping items only
+        # when the number of list entries changes.
+        container = element[0]
+        items = self._string_to_list(value) if is_list else [value]
+        existing = list(container)
+        for li, item in zip(existing, items, strict=False):
+            li.text = item
+        for item in items[len(existing) :]:
+            li = etree.SubElement(
+                container,
+                self._RDF_LI_TAG,
+                nsmap=self.NAMESPACES,
+                attrib={etree.QName(self.NAMESPACES["xml"], "lang"): "x-default"},
+            )
+            li.text = item
+        for li in existing[len(items) :]:
+            container.remove(li)
 
-    def _string_to_list(self, string: str) -> list[str]:
-        return re.split(r"[;,]\s*", string)
+    @classmethod
+    @functools.cache
+    def _template_fragments(
+        cls,
+    ) -> tuple[str, str, dict[str, tuple[str, str, str, str, bool]]]:
+        """
+        Precompiles the constant parts of a packet for the template
+        serializer.
+
+        Returns:
+            A tuple of (head, tail, properties). The head runs from the
+            opening xmpmeta tag up to and including DigitalSourceType, the
+            tail closes the document, and properties maps each property
+            name to (open, item open, item close, close, is a list)
+            fragments. For properties without an rdf container the item
+            fragments are empty strings.
+        """
+        prefixes = {uri: prefix for prefix, uri in cls.NAMESPACES.items()}
+
+        def qname(clark: str) -> str:
+            uri, local = clark[1:].split("}")
+            return f"{prefixes[uri]}:{local}"
+
+        namespace_declarations = " ".join(
+            f'xmlns:{prefix}="{uri}"'
+            for prefix, uri in cls.NAMESPACES.items()
+            if prefix != "xml"
+        )
+        head = (
+            f'<x:xmpmeta {namespace_declarations} x:xmptk="{cls.XMPTK}">'
+            '<rdf:RDF><rdf:Description rdf:about="">'
+            "<Iptc4xmpExt:DigitalSourceType>"
+            f"{cls.DIGITAL_SOURCE_TYPE}"
+            "</Iptc4xmpExt:DigitalSourceType>"
+        )
+        tail = "</rdf:Description></rdf:RDF></x:xmpmeta>"
+
+        li = qname(cls._RDF_LI_TAG)
+        properties: dict[str, tuple[str, str, str, str, bool]] = {}
+        for tag, (name, container_tag, is_list) in cls._PROPERTY_TAGS.items():
+            if container_tag is None:
+                properties[name] = (
+                    f"<{qname(tag)}>",
+                    "",
+                    "",
+                    f"</{qname(tag)}>",
+                    False,
+                )
+            else:
+                properties[name] = (
+                    f"<{qname(tag)}><{qname(container_tag)}>",
+                    f'<{li} xml:lang="x-default">',
+                    f"</{li}>",
+                    f"</{qname(container_tag)}></{qname(tag)}>",
+                    is_list,
+                )
+
+        return head, tail, properties
+
+    @classmethod
+    def _escape_text(cls, text: str) -> str:
+        if cls._XML_INVALID_CHARACTERS.search(text) is not None:
+            raise ValueError(
+                "All strings must be XML compatible: Unicode or ASCII, no NULL "
+                "bytes or control characters"
+            )
+        return (
+            text.translate(cls._XML_TEXT_ESCAPES)
+            .encode("ascii", "xmlcharrefreplace")
+            .decode("ascii")
+        )
+
+    def _render_property(self, name: str, value: str) -> str:
+        open_tag, item_open, item_close, close_tag, is_list = (
+            self._template_fragments()[2][name]
+        )
+        if not item_open:
+            return f"{open_tag}{self._escape_text(value)}{close_tag}"
+        items = self._string_to_list(value) if is_list else [value]
+        return "".join(
+            [
+                open_tag,
+                *(
+                    f"{item_open}{self._escape_text(item)}{item_close}"
+                    for item in items
+                ),
+                close_tag,
+            ]
+        )
+
+    def _render_template(self) -> str:
+        head, tail, _ = self._template_fragments()
+
+        for name in self._stale_fragments:
+            value: str | None = getattr(self, name)
+            if value is None:
+                self._property_fragments.pop(name, None)
+            else:
+                self._property_fragments[name] = self._render_property(name, value)
+        self._stale_fragments.clear()
+
+        parts = [head]
+        for name in self._PROPERTIES:
+            fragment = self._property_fragments.get(name)
+            if fragment is not None:
+                parts.append(fragment)
+        parts.append(tail)
+        return "".join(parts)
 
     def to_string(self) -> str:
-        return etree.tostring(self._xmpmetadata).decode("utf-8")
+        if self._xml_string is None:
+            if self.serializer == JHXMPSerializer.TEMPLATE:
+                self._xml_string = self._render_template()
+            else:
+                self._xml_string = etree.tostring(self._build_tree()).decode("utf-8")
+        return self._xml_string
 
     def to_wrapped_string(self) -> str:
-        return f"""<?xpacket begin="\ufeff" id="W5M0MpCehiHzreSzNTczkc9d"?>{self.to_string()}<?xpacket end="w"?>"""  # noqa: E501
+        return f"{self.XPACKET_BEGIN}{self.to_string()}{self.XPACKET_END}"
+
+    @classmethod
+    def build_packets(
+        cls, fields: dict[str, str | list[str] | None], n: int
+    ) -> list[str]:
+        """
+        Builds complete, wrapped XMP packets for a whole batch of images
+        in one call.
+
+        The inputs are column-wise: a scalar (or None) applies to every
+        image, while a list holds one value per image. Everything that is
+        the same for all images, including the document skeleton and the
+        scalar properties, is rendered once and shared; only the list
+        properties are rendered per image, and then only once per
+        distinct value. When every input is a scalar, the batch costs the
+        same as a single packet.
+
+        The packets are rendered with the class's default `serializer`.
+        With `LXML`, every distinct image is rendered as a whole through
+        `to_wrapped_string`, so only the template serializer shares the
+        constant parts. Either way the packets are byte-for-byte identical
+        to what `to_wrapped_string` produces for an object with the same
+        property values.
+
+        Args:
+            fields (dict): Property values keyed by property name (e.g.
+                "creator", "title"). Missing properties are left empty.
+            n (int): The number of images in the batch.
+
+        Returns:
+            A list of `n` wrapped XMP packets, one per image.
+
+        Raises:
+            ValueError: If a property name is not supported, or if a list
+                has fewer than `n` values.
+        """
+        unknown = fields.keys() - cls._PROPERTIES.keys()
+        if unknown:
+            raise ValueError(f"Unsupported XMP properties: {sorted(unknown)}")
+        for name, value in fields.items():
+            if isinstance(value, list) and len(value) < n:
+                raise ValueError(
+                    f"Property '{name}' has {len(value)} values but the batch has "
+                    f"{n} images"
+                )
+
+        if cls.serializer == JHXMPSerializer.LXML:
+            return cls._build_packets_per_image(fields, n)
+
+        head, tail, _ = cls._template_fragments()
+        renderer = cls(serializer=JHXMPSerializer.TEMPLATE)
+
+        def render(name: str, value: str | None) -> str:
+            value = cls._normalize_value(value)
+            return "" if value is None else renderer._render_property(name, value)
+
+        # The packet as a sequence of segments: runs of constant text are
+        # merged into a single string, and list properties contribute one
+        # rendered fragment per image.
+        segments: list[str | list[str]] = []
+        constant: list[str] = [cls.XPACKET_BEGIN, head]
+
+        for name in cls._PROPERTIES:
+            value = fields.get(name)
+            if not isinstance(value, list):
+                constant.append(render(name, value))
+                continue
+
+            rendered: dict[str | None, str] = {}
+            column: list[str] = []
+            for item in value[:n]:
+                if item not in rendered:
+                    rendered[item] = render(name, item)
+                column.append(rendered[item])
+
+            if len(rendered) == 1:
+                # Every image has the same value, so treat it as constant
+                constant.append(column[0])
+                continue
+
+            segments.append("".join(constant))
+            segments.append(column)
+            constant = []
+
+        constant.extend([tail, cls.XPACKET_END])
+        if not segments:
+            return ["".join(constant)] * n
+        segments.append("".join(constant))
+
+        return [
+            "".join(
+                segment if isinstance(segment, str) else segment[i]
+                for segment in segments
+            )
+            for i in range(n)
+        ]
+
+    @classmethod
+    def _build_packets_per_image(
+        cls, fields: dict[str, str | list[str] | None], n: int
+    ) -> list[str]:
+        # Renders each distinct combination of values once, as a whole
+        packets: dict[tuple[str | None, ...], str] = {}
+        result: list[str] = []
+        for i in range(n):
+            row: tuple[str | None, ...] = tuple(
+                value[i] if isinstance(value, list) else value
+                for value in fields.values()
+            )
+            packet: str | None = packets.get(row)
+            if packet is None:
+                metadata = cls(serializer=JHXMPSerializer.LXML)
+                for name, value in zip(fields, row, strict=True):
+                    setattr(metadata, name, value)
+                packet = packets[row] = metadata.to_wrapped_string()
+            result.append(packet)
+        return result
 
     @classmethod
     def from_string(cls, xml_string: str) -> "JHXMPMetadata":
@@ -404,64 +686,60 @@ class JHXMPMetadata:
             # In case of invalid XML, return an empty instance
             return instance
 
-        creator_list: list[str] = list()
-        dc_creator_element = root.xpath(
-            "//dc:creator/rdf:Seq/rdf:li", namespaces=cls.NAMESPACES
-        )
-        if len(dc_creator_element) > 0:
-            for creator in dc_creator_element:
-                creator_list.append(creator.text)
-            instance.creator = ", ".join(creator_list)
-
-        dc_rights_element = root.xpath(
-            "//dc:rights/rdf:Alt/rdf:li", namespaces=cls.NAMESPACES
-        )
-        if len(dc_rights_element) > 0:
-            instance.rights = dc_rights_element[0].text
-
-        dc_title_element = root.xpath(
-            "//dc:title/rdf:Alt/rdf:li", namespaces=cls.NAMESPACES
-        )
-        if len(dc_title_element) > 0:
-            instance.title = dc_title_element[0].text
-
-        dc_description_element = root.xpath(
-            "//dc:description/rdf:Alt/rdf:li", namespaces=cls.NAMESPACES
-        )
-        if len(dc_description_element) > 0:
-            instance.description = dc_description_element[0].text
-
-        dc_subject_element = root.xpath(
-            "//dc:subject/rdf:Bag/rdf:li", namespaces=cls.NAMESPACES
-        )
-        if len(dc_subject_element) > 0:
-            subject_list: list[str] = list()
-            for subject in dc_subject_element:
-                subject_list.append(subject.text)
-            instance.subject = ", ".join(subject_list)
-
-        photoshop_instructions_element = root.xpath(
-            "//photoshop:Instructions", namespaces=cls.NAMESPACES
-        )
-        if len(photoshop_instructions_element) > 0:
-            instance.instructions = photoshop_instructions_element[0].text
-
-        dc_comment_element = root.xpath(
-            "//exif:UserComment/rdf:Alt/rdf:li", namespaces=cls.NAMESPACES
-        )
-        if len(dc_comment_element) > 0:
-            instance.comment = dc_comment_element[0].text
-
-        Iptc4xmpCore_alt_text_element = root.xpath(
-            "//Iptc4xmpCore:AltTextAccessibility", namespaces=cls.NAMESPACES
-        )
-        if len(Iptc4xmpCore_alt_text_element) > 0:
-            instance.alt_text = Iptc4xmpCore_alt_text_element[0].text
-
-        Iptc4xmpCore_ext_description_element = root.xpath(
-            "//Iptc4xmpCore:ExtDescrAccessibility", namespaces=cls.NAMESPACES
-        )
-        if len(Iptc4xmpCore_ext_description_element) > 0:
-            instance.ext_description = Iptc4xmpCore_ext_description_element[0].text
+        for name, value in cls._fields_from_tree(root).items():
+            setattr(instance, name, value)
 
         return instance
+
+    @classmethod
+    def _fields_from_tree(cls, root: etree._Element) -> dict[str, str | None]:
+        """
+        Collects every supported property from a parsed XMP tree in a
+        single document-order walk, reading each property's value from its
+        immediate children.
+
+        Args:
+            root (etree._Element): The root of the parsed XMP document.
+
+        Returns:
+            A dictionary mapping property names to their values, in
+            canonical property order. Only properties that were found in
+            the tree are included.
+        """
+        properties = cls._PROPERTY_TAGS
+        li_tag = cls._RDF_LI_TAG
+
+        values: dict[str, str | None] = {}
+        lists: dict[str, list[str]] = {}
+
+        for element in root.iter(*properties):
+            name, container_tag, is_list = properties[element.tag]
+
+            if container_tag is None:
+                if name not in values:
+                    values[name] = element.text
+                continue
+
+            if not is_list and name in values:
+                continue
+
+            for container in element:
+                if container.tag != container_tag:
+                    continue
+                for li in container:
+                    if li.tag != li_tag:
+                        continue
+                    if is_list:
+                        lists.setdefault(name, []).append(li.text)
+                    elif name not in values:
+                        values[name] = li.text
+
+        for name, items in lists.items():
+            values[name] = ", ".join(items)
+
+        # Hand the values back in the canonical property order rather
+        # than document order, so callers that set them one by one build
+        # the same tree regardless of how the source packet was laid out.
+        return {
+            name: values[name] for name, _, _ in properties.values() if name in values
+        }
@@ -0,0 +1,89 @@
+"""
+This module provides the `JHXMPPacketScanner` class for finding the XMP
+packet embedded in a file without decoding it.
+
+XMP packets are stored as plain UTF-8 text in nearly every format that
+can carry them (JPEG APP1 segments, PNG iTXt chunks, WebP XMP chunks,
+TIFF and PSD tags, PDF streams and so on), wrapped in
+`<?xpacket begin=...?>` and `<?xpacket end=...?>` processing
+instructions. This is exactly so that tools that don't understand a
+file's format can still find its metadata by scanning the bytes. The
+scanner memory-maps the file and searches for those markers, so only
+the packet itself is ever copied out of the file.
+
+Packets that have been compressed (PNG zTXt chunks, for example) or
+encoded as UTF-16 or UTF-32 can't be found this way.
+
+References:
+- XMP Specification Part 3, "Scanning files for XMP packets":
+  https://developer.adobe.com/xmp/docs/XMPSpecifications/
+
+Example Usage:
+```python
+from jh_xmp_packet_scanner import JHXMPPacketScanner
+
+packet = JHXMPPacketScanner.scan_file("image.jpeg")
+if packet is not None:
+    metadata = JHXMPMetadata.from_string(packet.decode("utf-8"))
+```
+"""
+
+import mmap
+import os
+from typing import Final
+
+
+class JHXMPPacketScanner:
+    XPACKET_BEGIN: Final = b"<?xpacket begin="
+    XPACKET_END: Final = b"<?xpacket end="
+    PROCESSING_INSTRUCTION_END: Final = b"?>"
+
+    # Some writers leave out the xpacket wrapper, in which case the best we
+    # can do is to look for the x:xmpmeta element itself.
+    XMPMETA_START: Final = b"<x:xmpmeta"
+    XMPMETA_END: Final = b"</x:xmpmeta>"
+
+    @classmethod
+    def scan_file(cls, path: str | os.PathLike) -> bytes | None:
+        """
+        Returns the first XMP packet in the file at `path`, or None if there
+        isn't one.
+
+        The file is memory-mapped rather than read, so scanning a large file
+        only touches the pages the search passes over and copies nothing
+        but the packet.
+
+        Raises:
+            OSError: If the file can't be opened or mapped.
+        """
+        with open(path, "rb") as f:
+            if os.fstat(f.fileno()).st_size == 0:
+                return None  # Empty files can't be memory-mapped
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+                return cls.scan_bytes(data)
+
+    @classmethod
+    def scan_bytes(cls, data: bytes | mmap.mmap) -> bytes | None:
+        """
+        Returns the first XMP packet in `data`, or None if there isn't one.
+
+        The packet runs from the start of its `<?xpacket begin=` processing
+        instruction to the end of its `<?xpacket end=...?>` one, padding
+        included, just as it was written. If there are no xpacket markers,
+        a bare `<x:xmpmeta>` element is returned instead.
+        """
+        begin: int = data.find(cls.XPACKET_BEGIN)
+        if begin != -1:
+            end: int = data.find(cls.XPACKET_END, begin)
+            if end != -1:
+                close: int = data.find(cls.PROCESSING_INSTRUCTION_END, end)
+                if close != -1:
+                    return data[begin : close + len(cls.PROCESSING_INSTRUCTION_END)]
+
+        start: int = data.find(cls.XMPMETA_START)
+        if start == -1:
+            return None
+        end = data.find(cls.XMPMETA_END, start)
+        if end == -1:
+            return None
+        return data[start : end + len(cls.XMPMETA_END)]
@@ -0,0 +1,192 @@
+import threading
+import time
+from collections.abc import Iterator
+
+import pytest
+
+from comfyui_jh_xmp_metadata_nodes import jh_background_writer
+from comfyui_jh_xmp_metadata_nodes.jh_background_writer import JHBackgroundWriter
+
+# region Fixtures
+
+
+@pytest.fixture
+def writer() -> Iterator[JHBackgroundWriter]:
+    writer = JHBackgroundWriter(max_pending_images=2, max_pending_bytes=100)
+    yield writer
+    writer.close()
+
+
+# endregion Fixtures
+
+# region Tests
+
+
+@pytest.mark.parametrize(
+    "kwargs",
+    [
+        {"max_workers": 0},
+        {"max_pending_images": 0},
+        {"max_pending_bytes": 0},
+    ],
+)
+def test_invalid_limits(kwargs: dict) -> None:
+    with pytest.raises(ValueError, match="must be at least 1"):
+        JHBackgroundWriter(**kwargs)
+
+
+def test_submit_returns_before_job_runs(writer: JHBackgroundWriter) -> None:
+    gate = threading.Event()
+    done = threading.Event()
+
+    def job() -> None:
+        gate.wait()
+        done.set()
+
+    writer.submit(job, size=10)
+    assert not done.is_set()
+    assert writer.pending_images == 1
+    assert writer.pending_bytes == 10
+
+    gate.set()
+    assert writer.flush(timeout=5)
+    assert done.is_set()
+    assert writer.pending_images == 0
+    assert writer.pending_bytes == 0
+
+
+def test_backpressure_on_image_count(writer: JHBackgroundWriter) -> None:
+    gate = threading.Event()
+    writer.submit(gate.wait)
+    writer.submit(gate.wait)
+
+    submitted = threading.Event()
+    thread = threading.Thread(
+        target=lambda: (writer.submit(gate.wait), submitted.set())
+    )
+    thread.start()
+    assert not submitted.wait(0.1)
+
+    gate.set()
+    assert submitted.wait(5)
+    thread.join()
+    writer.flush(timeout=5)
+
+
+def test_backpressure_on_bytes(writer: JHBackgroundWriter) -> None:
+    gate = threading.Event()
+    writer.submit(gate.wait, size=60)
+
+    submitted = threading.Event()
+    thread = threading.Thread(
+        target=lambda: (writer.submit(gate.wait, size=60), submitted.set())
+    )
+    thread.start()
+    assert not submitted.wait(0.1)
+
+    gate.set()
+    assert submitted.wait(5)
+    thread.join()
+    writer.flush(timeout=5)
+
+
+def test_oversized_job_is_accepted_when_queue_is_empty(
+    writer: JHBackgroundWriter,
+) -> None:
+    ran = threading.Event()
+    writer.submit(ran.set, size=1000)
+    writer.flush(timeout=5)
+    assert ran.is_set()
+
+
+def test_flush_timeout(writer: JHBackgroundWriter) -> None:
+    gate = threading.Event()
+    writer.submit(gate.wait)
+    assert writer.flush(timeout=0.05) is False
+    gate.set()
+    assert writer.flush(timeout=5) is True
+
+
+def test_errors_are_raised_on_next_call(writer: JHBackgroundWriter) -> None:
+    gate = threading.Event()
+
+    def failing_job() -> None:
+        gate.wait()
+        raise OSError("Disk full")
+
+    writer.submit(failing_job)
+    writer.submit(failing_job)
+    gate.set()
+    while writer.pending_images:
+        time.sleep(0.01)
+
+    with pytest.raises(RuntimeError, match="2 background image write") as exc_info:
+        writer.submit(lambda: None)
+    assert isinstance(exc_info.value.__cause__, OSError)
+
+    # Errors are only reported once
+    writer.submit(lambda: None)
+    writer.flush(timeout=5)
+
+
+def test_flush_raises_errors(writer: JHBackgroundWriter) -> None:
+    writer.submit(lambda: 1 / 0)
+    with pytest.raises(RuntimeError) as exc_info:
+        writer.flush(timeout=5)
+    assert isinstance(exc_info.value.__cause__, ZeroDivisionError)
+
+
+def test_close_waits_for_queued_jobs() -> None:
+    writer = JHBackgroundWriter(max_workers=2)
+    results: list[int] = []
+
+    def job(i: int) -> None:
+        time.sleep(0.01)
+        results.append(i)
+
+    for i in range(5):
+        writer.submit(lambda i=i: job(i))
+    writer.close()
+
+    assert sorted(results) == list(range(5))
+    with pytest.raises(RuntimeError, match="closed"):
+        writer.submit(lambda: None)
+
+
+def test_close_open_writers_at_exit() -> None:
+    writer = JHBackgroundWriter()
+    gate = threading.Event()
+    ran = threading.Event()
+    writer.submit(lambda: (gate.wait(), ran.set()))
+    assert writer in jh_background_writer._open_writers
+
+    gate.set()
+    jh_background_writer._close_open_writers()
+
+    assert ran.is_set()
+    assert writer not in jh_background_writer._open_writers
+
+
+def test_close_open_writers_at_exit_reports_errors() -> None:
+    failing = JHBackgroundWriter()
+    other = JHBackgroundWriter()
+    ran = threading.Event()
+    failing.submit(lambda: 1 / 0)
+    other.submit(ran.set)
+
+    with pytest.raises(RuntimeError):
+        jh_background_writer._close_open_writers()
+    assert ran.is_set()
+    assert failing not in jh_background_writer._open_writers
+    assert other not in jh_background_writer._open_writers
+
+
+def test_jobs_overlap_with_multiple_workers() -> None:
+    writer = JHBackgroundWriter(max_workers=4)
+    barrier = threading.Barrier(4, timeout=5)
+    for _ in range(4):
+        writer.submit(barrier.wait)
+    writer.close()  # Would raise BrokenBarrierError if the jobs ran serially
+
+
+# endregion Tests
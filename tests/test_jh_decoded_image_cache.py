@@ -0,0 +1,107 @@
+import threading
+
+import pytest
+
+from comfyui_jh_xmp_metadata_nodes.jh_decoded_image_cache import (
+    JHDecodedImageCache,
+    JHDecodedImageCacheInfo,
+)
+
+
+def test_get_miss_and_hit() -> None:
+    cache: JHDecodedImageCache[str] = JHDecodedImageCache(max_bytes=100)
+
+    assert cache.get("a") is None
+    cache.put("a", "value", size=10)
+    assert cache.get("a") == "value"
+
+    assert cache.cache_info() == JHDecodedImageCacheInfo(
+        hits=1, misses=1, evictions=0, max_bytes=100, current_bytes=10, entries=1
+    )
+
+
+def test_put_evicts_least_recently_used() -> None:
+    cache: JHDecodedImageCache[str] = JHDecodedImageCache(max_bytes=30)
+    cache.put("a", "a", size=10)
+    cache.put("b", "b", size=10)
+    cache.put("c", "c", size=10)
+    # Using "a" makes "b" the least recently used
+    cache.get("a")
+
+    cache.put("d", "d", size=15)
+
+    assert cache.get("b") is None
+    assert cache.get("c") is None
+    assert cache.get("a") == "a"
+    assert cache.get("d") == "d"
+    info = cache.cache_info()
+    assert (info.evictions, info.current_bytes, info.entries) == (2, 25, 2)
+
+
+def test_put_replaces_existing_value() -> None:
+    cache: JHDecodedImageCache[str] = JHDecodedImageCache(max_bytes=30)
+    cache.put("a", "old", size=20)
+    cache.put("a", "new", size=25)
+
+    assert cache.get("a") == "new"
+    info = cache.cache_info()
+    assert (info.evictions, info.current_bytes, info.entries) == (0, 25, 1)
+
+
+def test_put_skips_value_larger_than_cache() -> None:
+    cache: JHDecodedImageCache[str] = JHDecodedImageCache(max_bytes=30)
+    cache.put("a", "a", size=10)
+
+    cache.put("b", "b", size=31)
+
+    assert cache.get("b") is None
+    assert cache.get("a") == "a"
+    assert cache.cache_info().evictions == 0
+
+
+def test_zero_max_bytes_disables_cache() -> None:
+    cache: JHDecodedImageCache[str] = JHDecodedImageCache(max_bytes=0)
+    cache.put("a", "a", size=1)
+
+    assert cache.get("a") is None
+    assert cache.cache_info().entries == 0
+
+
+def test_negative_max_bytes() -> None:
+    with pytest.raises(ValueError, match="max_bytes"):
+        JHDecodedImageCache(max_bytes=-1)
+
+
+def test_cache_clear() -> None:
+    cache: JHDecodedImageCache[str] = JHDecodedImageCache(max_bytes=30)
+    cache.put("a", "a", size=10)
+    cache.get("a")
+    cache.get("b")
+
+    cache.cache_clear()
+
+    assert cache.cache_info() == JHDecodedImageCacheInfo(0, 0, 0, 30, 0, 0)
+    assert cache.get("a") is None
+
+
+def test_concurrent_use_keeps_size_consistent() -> None:
+    cache: JHDecodedImageCache[int] = JHDecodedImageCache(max_bytes=1000)
+
+    def work(offset: int) -> None:
+        for i in range(2000):
+            key = (offset + i) % 300
+            if cache.get(key) is None:
+                cache.put(key, key, size=key % 7 + 1)
+
+    threads = [threading.Thread(target=work, args=(n * 50,)) for n in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    info = cache.cache_info()
+    assert info.current_bytes <= 1000
+    assert info.hits + info.misses == 4 * 2000
+    assert info.current_bytes == sum(
+        key % 7 + 1 for key in range(300) if cache.get(key) is not None
+    )
@@ -0,0 +1,157 @@
+import os
+import time
+from pathlib import Path
+
+import numpy as np
+import pytest
+import torch
+
+from comfyui_jh_xmp_metadata_nodes.jh_decoded_tensor_disk_cache import (
+    JHDecodedTensorDiskCache,
+    JHDiskCacheEntry,
+)
+
+
+def make_entry(size: int, xml_string: str = "<x:xmpmeta/>") -> JHDiskCacheEntry:
+    image = np.arange(size * size * 3, dtype=np.float32).reshape(1, size, size, 3)
+    mask = np.ones((1, size, size), dtype=np.float32)
+    return JHDiskCacheEntry(image, mask, xml_string)
+
+
+def age(path: str, seconds: float) -> None:
+    past = time.time() - seconds
+    os.utime(path, (past, past))
+
+
+def test_put_and_get(tmp_path: Path) -> None:
+    cache = JHDecodedTensorDiskCache(tmp_path, max_bytes=1 << 20)
+    entry = make_entry(8, "Tëst ✓")
+
+    assert cache.get(("a",)) is None
+    cache.put(("a",), entry)
+    loaded = cache.get(("a",))
+
+    assert loaded is not None
+    assert isinstance(loaded.image, np.memmap)
+    np.testing.assert_array_equal(loaded.image, entry.image)
+    np.testing.assert_array_equal(loaded.mask, entry.mask)
+    assert loaded.xml_string == "Tëst ✓"
+    info = cache.cache_info()
+    assert (info.hits, info.misses, info.entries) == (1, 1, 1)
+    assert info.current_bytes >= entry.image.nbytes + entry.mask.nbytes
+
+
+@pytest.mark.parametrize("dtype", [np.float32, np.float16, np.uint8])
+def test_get_wraps_into_tensor_without_copy(tmp_path: Path, dtype: type) -> None:
+    cache = JHDecodedTensorDiskCache(tmp_path, max_bytes=1 << 20)
+    image = np.full((2, 4, 4, 3), 7, dtype=dtype)
+    cache.put(("a",), JHDiskCacheEntry(image, image[..., 0], ""))
+    loaded = cache.get(("a",))
+
+    tensor = torch.from_numpy(loaded.image)
+    assert tensor.data_ptr() == loaded.image.ctypes.data
+    # Writing to the tensor doesn't change the file
+    tensor.zero_()
+    assert np.all(cache.get(("a",)).image == 7)
+
+
+def test_put_evicts_least_recently_used(tmp_path: Path) -> None:
+    entry = make_entry(16)
+    # The cap counts the files, .npy headers and all
+    sizing_cache = JHDecodedTensorDiskCache(tmp_path / "sizing", max_bytes=1 << 20)
+    sizing_cache.put(("a",), entry)
+    entry_bytes = sizing_cache.cache_info().current_bytes
+    cache = JHDecodedTensorDiskCache(tmp_path / "cache", max_bytes=3 * entry_bytes)
+    for n, key in enumerate(["a", "b", "c"]):
+        cache.put((key,), entry)
+        age(cache.entry_path((key,)), 100 - n)
+    # Using "a" makes "b" the least recently used
+    cache.get(("a",))
+
+    cache.put(("d",), entry)
+
+    assert not os.path.exists(cache.entry_path(("b",)))
+    assert all(os.path.exists(cache.entry_path((key,))) for key in "acd")
+    info = cache.cache_info()
+    assert (info.evictions, info.entries) == (1, 3)
+    assert info.current_bytes == info.max_bytes
+
+
+def test_put_skips_entry_larger_than_cache(tmp_path: Path) -> None:
+    cache = JHDecodedTensorDiskCache(tmp_path, max_bytes=100)
+
+    cache.put(("a",), make_entry(16))
+
+    assert cache.get(("a",)) is None
+    assert os.listdir(tmp_path) == []
+
+
+def test_put_replaces_existing_entry(tmp_path: Path) -> None:
+    cache = JHDecodedTensorDiskCache(tmp_path, max_bytes=1 << 20)
+    cache.put(("a",), make_entry(8, "old"))
+    cache.put(("a",), make_entry(4, "new"))
+
+    loaded = cache.get(("a",))
+    assert loaded.xml_string == "new"
+    assert loaded.image.shape == (1, 4, 4, 3)
+    assert cache.cache_info().entries == 1
+
+
+def test_put_failure_leaves_nothing_behind(tmp_path: Path) -> None:
+    cache = JHDecodedTensorDiskCache(tmp_path, max_bytes=1 << 20)
+    object_array = np.array([object()])
+
+    with pytest.raises(ValueError):
+        cache.put(("a",), JHDiskCacheEntry(object_array, object_array, ""))
+
+    assert os.listdir(tmp_path) == []
+    assert cache.get(("a",)) is None
+
+
+@pytest.mark.parametrize("damage", ["truncate", "delete_mask"])
+def test_get_damaged_entry(tmp_path: Path, damage: str) -> None:
+    cache = JHDecodedTensorDiskCache(tmp_path, max_bytes=1 << 20)
+    cache.put(("a",), make_entry(8))
+    path = cache.entry_path(("a",))
+    match damage:
+        case "truncate":
+            with open(os.path.join(path, cache.IMAGE_FILE), "r+b") as f:
+                f.truncate(100)
+        case "delete_mask":
+            os.remove(os.path.join(path, cache.MASK_FILE))
+
+    assert cache.get(("a",)) is None
+    if damage == "truncate":
+        assert not os.path.exists(path)
+
+
+def test_sweep_removes_stale_temporary_directories(tmp_path: Path) -> None:
+    cache = JHDecodedTensorDiskCache(tmp_path, max_bytes=1 << 20)
+    stale = tmp_path / f"{cache.TEMPORARY_PREFIX}stale"
+    fresh = tmp_path / f"{cache.TEMPORARY_PREFIX}fresh"
+    stale.mkdir()
+    fresh.mkdir()
+    age(str(stale), cache.STALE_TEMPORARY_SECONDS + 60)
+
+    cache.sweep()
+
+    assert not stale.exists()
+    assert fresh.exists()
+    assert cache.cache_info().entries == 0
+
+
+def test_cache_clear(tmp_path: Path) -> None:
+    cache = JHDecodedTensorDiskCache(tmp_path, max_bytes=1 << 20)
+    cache.put(("a",), make_entry(8))
+    cache.get(("a",))
+
+    cache.cache_clear()
+
+    info = cache.cache_info()
+    assert (info.hits, info.misses, info.evictions, info.entries) == (0, 0, 0, 0)
+    assert cache.get(("a",)) is None
+
+
+def test_negative_max_bytes(tmp_path: Path) -> None:
+    with pytest.raises(ValueError, match="max_bytes"):
+        JHDecodedTensorDiskCache(tmp_path, max_bytes=-1)
@@ -0,0 +1,170 @@
+import hashlib
+import os
+import tracemalloc
+import zlib
+from collections.abc import Iterator
+from pathlib import Path
+
+import pytest
+from pytest_mock import MockerFixture
+
+from comfyui_jh_xmp_metadata_nodes.jh_file_fingerprint import (
+    JHFileFingerprint,
+    JHFingerprintAlgorithm,
+)
+
+# region Fixtures
+
+
+@pytest.fixture(autouse=True)
+def clear_cache() -> Iterator[None]:
+    JHFileFingerprint.cache_clear()
+    yield
+    JHFileFingerprint.cache_clear()
+
+
+@pytest.fixture
+def sample_file(tmp_path: Path) -> Path:
+    # Larger than one chunk, and not a whole number of them
+    path = tmp_path / "sample.bin"
+    path.write_bytes(os.urandom(JHFileFingerprint.CHUNK_SIZE * 2 + 12345))
+    return path
+
+
+# endregion Fixtures
+
+# region Tests
+
+
+def test_digest_sha256(sample_file: Path) -> None:
+    assert (
+        JHFileFingerprint.digest(sample_file, JHFingerprintAlgorithm.SHA256)
+        == hashlib.sha256(sample_file.read_bytes()).hexdigest()
+    )
+
+
+def test_digest_crc32(sample_file: Path) -> None:
+    assert (
+        JHFileFingerprint.digest(sample_file, JHFingerprintAlgorithm.CRC32)
+        == f"{zlib.crc32(sample_file.read_bytes()):08x}"
+    )
+
+
+@pytest.mark.parametrize("algorithm", list(JHFingerprintAlgorithm))
+def test_digest_empty_file(tmp_path: Path, algorithm: JHFingerprintAlgorithm) -> None:
+    path = tmp_path / "empty.bin"
+    path.touch()
+    expected = {
+        JHFingerprintAlgorithm.SHA256: hashlib.sha256(b"").hexdigest(),
+        JHFingerprintAlgorithm.CRC32: "00000000",
+    }
+    assert JHFileFingerprint.digest(path, algorithm) == expected[algorithm]
+
+
+def test_fingerprint_accepts_algorithm_names(sample_file: Path) -> None:
+    assert JHFileFingerprint.fingerprint(sample_file, "crc32") == (
+        JHFileFingerprint.digest(sample_file, JHFingerprintAlgorithm.CRC32)
+    )
+    with pytest.raises(ValueError):
+        JHFileFingerprint.fingerprint(sample_file, "md5")
+
+
+@pytest.mark.parametrize(
+    ("env_value", "expected"),
+    [
+        (None, JHFingerprintAlgorithm.SHA256),
+        ("crc32", JHFingerprintAlgorithm.CRC32),
+        (" CRC32 ", JHFingerprintAlgorithm.CRC32),
+        ("SHA256", JHFingerprintAlgorithm.SHA256),
+        ("md5", JHFingerprintAlgorithm.SHA256),
+    ],
+)
+def test_algorithm_from_environment(
+    monkeypatch: pytest.MonkeyPatch,
+    caplog: pytest.LogCaptureFixture,
+    env_value: str | None,
+    expected: JHFingerprintAlgorithm,
+) -> None:
+    if env_value is None:
+        monkeypatch.delenv("JH_XMP_FINGERPRINT", raising=False)
+    else:
+        monkeypatch.setenv("JH_XMP_FINGERPRINT", env_value)
+
+    assert JHFingerprintAlgorithm.from_environment() == expected
+    assert ("Unknown JH_XMP_FINGERPRINT" in caplog.text) == (env_value == "md5")
+
+
+def test_fingerprint_is_cached_while_file_is_unchanged(
+    mocker: MockerFixture, sample_file: Path
+) -> None:
+    digest = mocker.spy(JHFileFingerprint, "digest")
+
+    first = JHFileFingerprint.fingerprint(sample_file)
+    for _ in range(10):
+        assert JHFileFingerprint.fingerprint(str(sample_file)) == first
+
+    assert digest.call_count == 1
+    assert JHFileFingerprint.cache_info().hits == 10
+
+
+def test_fingerprint_changes_with_content(sample_file: Path) -> None:
+    first = JHFileFingerprint.fingerprint(sample_file)
+    sample_file.write_bytes(b"something else entirely")
+    assert JHFileFingerprint.fingerprint(sample_file) == (
+        hashlib.sha256(b"something else entirely").hexdigest()
+    )
+    assert JHFileFingerprint.fingerprint(sample_file) != first
+
+
+def test_fingerprint_same_size_rewrite_with_new_mtime(sample_file: Path) -> None:
+    JHFileFingerprint.fingerprint(sample_file)
+    stat_result = sample_file.stat()
+    new_content = os.urandom(stat_result.st_size)
+    sample_file.write_bytes(new_content)
+    os.utime(sample_file, ns=(stat_result.st_atime_ns, stat_result.st_mtime_ns + 1))
+
+    assert JHFileFingerprint.fingerprint(sample_file) == (
+        hashlib.sha256(new_content).hexdigest()
+    )
+
+
+def test_fingerprint_replaced_file(tmp_path: Path, sample_file: Path) -> None:
+    JHFileFingerprint.fingerprint(sample_file)
+    stat_result = sample_file.stat()
+
+    # A different file moved into place, with the same size and mtime
+    replacement = tmp_path / "replacement.bin"
+    new_content = os.urandom(stat_result.st_size)
+    replacement.write_bytes(new_content)
+    os.utime(replacement, ns=(stat_result.st_atime_ns, stat_result.st_mtime_ns))
+    os.replace(replacement, sample_file)
+
+    assert JHFileFingerprint.fingerprint(sample_file) == (
+        hashlib.sha256(new_content).hexdigest()
+    )
+
+
+def test_fingerprint_nonexistent_file(tmp_path: Path) -> None:
+    with pytest.raises(FileNotFoundError):
+        JHFileFingerprint.fingerprint(tmp_path / "nonexistent.bin")
+
+
+@pytest.mark.parametrize("algorithm", list(JHFingerprintAlgorithm))
+def test_digest_memory_is_constant(
+    tmp_path: Path, algorithm: JHFingerprintAlgorithm
+) -> None:
+    path = tmp_path / "large.bin"
+    with open(path, "wb") as f:
+        for _ in range(32):
+            f.write(os.urandom(1 << 20))
+
+    tracemalloc.start()
+    try:
+        JHFileFingerprint.digest(path, algorithm)
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    assert peak < 2 * JHFileFingerprint.CHUNK_SIZE
+
+
+# endregion Tests
@@ -1,18 +1,65 @@
 import hashlib
+import os
+import shutil
+import tempfile
+import threading
+import time
+import timeit
+import tracemalloc
+import zlib
+from collections.abc import Callable, Iterator
 from pathlib import Path
 
+import numpy as np
 import PIL.Image
+import PIL.ImageFile
+import PIL.ImageSequence
+import PIL.JpegImagePlugin
+import PIL.PngImagePlugin
+import PIL.TiffImagePlugin
 import pytest
 import torch
 from pytest_mock import MockerFixture
 
+from comfyui_jh_xmp_metadata_nodes.jh_decoded_image_cache import JHDecodedImageCache
+from comfyui_jh_xmp_metadata_nodes.jh_decoded_tensor_disk_cache import (
+    JHDecodedTensorDiskCache,
+)
+from comfyui_jh_xmp_metadata_nodes.jh_file_fingerprint import (
+    JHFileFingerprint,
+    JHFingerprintAlgorithm,
+)
 from comfyui_jh_xmp_metadata_nodes.jh_load_image_with_xmp_metadata_node import (
     JHLoadImageWithXMPMetadataNode,
+    JHOutputDType,
+    JHOverBudgetPolicy,
+    _megabytes_from_environment,
 )
 
 # region Fixtures
 
 
+@pytest.fixture(autouse=True)
+def decoded_cache(monkeypatch: pytest.MonkeyPatch) -> Iterator[JHDecodedImageCache]:
+    # Most tests load the same image more than once and expect it to be
+    # decoded every time, so the caches are off unless a test turns them on.
+    cache: JHDecodedImageCache = JHDecodedImageCache(max_bytes=0)
+    monkeypatch.setattr(JHLoadImageWithXMPMetadataNode, "decoded_cache", cache)
+    monkeypatch.delenv("JH_XMP_DISK_CACHE_DIR", raising=False)
+    JHLoadImageWithXMPMetadataNode.get_disk_cache.cache_clear()
+    yield cache
+    JHLoadImageWithXMPMetadataNode.get_disk_cache.cache_clear()
+
+
+@pytest.fixture(autouse=True)
+def spill_directory(monkeypatch: pytest.MonkeyPatch, tmp_path: Path) -> Path:
+    # over_budget=disk puts its files in ComfyUI's temp directory, which
+    # doesn't exist outside of ComfyUI
+    directory = tmp_path / "spill"
+    monkeypatch.setenv("JH_XMP_SPILL_DIR", str(directory))
+    return directory
+
+
 @pytest.fixture
 def valid_xml_string() -> str:
     return """
@@ -188,43 +235,223 @@ def sample_corrupted_image_file(tmp_path: Path) -> Path:
 # endregion Fixtures
 
 
-def test_input_types(mocker: MockerFixture) -> None:
+def make_input_directory(tmp_path: Path, names: list[str]) -> Path:
+    input_dir = tmp_path / "input"
+    for name in names:
+        path = input_dir / name
+        if name.endswith("/"):
+            path.mkdir(parents=True, exist_ok=True)
+        else:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            path.touch()
+    input_dir.mkdir(exist_ok=True)
+    return input_dir
+
+
+def age_directories(directory: Path, seconds: int = 60) -> None:
+    # Listings of recently modified directories aren't cached, so make
+    # these look like they were last modified a while ago.
+    past_ns = time.time_ns() - seconds * 1_000_000_000
+    for path in [directory, *(p for p in directory.rglob("*") if p.is_dir())]:
+        os.utime(path, ns=(past_ns, past_ns))
+
+
+def test_input_types(mocker: MockerFixture, tmp_path: Path) -> None:
+    input_dir = make_input_directory(tmp_path, ["img1.png", "img2.png"])
     mocker.patch(
         "comfyui_jh_xmp_metadata_nodes.jh_load_image_with_xmp_metadata_node.folder_paths.get_input_directory",
-        return_value="/mocked/path",
+        return_value=str(input_dir),
     )
-    mocker.patch("os.listdir", return_value=["img1.png", "img2.png"])
-    mocker.patch("os.path.isfile", return_value=True)
 
     input_types = JHLoadImageWithXMPMetadataNode.INPUT_TYPES()
-    assert input_types.keys() == {"required"}
+    assert input_types.keys() == {"required", "optional"}
     assert "required" in input_types and input_types["required"].keys() == {"image"}
+    assert input_types["required"]["image"] == (
+        ["img1.png", "img2.png"],
+        {"image_upload": True},
+    )
+    assert input_types["optional"].keys() == {
+        "metadata_only",
+        "output_dtype",
+        "max_dimension",
+        "start_frame",
+        "frame_stride",
+        "max_frames",
+        "decode_workers",
+        "memory_budget_mb",
+        "over_budget",
+    }
+    assert input_types["optional"]["output_dtype"][0] == [
+        "float32",
+        "float16",
+        "uint8",
+    ]
+    assert input_types["optional"]["output_dtype"][1]["default"] == "float32"
+    assert input_types["optional"]["over_budget"][0] == ["error", "downscale", "disk"]
+    assert input_types["optional"]["over_budget"][1]["default"] == "error"
+
+
+def test_input_types_only_rebuilds_file_list(
+    mocker: MockerFixture, tmp_path: Path
+) -> None:
+    input_dir = make_input_directory(tmp_path, ["img1.png"])
+    mocker.patch(
+        "comfyui_jh_xmp_metadata_nodes.jh_load_image_with_xmp_metadata_node.folder_paths.get_input_directory",
+        return_value=str(input_dir),
+    )
+
+    first = JHLoadImageWithXMPMetadataNode.INPUT_TYPES()
+    (input_dir / "img2.png").touch()
+    second = JHLoadImageWithXMPMetadataNode.INPUT_TYPES()
+
+    assert first["required"]["image"][0] == ["img1.png"]
+    assert second["required"]["image"][0] == ["img1.png", "img2.png"]
+    assert second["optional"] is first["optional"]
+    assert second["required"]["image"][1] is first["required"]["image"][1]
 
 
-def test_get_image_files(mocker: MockerFixture) -> None:
+def test_get_image_files(mocker: MockerFixture, tmp_path: Path) -> None:
+    input_dir = make_input_directory(tmp_path, ["img3.png", "img1.png", "img2.png"])
     mocker.patch(
         "comfyui_jh_xmp_metadata_nodes.jh_load_image_with_xmp_metadata_node.folder_paths.get_input_directory",
-        return_value="/mocked/path",
+        return_value=str(input_dir),
     )
-    mocker.patch("os.listdir", return_value=["img1.png", "img2.png", "img3.png"])
-    mocker.patch("os.path.isfile", return_value=True)
 
     files = JHLoadImageWithXMPMetadataNode.get_image_files()
     assert files == ["img1.png", "img2.png", "img3.png"]
 
 
-def test_get_image_files_with_non_files(mocker: MockerFixture) -> None:
+def test_get_image_files_with_non_files(mocker: MockerFixture, tmp_path: Path) -> None:
+    input_dir = make_input_directory(
+        tmp_path, ["img1.png", "directory/", "directory/img2.png", "img3.png"]
+    )
     mocker.patch(
         "comfyui_jh_xmp_metadata_nodes.jh_load_image_with_xmp_metadata_node.folder_paths.get_input_directory",
-        return_value="/mocked/path",
+        return_value=str(input_dir),
     )
-    mocker.patch("os.listdir", return_value=["img1.png", "directory", "img3.png"])
-    mocker.patch("os.path.isfile", side_effect=lambda p: not p.endswith("directory"))
 
     files = JHLoadImageWithXMPMetadataNode.get_image_files()
     assert files == ["img1.png", "img3.png"]
 
 
+def test_get_image_files_recursive(mocker: MockerFixture, tmp_path: Path) -> None:
+    input_dir = make_input_directory(
+        tmp_path, ["b.png", "sub/a.png", "sub/deeper/c.png", "empty/"]
+    )
+    (input_dir / "link").symlink_to(input_dir, target_is_directory=True)
+    mocker.patch(
+        "comfyui_jh_xmp_metadata_nodes.jh_load_image_with_xmp_metadata_node.folder_paths.get_input_directory",
+        return_value=str(input_dir),
+    )
+
+    files = JHLoadImageWithXMPMetadataNode.get_image_files(recursive=True)
+    # Symlinked directories aren't followed, so there's no infinite loop
+    assert files == ["b.png", "sub/a.png", "sub/deeper/c.png"]
+
+
+def test_get_image_files_extensions(mocker: MockerFixture, tmp_path: Path) -> None:
+    input_dir = make_input_directory(
+        tmp_path, ["a.PNG", "b.jpeg", "c.txt", "d", "sub/e.png"]
+    )
+    mocker.patch(
+        "comfyui_jh_xmp_metadata_nodes.jh_load_image_with_xmp_metadata_node.folder_paths.get_input_directory",
+        return_value=str(input_dir),
+    )
+
+    node = JHLoadImageWithXMPMetadataNode
+    assert node.get_image_files(extensions=[".png", ".JPEG"]) == ["a.PNG", "b.jpeg"]
+    assert node.get_image_files(recursive=True, extensions={".png"}) == [
+        "a.PNG",
+        "sub/e.png",
+    ]
+
+
+def test_get_image_files_uses_class_settings(
+    mocker: MockerFixture, tmp_path: Path
+) -> None:
+    input_dir = make_input_directory(tmp_path, ["a.png", "b.txt", "sub/c.png"])
+    mocker.patch(
+        "comfyui_jh_xmp_metadata_nodes.jh_load_image_with_xmp_metadata_node.folder_paths.get_input_directory",
+        return_value=str(input_dir),
+    )
+    mocker.patch.object(JHLoadImageWithXMPMetadataNode, "input_recursive", True)
+    mocker.patch.object(
+        JHLoadImageWithXMPMetadataNode, "input_extensions", frozenset({".png"})
+    )
+
+    assert JHLoadImageWithXMPMetadataNode.get_image_files() == ["a.png", "sub/c.png"]
+
+
+@pytest.mark.parametrize("recursive", [False, True])
+def test_get_image_files_is_cached(
+    mocker: MockerFixture, tmp_path: Path, recursive: bool
+) -> None:
+    input_dir = make_input_directory(tmp_path, ["a.png", "sub/b.png"])
+    age_directories(input_dir)
+    mocker.patch(
+        "comfyui_jh_xmp_metadata_nodes.jh_load_image_with_xmp_metadata_node.folder_paths.get_input_directory",
+        return_value=str(input_dir),
+    )
+    scandir = mocker.spy(os, "scandir")
+
+    first = JHLoadImageWithXMPMetadataNode.get_image_files(recursive=recursive)
+    scans = scandir.call_count
+    for _ in range(5):
+        assert JHLoadImageWithXMPMetadataNode.get_image_files(recursive=recursive) == (
+            first
+        )
+    assert scandir.call_count == scans
+
+    # Callers can't change the cached listing
+    first.append("not a file")
+    assert "not a file" not in JHLoadImageWithXMPMetadataNode.get_image_files(
+        recursive=recursive
+    )
+
+
+def test_get_image_files_cache_invalidation(
+    mocker: MockerFixture, tmp_path: Path
+) -> None:
+    input_dir = make_input_directory(tmp_path, ["a.png", "sub/b.png"])
+    age_directories(input_dir)
+    mocker.patch(
+        "comfyui_jh_xmp_metadata_nodes.jh_load_image_with_xmp_metadata_node.folder_paths.get_input_directory",
+        return_value=str(input_dir),
+    )
+    node = JHLoadImageWithXMPMetadataNode
+
+    assert node.get_image_files(recursive=True) == ["a.png", "sub/b.png"]
+
+    # A new file in a subfolder only changes the subfolder's mtime
+    (input_dir / "sub" / "c.png").touch()
+    assert node.get_image_files(recursive=True) == [
+        "a.png",
+        "sub/b.png",
+        "sub/c.png",
+    ]
+
+    (input_dir / "a.png").unlink()
+    assert node.get_image_files(recursive=True) == ["sub/b.png", "sub/c.png"]
+
+    shutil.rmtree(input_dir / "sub")
+    assert node.get_image_files(recursive=True) == []
+
+
+def test_get_image_files_recently_modified_not_cached(
+    mocker: MockerFixture, tmp_path: Path
+) -> None:
+    input_dir = make_input_directory(tmp_path, ["a.png"])
+    mocker.patch(
+        "comfyui_jh_xmp_metadata_nodes.jh_load_image_with_xmp_metadata_node.folder_paths.get_input_directory",
+        return_value=str(input_dir),
+    )
+    scandir = mocker.spy(os, "scandir")
+
+    JHLoadImageWithXMPMetadataNode.get_image_files()
+    JHLoadImageWithXMPMetadataNode.get_image_files()
+    assert scandir.call_count == 2
+
+
 def test_validate_inputs_valid_file(
     mocker: MockerFixture,
     sample_image_file_with_valid_xmp_metadata: Path,
@@ -255,7 +482,7 @@ def test_validate_inputs_invalid_file(mocker: MockerFixture) -> None:
 def test_frame_to_tensors() -> None:
     node = JHLoadImageWithXMPMetadataNode()
     image = PIL.Image.new("RGBA", (64, 64), color=(255, 255, 255, 128))
-    tensor_image, tensor_mask = node._frame_to_tensors(image)
+    tensor_image, tensor_mask = node.frame_to_tensors(image)
 
     assert tensor_image is not None
     assert tensor_mask is not None
@@ -264,6 +491,211 @@ def test_frame_to_tensors() -> None:
     assert torch.allclose(tensor_mask, torch.full((64, 64), 0.5), atol=0.01)
 
 
+def legacy_frame_to_tensors(
+    raw_frame: PIL.Image.Image,
+) -> tuple[torch.Tensor, torch.Tensor | None]:
+    # How frame_to_tensors used to convert frames, minus EXIF handling
+    if raw_frame.mode.startswith("I"):
+        raw_frame = raw_frame.point(lambda i: i * (1 / 255))
+    rgb_frame = raw_frame.convert("RGB") if raw_frame.mode != "RGB" else raw_frame
+    image_tensor = torch.from_numpy(np.array(rgb_frame).astype(np.float32) / 255.0)[
+        None,
+    ]
+    mask_tensor = None
+    if "A" in raw_frame.getbands():
+        alpha = np.array(raw_frame.getchannel("A")).astype(np.float32) / 255.0
+        mask_tensor = 1.0 - torch.from_numpy(alpha)
+    return image_tensor, mask_tensor
+
+
+def random_frame(mode: str, size: tuple[int, int] = (48, 32)) -> PIL.Image.Image:
+    pixels = np.random.default_rng(0).integers(
+        0, 256, (size[1], size[0], 4), dtype=np.uint8
+    )
+    return PIL.Image.fromarray(pixels, "RGBA").convert(mode)
+
+
+@pytest.mark.parametrize("mode", ["RGB", "RGBA", "L", "LA", "P", "PA"])
+def test_frame_to_tensors_matches_legacy_conversion(mode: str) -> None:
+    node = JHLoadImageWithXMPMetadataNode()
+    frame = random_frame(mode)
+    expected_image, expected_mask = legacy_frame_to_tensors(frame)
+
+    image_tensor, mask_tensor = node.frame_to_tensors(frame)
+
+    assert image_tensor.dtype == torch.float32
+    assert torch.equal(image_tensor, expected_image)
+    if expected_mask is None:
+        assert torch.equal(mask_tensor, torch.zeros((64, 64)))
+    else:
+        assert torch.equal(mask_tensor, expected_mask)
+
+
+def test_frame_to_tensors_into_buffers() -> None:
+    node = JHLoadImageWithXMPMetadataNode()
+    frame = random_frame("RGBA")
+    expected_image, expected_mask = legacy_frame_to_tensors(frame)
+    image_out = torch.empty((32, 48, 3))
+    mask_out = torch.empty((32, 48))
+
+    image_tensor, mask_tensor = node.frame_to_tensors(
+        frame, image_out=image_out, mask_out=mask_out
+    )
+
+    assert image_tensor.data_ptr() == image_out.data_ptr()
+    assert mask_tensor.data_ptr() == mask_out.data_ptr()
+    assert torch.equal(image_out, expected_image[0])
+    assert torch.equal(mask_out, expected_mask)
+
+
+def test_frame_to_tensors_leaves_mask_buffer_without_alpha() -> None:
+    node = JHLoadImageWithXMPMetadataNode()
+    mask_out = torch.full((32, 48), 7.0)
+
+    node.frame_to_tensors(
+        random_frame("RGB"), image_out=torch.empty((32, 48, 3)), mask_out=mask_out
+    )
+
+    assert torch.equal(mask_out, torch.full((32, 48), 7.0))
+
+
+def random_16_bit_pixels(size: tuple[int, int] = (48, 32)) -> np.ndarray:
+    return np.random.default_rng(0).integers(
+        0, 65536, (size[1], size[0]), dtype=np.uint16
+    )
+
+
+@pytest.mark.parametrize("mode", ["I;16", "I;16B", "I"])
+def test_frame_to_tensors_16_bit(mode: str) -> None:
+    node = JHLoadImageWithXMPMetadataNode()
+    pixels = random_16_bit_pixels()
+    # Pillow clamps to 8 bits when converting into these modes, so build the
+    # frames from raw bytes instead
+    raw_dtypes = {"I;16": "<u2", "I;16B": ">u2", "I": "=i4"}
+    frame = PIL.Image.frombytes(
+        mode, (48, 32), pixels.astype(raw_dtypes[mode]).tobytes()
+    )
+
+    image_tensor, mask_tensor = node.frame_to_tensors(frame)
+
+    expected = torch.from_numpy(pixels.astype(np.float64) / 65535).float()
+    assert image_tensor.shape == (1, 32, 48, 3)
+    assert image_tensor.dtype == torch.float32
+    for channel in range(3):
+        assert torch.equal(image_tensor[0, ..., channel], expected)
+    assert torch.equal(mask_tensor, torch.zeros((64, 64)))
+    # Every one of the 16-bit levels survives, not just 256 of them
+    assert image_tensor.unique().numel() == np.unique(pixels).size
+
+
+def test_frame_to_tensors_16_bit_into_buffers() -> None:
+    node = JHLoadImageWithXMPMetadataNode()
+    pixels = random_16_bit_pixels()
+    image_out = torch.empty((32, 48, 3), dtype=torch.float16)
+    mask_out = torch.full((32, 48), 7.0, dtype=torch.float16)
+
+    image_tensor, _ = node.frame_to_tensors(
+        PIL.Image.fromarray(pixels), image_out=image_out, mask_out=mask_out
+    )
+
+    assert image_tensor.data_ptr() == image_out.data_ptr()
+    expected = torch.from_numpy(pixels / 65535).half()
+    assert torch.equal(image_out[..., 1], expected)
+    assert torch.equal(mask_out, torch.full((32, 48), 7.0, dtype=torch.float16))
+
+
+def test_frame_to_tensors_16_bit_to_uint8() -> None:
+    node = JHLoadImageWithXMPMetadataNode()
+    pixels = random_16_bit_pixels()
+
+    image_tensor, _ = node.frame_to_tensors(
+        PIL.Image.fromarray(pixels), dtype=torch.uint8
+    )
+
+    expected = torch.from_numpy(np.rint(pixels / 257).astype(np.uint8))
+    assert image_tensor.dtype == torch.uint8
+    assert torch.equal(image_tensor[0, ..., 2], expected)
+
+
+def test_frame_to_tensors_mode_i_is_clipped() -> None:
+    node = JHLoadImageWithXMPMetadataNode()
+    pixels = np.array([[-5, 0, 65535, 100000]], dtype=np.int32)
+
+    image_tensor, _ = node.frame_to_tensors(PIL.Image.fromarray(pixels, "I"))
+
+    assert image_tensor[0, 0, :, 0].tolist() == [0.0, 0.0, 1.0, 1.0]
+
+
+def test_load_32_bit_tiff(mocker: MockerFixture, tmp_path: Path) -> None:
+    img_path = tmp_path / "deep.tiff"
+    maximum = np.iinfo(np.int32).max
+    pixels = np.array([[0, maximum // 2, maximum]], dtype=np.int32)
+    PIL.Image.fromarray(pixels, "I").save(img_path)
+    mocker.patch(
+        "comfyui_jh_xmp_metadata_nodes.jh_load_image_with_xmp_metadata_node.folder_paths.get_annotated_filepath",
+        return_value=str(img_path),
+    )
+
+    node = JHLoadImageWithXMPMetadataNode()
+    output = node.load_image(img_path.name)
+
+    assert torch.allclose(output.IMAGE[0, 0, :, 0], torch.tensor([0.0, 0.5, 1.0]))
+
+
+@pytest.mark.parametrize("extension", [".png", ".tiff"])
+def test_load_16_bit_image(
+    mocker: MockerFixture, tmp_path: Path, extension: str
+) -> None:
+    img_path = tmp_path / f"deep{extension}"
+    pixels = random_16_bit_pixels()
+    PIL.Image.fromarray(pixels).save(img_path)
+    mocker.patch(
+        "comfyui_jh_xmp_metadata_nodes.jh_load_image_with_xmp_metadata_node.folder_paths.get_annotated_filepath",
+        return_value=str(img_path),
+    )
+
+    node = JHLoadImageWithXMPMetadataNode()
+    output = node.load_image(img_path.name)
+
+    expected = torch.from_numpy(pixels.astype(np.float64) / 65535).float()
+    assert torch.equal(output.IMAGE[0, ..., 0], expected)
+
+
+@pytest.mark.parametrize("mode", ["RGB", "RGBA"])
+def test_benchmark_frame_to_tensors_allocations_per_megapixel(mode: str) -> None:
+    # tracemalloc sees numpy's allocations but not torch's or Pillow's, so
+    # these numbers undercount the legacy conversion, if anything.
+    node = JHLoadImageWithXMPMetadataNode()
+    frame = random_frame(mode, (1000, 1000))
+    megapixels = frame.width * frame.height / 1e6
+    image_out = torch.empty((frame.height, frame.width, 3))
+    mask_out = torch.empty((frame.height, frame.width))
+
+    def bytes_per_megapixel(convert: Callable[[], object]) -> float:
+        tracemalloc.start()
+        try:
+            convert()
+            return tracemalloc.get_traced_memory()[1] / megapixels
+        finally:
+            tracemalloc.stop()
+
+    legacy = bytes_per_megapixel(lambda: legacy_frame_to_tensors(frame))
+    standalone = bytes_per_megapixel(lambda: node.frame_to_tensors(frame))
+    into_buffers = bytes_per_megapixel(
+        lambda: node.frame_to_tensors(frame, image_out=image_out, mask_out=mask_out)
+    )
+
+    # The pixels are copied out of Pillow once, as uint8, and nothing else
+    # is allocated when there are buffers to write into. (Pillow's tobytes
+    # joins the chunks it encodes, which briefly takes twice the space.)
+    channels = len(frame.getbands())
+    assert into_buffers < (2 * channels + 0.1) * 1e6
+    # Otherwise only the float32 outputs are added on top.
+    float_outputs = 12 + (4 if "A" in frame.getbands() else 0)
+    assert standalone < (channels + float_outputs + 0.1) * 1e6
+    assert into_buffers < legacy / 2
+
+
 def test_load_image_with_valid_metadata(
     mocker: MockerFixture,
     sample_image_file_with_valid_xmp_metadata: Path,
@@ -497,6 +929,45 @@ def test_is_changed(
     assert result == expected_hash
 
 
+def test_is_changed_crc32(
+    mocker: MockerFixture, sample_image_file_with_valid_xmp_metadata: Path
+) -> None:
+    mocker.patch(
+        "comfyui_jh_xmp_metadata_nodes.jh_load_image_with_xmp_metadata_node.folder_paths.get_annotated_filepath",
+        return_value=str(sample_image_file_with_valid_xmp_metadata),
+    )
+    mocker.patch.object(
+        JHLoadImageWithXMPMetadataNode,
+        "fingerprint_algorithm",
+        JHFingerprintAlgorithm.CRC32,
+    )
+
+    expected_crc = zlib.crc32(sample_image_file_with_valid_xmp_metadata.read_bytes())
+    result = JHLoadImageWithXMPMetadataNode.IS_CHANGED(
+        sample_image_file_with_valid_xmp_metadata.name
+    )
+    assert result == f"{expected_crc:08x}"
+
+
+def test_is_changed_does_not_rehash_unchanged_file(
+    mocker: MockerFixture, sample_image_file_with_valid_xmp_metadata: Path
+) -> None:
+    mocker.patch(
+        "comfyui_jh_xmp_metadata_nodes.jh_load_image_with_xmp_metadata_node.folder_paths.get_annotated_filepath",
+        return_value=str(sample_image_file_with_valid_xmp_metadata),
+    )
+    JHFileFingerprint.cache_clear()
+    digest = mocker.spy(JHFileFingerprint, "digest")
+
+    first = JHLoadImageWithXMPMetadataNode.IS_CHANGED("image.webp")
+    assert JHLoadImageWithXMPMetadataNode.IS_CHANGED("image.webp") == first
+    assert digest.call_count == 1
+
+    sample_image_file_with_valid_xmp_metadata.write_bytes(b"changed")
+    assert JHLoadImageWithXMPMetadataNode.IS_CHANGED("image.webp") != first
+    assert digest.call_count == 2
+
+
 def test_is_changed_nonexistent_file(mocker: MockerFixture) -> None:
     mocker.patch(
         "comfyui_jh_xmp_metadata_nodes.jh_load_image_with_xmp_metadata_node.folder_paths.get_annotated_filepath",
@@ -505,3 +976,1277 @@ def test_is_changed_nonexistent_file(mocker: MockerFixture) -> None:
 
     with pytest.raises(FileNotFoundError):
         JHLoadImageWithXMPMetadataNode.IS_CHANGED("nonexistent.png")
+
+
+def test_is_changed_accepts_other_inputs(
+    mocker: MockerFixture, sample_image_file_with_valid_xmp_metadata: Path
+) -> None:
+    mocker.patch(
+        "comfyui_jh_xmp_metadata_nodes.jh_load_image_with_xmp_metadata_node.folder_paths.get_annotated_filepath",
+        return_value=str(sample_image_file_with_valid_xmp_metadata),
+    )
+
+    assert JHLoadImageWithXMPMetadataNode.IS_CHANGED(
+        sample_image_file_with_valid_xmp_metadata.name, metadata_only=True
+    ) == JHLoadImageWithXMPMetadataNode.IS_CHANGED(
+        sample_image_file_with_valid_xmp_metadata.name
+    )
+
+
+@pytest.mark.parametrize("extension", ["png", "jpeg", "webp", "tiff"])
+def test_load_image_metadata_only(
+    mocker: MockerFixture, tmp_path: Path, valid_xml_string: str, extension: str
+) -> None:
+    img_path = tmp_path / f"test_image.{extension}"
+    image = PIL.Image.new("RGB", (100, 80), color=(255, 0, 0))
+    if extension == "png":
+        pnginfo = PIL.PngImagePlugin.PngInfo()
+        pnginfo.add_itxt("XML:com.adobe.xmp", valid_xml_string)
+        image.save(img_path, pnginfo=pnginfo)
+    elif extension == "tiff":
+        image.save(img_path, tiffinfo={700: valid_xml_string.encode("utf-8")})
+    else:
+        image.save(img_path, xmp=valid_xml_string.encode("utf-8"))
+    mocker.patch(
+        "comfyui_jh_xmp_metadata_nodes.jh_load_image_with_xmp_metadata_node.folder_paths.get_annotated_filepath",
+        return_value=str(img_path),
+    )
+    load = mocker.spy(PIL.ImageFile.ImageFile, "load")
+    frame_to_tensors = mocker.spy(JHLoadImageWithXMPMetadataNode, "frame_to_tensors")
+
+    node = JHLoadImageWithXMPMetadataNode()
+    output = node.load_image(img_path.name, metadata_only=True)
+
+    # No pixels were decoded...
+    frame_to_tensors.assert_not_called()
+    load.assert_not_called()
+    assert torch.equal(output.IMAGE, torch.zeros((1, 64, 64, 3)))
+    assert torch.equal(output.MASK, torch.zeros((1, 64, 64)))
+
+    # ...but the metadata is the same as for a full load
+    full_output = node.load_image(img_path.name)
+    assert output[2:] == full_output[2:]
+    assert output.title == "Test Title"
+    assert output.xml_string == valid_xml_string
+
+
+def test_load_image_metadata_only_invalid_metadata(
+    mocker: MockerFixture,
+    sample_image_file_with_invalid_xmp_metadata: Path,
+    invalid_xml_string: str,
+) -> None:
+    mocker.patch(
+        "comfyui_jh_xmp_metadata_nodes.jh_load_image_with_xmp_metadata_node.folder_paths.get_annotated_filepath",
+        return_value=str(sample_image_file_with_invalid_xmp_metadata),
+    )
+
+    node = JHLoadImageWithXMPMetadataNode()
+    output = node.load_image(
+        sample_image_file_with_invalid_xmp_metadata.name, metadata_only=True
+    )
+
+    assert output.title is None
+    assert output.xml_string == invalid_xml_string
+
+
+def test_load_image_metadata_only_without_metadata(
+    mocker: MockerFixture, sample_rgb_image_file: Path
+) -> None:
+    mocker.patch(
+        "comfyui_jh_xmp_metadata_nodes.jh_load_image_with_xmp_metadata_node.folder_paths.get_annotated_filepath",
+        return_value=str(sample_rgb_image_file),
+    )
+
+    node = JHLoadImageWithXMPMetadataNode()
+    output = node.load_image(sample_rgb_image_file.name, metadata_only=True)
+
+    assert output.IMAGE.shape == (1, 64, 64, 3)
+    assert output[2:11] == (None,) * 9
+    assert output.xml_string == ""
+
+
+def test_load_image_metadata_only_corrupted_image(
+    mocker: MockerFixture, sample_corrupted_image_file: Path
+) -> None:
+    mocker.patch(
+        "comfyui_jh_xmp_metadata_nodes.jh_load_image_with_xmp_metadata_node.folder_paths.get_annotated_filepath",
+        return_value=str(sample_corrupted_image_file),
+    )
+
+    node = JHLoadImageWithXMPMetadataNode()
+    with pytest.raises(PIL.UnidentifiedImageError, match="cannot identify image file"):
+        node.load_image(sample_corrupted_image_file.name, metadata_only=True)
+
+
+@pytest.mark.parametrize("metadata_only", [False, True])
+def test_load_image_scans_formats_pillow_has_no_xmp_for(
+    mocker: MockerFixture,
+    tmp_path: Path,
+    valid_xml_string: str,
+    metadata_only: bool,
+) -> None:
+    # Pillow doesn't read XMP from BMP files, and ignores anything after the
+    # pixel data, so this stands in for any format it can't find XMP in.
+    img_path = tmp_path / "test_image.bmp"
+    PIL.Image.new("RGB", (64, 64), color=(255, 0, 0)).save(img_path)
+    with open(img_path, "ab") as f:
+        f.write(valid_xml_string.encode("utf-8"))
+    mocker.patch(
+        "comfyui_jh_xmp_metadata_nodes.jh_load_image_with_xmp_metadata_node.folder_paths.get_annotated_filepath",
+        return_value=str(img_path),
+    )
+
+    node = JHLoadImageWithXMPMetadataNode()
+    output = node.load_image(img_path.name, metadata_only=metadata_only)
+
+    assert output.title == "Test Title"
+    assert output.xml_string == valid_xml_string.strip()
+
+
+def reference_load(path: Path) -> tuple[torch.Tensor, torch.Tensor]:
+    # The frame-by-frame, concatenate-at-the-end way of loading a sequence
+    node = JHLoadImageWithXMPMetadataNode()
+    images, masks = [], []
+    with PIL.Image.open(path) as image_object:
+        for frame in PIL.ImageSequence.Iterator(image_object):
+            image_tensor, mask_tensor = node.frame_to_tensors(frame)
+            images.append(image_tensor)
+            masks.append(mask_tensor.unsqueeze(0))
+    return torch.cat(images), torch.cat(masks)
+
+
+@pytest.mark.parametrize("mode", ["RGB", "RGBA", "L", "P"])
+def test_load_image_multiframe_preallocated(
+    mocker: MockerFixture, tmp_path: Path, mode: str
+) -> None:
+    rng = np.random.default_rng(0)
+    frames = [
+        PIL.Image.fromarray(
+            rng.integers(0, 256, (24, 40, 4), dtype=np.uint8), "RGBA"
+        ).convert(mode)
+        for _ in range(12)
+    ]
+    img_path = tmp_path / "animation.tiff"
+    frames[0].save(img_path, save_all=True, append_images=frames[1:])
+    mocker.patch(
+        "comfyui_jh_xmp_metadata_nodes.jh_load_image_with_xmp_metadata_node.folder_paths.get_annotated_filepath",
+        return_value=str(img_path),
+    )
+    expected_image, expected_mask = reference_load(img_path)
+    cat = mocker.spy(torch, "cat")
+
+    node = JHLoadImageWithXMPMetadataNode()
+    output = node.load_image(img_path.name)
+
+    cat.assert_not_called()
+    assert torch.equal(output.IMAGE, expected_image)
+    assert torch.equal(output.MASK, expected_mask)
+    # One allocation for the whole sequence, with nothing to spare
+    assert output.IMAGE.untyped_storage().nbytes() == 12 * 24 * 40 * 3 * 4
+
+
+def test_load_image_multiframe_mixed_alpha(
+    mocker: MockerFixture, tmp_path: Path
+) -> None:
+    img_path = tmp_path / "mixed.tiff"
+    frames = [
+        PIL.Image.new("RGB", (16, 8), color=(255, 0, 0)),
+        PIL.Image.new("RGBA", (16, 8), color=(0, 255, 0, 64)),
+        PIL.Image.new("RGB", (16, 8), color=(0, 0, 255)),
+    ]
+    frames[0].save(img_path, save_all=True, append_images=frames[1:])
+    mocker.patch(
+        "comfyui_jh_xmp_metadata_nodes.jh_load_image_with_xmp_metadata_node.folder_paths.get_annotated_filepath",
+        return_value=str(img_path),
+    )
+
+    node = JHLoadImageWithXMPMetadataNode()
+    output = node.load_image(img_path.name)
+
+    assert output.IMAGE.shape == (3, 8, 16, 3)
+    assert output.MASK.shape == (3, 8, 16)
+    assert torch.equal(output.MASK[0], torch.zeros((8, 16)))
+    assert torch.allclose(output.MASK[1], torch.full((8, 16), 1 - 64 / 255))
+    assert torch.equal(output.MASK[2], torch.zeros((8, 16)))
+
+
+def test_load_image_multiframe_skipped_frames_are_not_copied(
+    mocker: MockerFixture, sample_invalid_multiframe_image_file: Path
+) -> None:
+    mocker.patch(
+        "comfyui_jh_xmp_metadata_nodes.jh_load_image_with_xmp_metadata_node.folder_paths.get_annotated_filepath",
+        return_value=str(sample_invalid_multiframe_image_file),
+    )
+    copy = mocker.spy(PIL.Image.Image, "copy")
+
+    node = JHLoadImageWithXMPMetadataNode()
+    output = node.load_image(sample_invalid_multiframe_image_file.name)
+
+    copy.assert_not_called()
+    assert output.IMAGE.shape == (2, 64, 64, 3)
+    assert torch.allclose(output.IMAGE[1, 0, 0], torch.tensor([0.0, 0.0, 1.0]))
+
+
+def test_load_image_mpo_first_frame_only(mocker: MockerFixture, tmp_path: Path) -> None:
+    img_path = tmp_path / "stereo.mpo"
+    left = PIL.Image.new("RGB", (32, 32), color=(255, 0, 0))
+    right = PIL.Image.new("RGB", (32, 32), color=(0, 255, 0))
+    left.save(img_path, save_all=True, append_images=[right])
+    mocker.patch(
+        "comfyui_jh_xmp_metadata_nodes.jh_load_image_with_xmp_metadata_node.folder_paths.get_annotated_filepath",
+        return_value=str(img_path),
+    )
+    frame_to_tensors = mocker.spy(JHLoadImageWithXMPMetadataNode, "frame_to_tensors")
+
+    node = JHLoadImageWithXMPMetadataNode()
+    output = node.load_image(img_path.name)
+
+    assert frame_to_tensors.call_count == 1
+    assert output.IMAGE.shape == (1, 32, 32, 3)
+    assert output.MASK.shape == (1, 64, 64)
+    assert output.IMAGE[0, 16, 16, 0] > 0.9  # Red, the first frame
+
+
+def save_rgba_sequence(path: Path, frame_count: int = 4) -> None:
+    rng = np.random.default_rng(0)
+    frames = [
+        PIL.Image.fromarray(rng.integers(0, 256, (24, 40, 4), dtype=np.uint8), "RGBA")
+        for _ in range(frame_count)
+    ]
+    frames[0].save(path, save_all=True, append_images=frames[1:])
+
+
+@pytest.mark.parametrize(
+    ("output_dtype", "dtype", "itemsize"),
+    [
+        ("float32", torch.float32, 4),
+        ("float16", torch.float16, 2),
+        ("uint8", torch.uint8, 1),
+    ],
+)
+def test_load_image_output_dtype(
+    mocker: MockerFixture,
+    tmp_path: Path,
+    output_dtype: str,
+    dtype: torch.dtype,
+    itemsize: int,
+) -> None:
+    img_path = tmp_path / "animation.tiff"
+    save_rgba_sequence(img_path)
+    mocker.patch(
+        "comfyui_jh_xmp_metadata_nodes.jh_load_image_with_xmp_metadata_node.folder_paths.get_annotated_filepath",
+        return_value=str(img_path),
+    )
+    expected_image, expected_mask = reference_load(img_path)
+
+    node = JHLoadImageWithXMPMetadataNode()
+    output = node.load_image(img_path.name, output_dtype=output_dtype)
+
+    assert output.IMAGE.dtype == dtype
+    assert output.MASK.dtype == dtype
+    assert output.IMAGE.shape == (4, 24, 40, 3)
+    assert output.MASK.shape == (4, 24, 40)
+    assert output.IMAGE.untyped_storage().nbytes() == 4 * 24 * 40 * 3 * itemsize
+    match dtype:
+        case torch.float32:
+            assert torch.equal(output.IMAGE, expected_image)
+            assert torch.equal(output.MASK, expected_mask)
+        case torch.float16:
+            assert torch.equal(output.IMAGE, expected_image.half())
+            assert torch.equal(output.MASK, expected_mask.half())
+        case torch.uint8:
+            assert torch.equal(output.IMAGE, (expected_image * 255).round().byte())
+            assert torch.equal(output.MASK, (expected_mask * 255).round().byte())
+
+
+@pytest.mark.parametrize("output_dtype", list(JHOutputDType))
+def test_load_image_output_dtype_without_alpha(
+    mocker: MockerFixture, sample_rgb_image_file: Path, output_dtype: JHOutputDType
+) -> None:
+    mocker.patch(
+        "comfyui_jh_xmp_metadata_nodes.jh_load_image_with_xmp_metadata_node.folder_paths.get_annotated_filepath",
+        return_value=str(sample_rgb_image_file),
+    )
+
+    node = JHLoadImageWithXMPMetadataNode()
+    output = node.load_image(sample_rgb_image_file.name, output_dtype=output_dtype)
+    metadata_only = node.load_image(
+        sample_rgb_image_file.name, metadata_only=True, output_dtype=output_dtype
+    )
+
+    assert output.IMAGE.dtype == output_dtype.torch_dtype
+    assert output.MASK.dtype == output_dtype.torch_dtype
+    assert metadata_only.IMAGE.dtype == output_dtype.torch_dtype
+    assert metadata_only.MASK.dtype == output_dtype.torch_dtype
+    assert not output.MASK.any()
+
+
+def test_load_image_invalid_output_dtype(
+    mocker: MockerFixture, sample_rgb_image_file: Path
+) -> None:
+    mocker.patch(
+        "comfyui_jh_xmp_metadata_nodes.jh_load_image_with_xmp_metadata_node.folder_paths.get_annotated_filepath",
+        return_value=str(sample_rgb_image_file),
+    )
+
+    node = JHLoadImageWithXMPMetadataNode()
+    with pytest.raises(ValueError, match="float64"):
+        node.load_image(sample_rgb_image_file.name, output_dtype="float64")
+
+
+def gradient_image(size: tuple[int, int]) -> PIL.Image.Image:
+    # Smooth, so it compresses well and survives scaling
+    x = np.linspace(0, 255, size[0], dtype=np.float32)
+    y = np.linspace(0, 255, size[1], dtype=np.float32)[:, None]
+    pixels = np.stack(
+        np.broadcast_arrays(x + 0 * y, y + 0 * x, (x + y) / 2), axis=-1
+    ).astype(np.uint8)
+    return PIL.Image.fromarray(pixels)
+
+
+@pytest.mark.parametrize("extension", [".jpeg", ".png", ".webp"])
+def test_load_image_max_dimension(
+    mocker: MockerFixture, tmp_path: Path, extension: str
+) -> None:
+    img_path = tmp_path / f"large{extension}"
+    gradient_image((1600, 1200)).save(img_path)
+    mocker.patch(
+        "comfyui_jh_xmp_metadata_nodes.jh_load_image_with_xmp_metadata_node.folder_paths.get_annotated_filepath",
+        return_value=str(img_path),
+    )
+
+    node = JHLoadImageWithXMPMetadataNode()
+    full = node.load_image(img_path.name)
+    reduced = node.load_image(img_path.name, max_dimension=400)
+
+    assert reduced.IMAGE.shape == (1, 300, 400, 3)
+    # Close to scaling down the full-size image after the fact
+    expected = torch.nn.functional.interpolate(
+        full.IMAGE.permute(0, 3, 1, 2), size=(300, 400), mode="area"
+    ).permute(0, 2, 3, 1)
+    assert (reduced.IMAGE - expected).abs().mean() < 0.01
+
+
+def test_load_image_max_dimension_uses_jpeg_draft(
+    mocker: MockerFixture, tmp_path: Path
+) -> None:
+    img_path = tmp_path / "large.jpeg"
+    gradient_image((1600, 1200)).save(img_path)
+    mocker.patch(
+        "comfyui_jh_xmp_metadata_nodes.jh_load_image_with_xmp_metadata_node.folder_paths.get_annotated_filepath",
+        return_value=str(img_path),
+    )
+    draft = mocker.spy(PIL.JpegImagePlugin.JpegImageFile, "draft")
+    reduce = mocker.spy(JHLoadImageWithXMPMetadataNode, "_reduce")
+
+    node = JHLoadImageWithXMPMetadataNode()
+    output = node.load_image(img_path.name, max_dimension=400)
+
+    draft.assert_called_once()
+    # Decoded at a quarter scale, which is exactly the requested size
+    assert reduce.call_args.args[1].size == (400, 300)
+    assert output.IMAGE.shape == (1, 300, 400, 3)
+
+
+@pytest.mark.parametrize("max_dimension", [0, 64, 1000])
+def test_load_image_max_dimension_not_reached(
+    mocker: MockerFixture, sample_rgb_image_file: Path, max_dimension: int
+) -> None:
+    mocker.patch(
+        "comfyui_jh_xmp_metadata_nodes.jh_load_image_with_xmp_metadata_node.folder_paths.get_annotated_filepath",
+        return_value=str(sample_rgb_image_file),
+    )
+    resize = mocker.spy(PIL.Image.Image, "resize")
+
+    node = JHLoadImageWithXMPMetadataNode()
+    output = node.load_image(sample_rgb_image_file.name, max_dimension=max_dimension)
+
+    resize.assert_not_called()
+    assert output.IMAGE.shape == (1, 64, 64, 3)
+
+
+def test_load_image_max_dimension_multiframe(
+    mocker: MockerFixture, tmp_path: Path
+) -> None:
+    img_path = tmp_path / "animation.tiff"
+    frames = [
+        PIL.Image.new("RGBA", (200, 100), color=(255, 0, 0, 64)),
+        PIL.Image.new("RGBA", (200, 100), color=(0, 0, 255, 255)),
+    ]
+    frames[0].save(img_path, save_all=True, append_images=frames[1:])
+    mocker.patch(
+        "comfyui_jh_xmp_metadata_nodes.jh_load_image_with_xmp_metadata_node.folder_paths.get_annotated_filepath",
+        return_value=str(img_path),
+    )
+
+    node = JHLoadImageWithXMPMetadataNode()
+    output = node.load_image(img_path.name, max_dimension=50)
+
+    assert output.IMAGE.shape == (2, 25, 50, 3)
+    assert output.MASK.shape == (2, 25, 50)
+    assert torch.allclose(output.IMAGE[1], torch.tensor([0.0, 0.0, 1.0]))
+    assert torch.allclose(output.MASK[0], torch.tensor(1 - 64 / 255))
+
+
+def test_load_image_max_dimension_with_exif_rotation(
+    mocker: MockerFixture, tmp_path: Path
+) -> None:
+    img_path = tmp_path / "rotated.jpeg"
+    exif = PIL.Image.Exif()
+    exif[0x0112] = 6  # Rotate 90° clockwise
+    gradient_image((800, 400)).save(img_path, exif=exif)
+    mocker.patch(
+        "comfyui_jh_xmp_metadata_nodes.jh_load_image_with_xmp_metadata_node.folder_paths.get_annotated_filepath",
+        return_value=str(img_path),
+    )
+
+    node = JHLoadImageWithXMPMetadataNode()
+    output = node.load_image(img_path.name, max_dimension=100)
+
+    assert output.IMAGE.shape == (1, 100, 50, 3)
+
+
+@pytest.mark.parametrize(
+    ("mode", "extension", "value", "maximum"),
+    [
+        ("I;16", ".png", 40000, 65535),
+        ("I", ".tiff", 1 << 30, (1 << 31) - 1),
+    ],
+)
+def test_load_image_max_dimension_keeps_bit_depth(
+    mocker: MockerFixture,
+    tmp_path: Path,
+    mode: str,
+    extension: str,
+    value: int,
+    maximum: int,
+) -> None:
+    img_path = tmp_path / f"deep{extension}"
+    PIL.Image.new(mode, (200, 100), color=value).save(img_path)
+    mocker.patch(
+        "comfyui_jh_xmp_metadata_nodes.jh_load_image_with_xmp_metadata_node.folder_paths.get_annotated_filepath",
+        return_value=str(img_path),
+    )
+
+    node = JHLoadImageWithXMPMetadataNode()
+    output = node.load_image(img_path.name, max_dimension=50)
+
+    assert output.IMAGE.shape == (1, 25, 50, 3)
+    assert torch.allclose(output.IMAGE, torch.tensor(value / maximum))
+
+
+def save_numbered_frames(
+    path: Path, frame_count: int, xmp_packet: str | None = None
+) -> None:
+    # The red channel of every frame holds its index
+    frames = [
+        PIL.Image.new("RGB", (16, 16), color=(i % 256, i // 256, 0))
+        for i in range(frame_count)
+    ]
+    if path.suffix == ".webp":
+        options = {"lossless": True}
+    elif xmp_packet is not None:
+        options = {"tiffinfo": {700: xmp_packet.encode("utf-8")}}
+    else:
+        options = {}
+    frames[0].save(path, save_all=True, append_images=frames[1:], **options)
+
+
+def frame_numbers(image: torch.Tensor) -> list[int]:
+    return [
+        round(r * 255) + round(g * 255) * 256 for r, g in image[:, 0, 0, :2].tolist()
+    ]
+
+
+@pytest.mark.parametrize(
+    ("start_frame", "frame_stride", "max_frames", "expected"),
+    [
+        (0, 1, 0, list(range(10))),
+        (3, 1, 0, list(range(3, 10))),
+        (0, 3, 0, [0, 3, 6, 9]),
+        (1, 4, 0, [1, 5, 9]),
+        (0, 1, 4, [0, 1, 2, 3]),
+        (2, 3, 2, [2, 5]),
+        (9, 5, 3, [9]),
+        (0, 1, 100, list(range(10))),
+    ],
+)
+@pytest.mark.parametrize("extension", [".tiff", ".webp"])
+def test_load_image_frame_selection(
+    mocker: MockerFixture,
+    tmp_path: Path,
+    extension: str,
+    start_frame: int,
+    frame_stride: int,
+    max_frames: int,
+    expected: list[int],
+) -> None:
+    img_path = tmp_path / f"numbered{extension}"
+    save_numbered_frames(img_path, 10)
+    mocker.patch(
+        "comfyui_jh_xmp_metadata_nodes.jh_load_image_with_xmp_metadata_node.folder_paths.get_annotated_filepath",
+        return_value=str(img_path),
+    )
+
+    node = JHLoadImageWithXMPMetadataNode()
+    output = node.load_image(
+        img_path.name,
+        start_frame=start_frame,
+        frame_stride=frame_stride,
+        max_frames=max_frames,
+    )
+
+    assert frame_numbers(output.IMAGE) == expected
+    assert output.MASK.shape[0] == len(expected)
+    # Only the selected frames are allocated for
+    assert output.IMAGE.untyped_storage().nbytes() == len(expected) * 16 * 16 * 3 * 4
+
+
+def test_load_image_frame_selection_reads_metadata_from_first_frame(
+    mocker: MockerFixture, tmp_path: Path, valid_xml_string: str
+) -> None:
+    img_path = tmp_path / "numbered.tiff"
+    save_numbered_frames(img_path, 4, valid_xml_string)
+    mocker.patch(
+        "comfyui_jh_xmp_metadata_nodes.jh_load_image_with_xmp_metadata_node.folder_paths.get_annotated_filepath",
+        return_value=str(img_path),
+    )
+
+    node = JHLoadImageWithXMPMetadataNode()
+    output = node.load_image(img_path.name, start_frame=2)
+
+    assert frame_numbers(output.IMAGE) == [2, 3]
+    assert output.title == "Test Title"
+
+
+def test_load_image_start_frame_out_of_range(
+    mocker: MockerFixture, sample_multiframe_image_file: Path
+) -> None:
+    mocker.patch(
+        "comfyui_jh_xmp_metadata_nodes.jh_load_image_with_xmp_metadata_node.folder_paths.get_annotated_filepath",
+        return_value=str(sample_multiframe_image_file),
+    )
+
+    node = JHLoadImageWithXMPMetadataNode()
+    with pytest.raises(ValueError, match="only has 3 frame"):
+        node.load_image(sample_multiframe_image_file.name, start_frame=3)
+
+
+def test_load_image_frame_selection_skips_tiff_pages(
+    mocker: MockerFixture, tmp_path: Path
+) -> None:
+    img_path = tmp_path / "numbered.tiff"
+    save_numbered_frames(img_path, 10)
+    mocker.patch(
+        "comfyui_jh_xmp_metadata_nodes.jh_load_image_with_xmp_metadata_node.folder_paths.get_annotated_filepath",
+        return_value=str(img_path),
+    )
+    decoded_frames: set[int] = set()
+    load = PIL.TiffImagePlugin.TiffImageFile.load
+
+    def recording_load(self: PIL.TiffImagePlugin.TiffImageFile) -> object:
+        decoded_frames.add(self.tell())
+        return load(self)
+
+    mocker.patch.object(PIL.TiffImagePlugin.TiffImageFile, "load", recording_load)
+
+    node = JHLoadImageWithXMPMetadataNode()
+    output = node.load_image(img_path.name, start_frame=1, frame_stride=4)
+
+    # TIFF pages are independent, so only the wanted ones are decoded
+    assert frame_numbers(output.IMAGE) == [1, 5, 9]
+    assert decoded_frames == {1, 5, 9}
+
+
+def test_load_image_frame_selection_3000_frame_webp_converts_only_selected(
+    mocker: MockerFixture, tmp_path: Path
+) -> None:
+    img_path = tmp_path / "numbered.webp"
+    save_numbered_frames(img_path, 3000)
+    mocker.patch(
+        "comfyui_jh_xmp_metadata_nodes.jh_load_image_with_xmp_metadata_node.folder_paths.get_annotated_filepath",
+        return_value=str(img_path),
+    )
+    frame_to_tensors = mocker.spy(JHLoadImageWithXMPMetadataNode, "frame_to_tensors")
+    node = JHLoadImageWithXMPMetadataNode()
+
+    output = node.load_image(img_path.name, frame_stride=3000 // 16, max_frames=16)
+
+    # Pillow still decodes every WebP frame in between, but only the 16
+    # selected ones are converted
+    assert frame_to_tensors.call_count == 16
+    assert frame_numbers(output.IMAGE) == list(range(0, 3000, 3000 // 16))[:16]
+
+
+def save_mixed_frames(path: Path, size: tuple[int, int] = (40, 24)) -> None:
+    # Random frames with and without alpha, and in a TIFF, one of a
+    # different size
+    rng = np.random.default_rng(0)
+    frames = [
+        PIL.Image.fromarray(
+            rng.integers(0, 256, (size[1], size[0], 4), dtype=np.uint8), "RGBA"
+        ).convert("RGBA" if i % 3 else "RGB")
+        for i in range(12)
+    ]
+    if path.suffix == ".tiff":
+        frames[5] = frames[5].resize((20, 12))
+    options = {"lossless": True} if path.suffix == ".webp" else {}
+    frames[0].save(path, save_all=True, append_images=frames[1:], **options)
+
+
+@pytest.mark.parametrize("extension", [".tiff", ".png", ".webp", ".gif"])
+@pytest.mark.parametrize("output_dtype", ["float32", "uint8"])
+def test_load_image_decode_workers_matches_serial(
+    mocker: MockerFixture, tmp_path: Path, extension: str, output_dtype: str
+) -> None:
+    img_path = tmp_path / f"mixed{extension}"
+    save_mixed_frames(img_path)
+    mocker.patch(
+        "comfyui_jh_xmp_metadata_nodes.jh_load_image_with_xmp_metadata_node.folder_paths.get_annotated_filepath",
+        return_value=str(img_path),
+    )
+
+    node = JHLoadImageWithXMPMetadataNode()
+    serial = node.load_image(img_path.name, output_dtype=output_dtype)
+    parallel = node.load_image(
+        img_path.name, output_dtype=output_dtype, decode_workers=4
+    )
+
+    assert torch.equal(parallel.IMAGE, serial.IMAGE)
+    assert torch.equal(parallel.MASK, serial.MASK)
+    if extension == ".tiff":
+        # The page of a different size is still skipped
+        assert parallel.IMAGE.shape[0] == 11
+
+
+def test_load_image_decode_workers_decode_tiff_pages_on_workers(
+    mocker: MockerFixture, tmp_path: Path
+) -> None:
+    img_path = tmp_path / "numbered.tiff"
+    save_numbered_frames(img_path, 20)
+    mocker.patch(
+        "comfyui_jh_xmp_metadata_nodes.jh_load_image_with_xmp_metadata_node.folder_paths.get_annotated_filepath",
+        return_value=str(img_path),
+    )
+    decoding_threads: set[str] = set()
+    load = PIL.TiffImagePlugin.TiffImageFile.load
+
+    def recording_load(self: PIL.TiffImagePlugin.TiffImageFile) -> object:
+        decoding_threads.add(threading.current_thread().name)
+        return load(self)
+
+    mocker.patch.object(PIL.TiffImagePlugin.TiffImageFile, "load", recording_load)
+    close = mocker.spy(PIL.TiffImagePlugin.TiffImageFile, "close")
+
+    node = JHLoadImageWithXMPMetadataNode()
+    output = node.load_image(img_path.name, frame_stride=2, decode_workers=3)
+
+    assert frame_numbers(output.IMAGE) == list(range(0, 20, 2))
+    assert any(name.startswith("JHLoadImage") for name in decoding_threads)
+    # Every worker's file handle is closed again
+    worker_handles = {id(call.args[0]) for call in close.call_args_list}
+    assert 1 <= len(worker_handles) <= 3
+
+
+def test_load_image_decode_workers_raise_errors(
+    mocker: MockerFixture, tmp_path: Path
+) -> None:
+    img_path = tmp_path / "numbered.tiff"
+    save_numbered_frames(img_path, 10)
+    mocker.patch(
+        "comfyui_jh_xmp_metadata_nodes.jh_load_image_with_xmp_metadata_node.folder_paths.get_annotated_filepath",
+        return_value=str(img_path),
+    )
+    frame_to_tensors = JHLoadImageWithXMPMetadataNode.frame_to_tensors
+
+    def failing_frame_to_tensors(
+        self: JHLoadImageWithXMPMetadataNode,
+        raw_frame: PIL.Image.Image,
+        **kwargs: object,
+    ) -> tuple[torch.Tensor, torch.Tensor]:
+        if raw_frame.tell() == 6:
+            raise OSError("Broken page")
+        return frame_to_tensors(self, raw_frame, **kwargs)
+
+    mocker.patch.object(
+        JHLoadImageWithXMPMetadataNode, "frame_to_tensors", failing_frame_to_tensors
+    )
+
+    node = JHLoadImageWithXMPMetadataNode()
+    with pytest.raises(OSError, match="Broken page"):
+        node.load_image(img_path.name, decode_workers=2)
+
+
+def test_load_image_decoded_cache_hit(
+    mocker: MockerFixture,
+    monkeypatch: pytest.MonkeyPatch,
+    sample_rgb_image_file: Path,
+) -> None:
+    mocker.patch(
+        "comfyui_jh_xmp_metadata_nodes.jh_load_image_with_xmp_metadata_node.folder_paths.get_annotated_filepath",
+        return_value=str(sample_rgb_image_file),
+    )
+    cache: JHDecodedImageCache = JHDecodedImageCache(max_bytes=1 << 20)
+    monkeypatch.setattr(JHLoadImageWithXMPMetadataNode, "decoded_cache", cache)
+    open_spy = mocker.spy(PIL.Image, "open")
+
+    first = JHLoadImageWithXMPMetadataNode().load_image(sample_rgb_image_file.name)
+    second = JHLoadImageWithXMPMetadataNode().load_image(
+        sample_rgb_image_file.name, decode_workers=4
+    )
+
+    assert second is first
+    assert open_spy.call_count == 1
+    info = cache.cache_info()
+    assert (info.hits, info.misses, info.entries) == (1, 1, 1)
+    assert info.current_bytes == 64 * 64 * 3 * 4 + 64 * 64 * 4
+
+
+def test_load_image_decoded_cache_invalidated_by_file_change(
+    mocker: MockerFixture,
+    monkeypatch: pytest.MonkeyPatch,
+    sample_rgb_image_file: Path,
+) -> None:
+    mocker.patch(
+        "comfyui_jh_xmp_metadata_nodes.jh_load_image_with_xmp_metadata_node.folder_paths.get_annotated_filepath",
+        return_value=str(sample_rgb_image_file),
+    )
+    cache: JHDecodedImageCache = JHDecodedImageCache(max_bytes=1 << 20)
+    monkeypatch.setattr(JHLoadImageWithXMPMetadataNode, "decoded_cache", cache)
+    node = JHLoadImageWithXMPMetadataNode()
+
+    first = node.load_image(sample_rgb_image_file.name)
+    PIL.Image.new("RGB", (32, 32), color=(255, 255, 255)).save(sample_rgb_image_file)
+    second = node.load_image(sample_rgb_image_file.name)
+
+    assert first.IMAGE.shape == (1, 64, 64, 3)
+    assert second.IMAGE.shape == (1, 32, 32, 3)
+    assert cache.cache_info().misses == 2
+
+
+@pytest.mark.parametrize(
+    "options",
+    [
+        {"output_dtype": "uint8"},
+        {"max_dimension": 8},
+        {"start_frame": 1},
+        {"frame_stride": 2},
+        {"max_frames": 1},
+    ],
+)
+def test_load_image_decoded_cache_keyed_by_options(
+    mocker: MockerFixture,
+    monkeypatch: pytest.MonkeyPatch,
+    tmp_path: Path,
+    options: dict[str, object],
+) -> None:
+    img_path = tmp_path / "numbered.tiff"
+    save_numbered_frames(img_path, 4)
+    mocker.patch(
+        "comfyui_jh_xmp_metadata_nodes.jh_load_image_with_xmp_metadata_node.folder_paths.get_annotated_filepath",
+        return_value=str(img_path),
+    )
+    cache: JHDecodedImageCache = JHDecodedImageCache(max_bytes=1 << 20)
+    monkeypatch.setattr(JHLoadImageWithXMPMetadataNode, "decoded_cache", cache)
+    node = JHLoadImageWithXMPMetadataNode()
+
+    default = node.load_image(img_path.name)
+    with_options = node.load_image(img_path.name, **options)
+
+    assert with_options is not default
+    assert cache.cache_info().misses == 2
+    assert node.load_image(img_path.name, **options) is with_options
+
+
+def test_load_image_decoded_cache_skips_metadata_only(
+    mocker: MockerFixture,
+    monkeypatch: pytest.MonkeyPatch,
+    sample_rgb_image_file: Path,
+) -> None:
+    mocker.patch(
+        "comfyui_jh_xmp_metadata_nodes.jh_load_image_with_xmp_metadata_node.folder_paths.get_annotated_filepath",
+        return_value=str(sample_rgb_image_file),
+    )
+    cache: JHDecodedImageCache = JHDecodedImageCache(max_bytes=1 << 20)
+    monkeypatch.setattr(JHLoadImageWithXMPMetadataNode, "decoded_cache", cache)
+
+    JHLoadImageWithXMPMetadataNode().load_image(
+        sample_rgb_image_file.name, metadata_only=True
+    )
+
+    assert cache.cache_info().entries == 0
+
+
+@pytest.mark.parametrize(
+    "value, expected_megabytes",
+    [(None, 512), ("64", 64), (" 0 ", 0), ("-1", 512), ("1.5", 512), ("", 512)],
+)
+def test_megabytes_from_environment(
+    monkeypatch: pytest.MonkeyPatch,
+    caplog: pytest.LogCaptureFixture,
+    value: str | None,
+    expected_megabytes: int,
+) -> None:
+    if value is None:
+        monkeypatch.delenv("JH_XMP_DECODED_CACHE_MB", raising=False)
+    else:
+        monkeypatch.setenv("JH_XMP_DECODED_CACHE_MB", value)
+
+    megabytes = _megabytes_from_environment("JH_XMP_DECODED_CACHE_MB", 512)
+
+    assert megabytes == expected_megabytes << 20
+    warned = "Invalid JH_XMP_DECODED_CACHE_MB" in caplog.text
+    assert warned == (value in ("-1", "1.5", ""))
+
+
+@pytest.mark.parametrize("output_dtype", ["float32", "float16", "uint8"])
+def test_load_image_disk_cache_reload(
+    mocker: MockerFixture,
+    monkeypatch: pytest.MonkeyPatch,
+    tmp_path: Path,
+    valid_xml_string: str,
+    output_dtype: str,
+) -> None:
+    img_path = tmp_path / "numbered.tiff"
+    save_numbered_frames(img_path, 5, valid_xml_string)
+    mocker.patch(
+        "comfyui_jh_xmp_metadata_nodes.jh_load_image_with_xmp_metadata_node.folder_paths.get_annotated_filepath",
+        return_value=str(img_path),
+    )
+    disk_cache = JHDecodedTensorDiskCache(tmp_path / "cache", max_bytes=1 << 20)
+    mocker.patch.object(
+        JHLoadImageWithXMPMetadataNode, "get_disk_cache", return_value=disk_cache
+    )
+    node = JHLoadImageWithXMPMetadataNode()
+
+    decoded = node.load_image(img_path.name, output_dtype=output_dtype)
+    # As if ComfyUI had been restarted since, with the file copied elsewhere
+    copied_path = tmp_path / "copied.tiff"
+    shutil.copy(img_path, copied_path)
+    mocker.patch(
+        "comfyui_jh_xmp_metadata_nodes.jh_load_image_with_xmp_metadata_node.folder_paths.get_annotated_filepath",
+        return_value=str(copied_path),
+    )
+    open_spy = mocker.spy(PIL.Image, "open")
+    reloaded = node.load_image(copied_path.name, output_dtype=output_dtype)
+
+    open_spy.assert_not_called()
+    assert disk_cache.cache_info().hits == 1
+    assert reloaded.IMAGE.dtype == decoded.IMAGE.dtype
+    assert torch.equal(reloaded.IMAGE, decoded.IMAGE)
+    assert torch.equal(reloaded.MASK, decoded.MASK)
+    assert reloaded[2:] == decoded[2:]
+    assert reloaded.creator == "Test Creator"
+
+
+def test_load_image_disk_cache_keyed_by_content_and_options(
+    mocker: MockerFixture,
+    monkeypatch: pytest.MonkeyPatch,
+    tmp_path: Path,
+) -> None:
+    img_path = tmp_path / "numbered.tiff"
+    save_numbered_frames(img_path, 5)
+    mocker.patch(
+        "comfyui_jh_xmp_metadata_nodes.jh_load_image_with_xmp_metadata_node.folder_paths.get_annotated_filepath",
+        return_value=str(img_path),
+    )
+    disk_cache = JHDecodedTensorDiskCache(tmp_path / "cache", max_bytes=1 << 20)
+    mocker.patch.object(
+        JHLoadImageWithXMPMetadataNode, "get_disk_cache", return_value=disk_cache
+    )
+    node = JHLoadImageWithXMPMetadataNode()
+
+    node.load_image(img_path.name)
+    node.load_image(img_path.name, frame_stride=2)
+    save_numbered_frames(img_path, 3)
+    changed = node.load_image(img_path.name)
+
+    assert changed.IMAGE.shape[0] == 3
+    info = disk_cache.cache_info()
+    assert (info.hits, info.misses, info.entries) == (0, 3, 3)
+
+
+def test_load_image_disk_cache_uses_sha256(
+    mocker: MockerFixture,
+    monkeypatch: pytest.MonkeyPatch,
+    tmp_path: Path,
+) -> None:
+    img_path = tmp_path / "numbered.tiff"
+    save_numbered_frames(img_path, 2)
+    mocker.patch(
+        "comfyui_jh_xmp_metadata_nodes.jh_load_image_with_xmp_metadata_node.folder_paths.get_annotated_filepath",
+        return_value=str(img_path),
+    )
+    disk_cache = JHDecodedTensorDiskCache(tmp_path / "cache", max_bytes=1 << 20)
+    mocker.patch.object(
+        JHLoadImageWithXMPMetadataNode, "get_disk_cache", return_value=disk_cache
+    )
+    monkeypatch.setattr(
+        JHLoadImageWithXMPMetadataNode,
+        "fingerprint_algorithm",
+        JHFingerprintAlgorithm.CRC32,
+    )
+    fingerprint = mocker.spy(JHFileFingerprint, "fingerprint")
+
+    JHLoadImageWithXMPMetadataNode().load_image(img_path.name)
+
+    fingerprint.assert_called_once_with(str(img_path), JHFingerprintAlgorithm.SHA256)
+
+
+def test_load_image_disk_cache_same_digest_different_size(
+    mocker: MockerFixture,
+    tmp_path: Path,
+) -> None:
+    disk_cache = JHDecodedTensorDiskCache(tmp_path / "cache", max_bytes=1 << 20)
+    mocker.patch.object(
+        JHLoadImageWithXMPMetadataNode, "get_disk_cache", return_value=disk_cache
+    )
+    # As if the two files' contents collided
+    mocker.patch.object(JHFileFingerprint, "fingerprint", return_value="0" * 64)
+    node = JHLoadImageWithXMPMetadataNode()
+    loaded: list[torch.Tensor] = []
+    for frame_count in (2, 3):
+        img_path = tmp_path / f"numbered_{frame_count}.tiff"
+        save_numbered_frames(img_path, frame_count)
+        mocker.patch(
+            "comfyui_jh_xmp_metadata_nodes.jh_load_image_with_xmp_metadata_node.folder_paths.get_annotated_filepath",
+            return_value=str(img_path),
+        )
+        loaded.append(node.load_image(img_path.name).IMAGE)
+
+    assert [image.shape[0] for image in loaded] == [2, 3]
+    assert disk_cache.cache_info().misses == 2
+
+
+def test_get_disk_cache_is_created_lazily(
+    monkeypatch: pytest.MonkeyPatch,
+    tmp_path: Path,
+) -> None:
+    directory = tmp_path / "cache"
+    monkeypatch.setenv("JH_XMP_DISK_CACHE_DIR", str(directory))
+    monkeypatch.setenv("JH_XMP_DISK_CACHE_MB", "8")
+
+    assert not directory.exists()
+    disk_cache = JHLoadImageWithXMPMetadataNode.get_disk_cache()
+
+    assert disk_cache is not None
+    assert disk_cache.directory == str(directory)
+    assert disk_cache.max_bytes == 8 << 20
+    assert directory.is_dir()
+    assert JHLoadImageWithXMPMetadataNode.get_disk_cache() is disk_cache
+
+
+def test_get_disk_cache_off_when_directory_fails(
+    monkeypatch: pytest.MonkeyPatch,
+    caplog: pytest.LogCaptureFixture,
+    tmp_path: Path,
+) -> None:
+    not_a_directory = tmp_path / "file"
+    not_a_directory.write_bytes(b"")
+    monkeypatch.setenv("JH_XMP_DISK_CACHE_DIR", str(not_a_directory / "cache"))
+
+    assert JHLoadImageWithXMPMetadataNode.get_disk_cache() is None
+    assert "the disk cache is off" in caplog.text
+
+
+def save_long_animation(path: Path, frame_count: int, size: int) -> None:
+    # Every frame differs from the one before, or Pillow would merge them
+    frames = [
+        PIL.Image.new("RGB", (size, size), color=(i % 256, i // 256, 0))
+        for i in range(frame_count)
+    ]
+    frames[0].save(path, save_all=True, append_images=frames[1:])
+
+
+def peak_anonymous_memory_growth(
+    function: Callable[[], object],
+) -> tuple[object, int]:
+    # Memory-mapped files show up in RSS too, as long as their pages are
+    # cached, but the kernel can write those out and drop them. Anonymous
+    # memory is what actually has to fit in RAM (or swap), and so do files
+    # mapped from a tmpfs, which count as shared memory.
+    def anonymous_memory() -> int:
+        fields: dict[str, int] = {}
+        with open("/proc/self/status") as f:
+            for line in f:
+                name, _, value = line.partition(":")
+                if name in ("RssAnon", "RssShmem"):
+                    fields[name] = int(value.split()[0]) * 1024
+        if len(fields) < 2:
+            pytest.skip("RssAnon or RssShmem isn't available")
+        return sum(fields.values())
+
+    baseline = anonymous_memory()
+    peak = baseline
+    done = threading.Event()
+
+    def sample() -> None:
+        nonlocal peak
+        while not done.is_set():
+            peak = max(peak, anonymous_memory())
+            time.sleep(0.001)
+
+    sampler = threading.Thread(target=sample)
+    sampler.start()
+    try:
+        result = function()
+    finally:
+        done.set()
+        sampler.join()
+    return result, max(peak, anonymous_memory()) - baseline
+
+
+def is_file_backed(tensor: torch.Tensor) -> bool:
+    # Whether the tensor's memory is mapped from a file, going by the
+    # inode of the mapping it lies in
+    address = tensor.data_ptr()
+    try:
+        with open("/proc/self/maps") as f:
+            for line in f:
+                fields = line.split()
+                start, end = (int(bound, 16) for bound in fields[0].split("-"))
+                if start <= address < end:
+                    return fields[4] != "0"
+    except FileNotFoundError:
+        pytest.skip("/proc/self/maps isn't available")
+    return False
+
+
+def test_load_image_memory_budget_error(mocker: MockerFixture, tmp_path: Path) -> None:
+    img_path = tmp_path / "animation.gif"
+    save_long_animation(img_path, 4, 256)
+    mocker.patch(
+        "comfyui_jh_xmp_metadata_nodes.jh_load_image_with_xmp_metadata_node.folder_paths.get_annotated_filepath",
+        return_value=str(img_path),
+    )
+    node = JHLoadImageWithXMPMetadataNode()
+    frame_to_tensors = mocker.spy(JHLoadImageWithXMPMetadataNode, "frame_to_tensors")
+
+    with pytest.raises(
+        ValueError, match=r"4 frame\(s\) of 256x256 pixels needs 4 MB.* is 1\."
+    ):
+        node.load_image(img_path.name, memory_budget_mb=1)
+    frame_to_tensors.assert_not_called()
+
+    # The same frames fit once they're smaller, or fewer
+    assert node.load_image(img_path.name, memory_budget_mb=1, max_dimension=128)
+    assert node.load_image(img_path.name, memory_budget_mb=1, max_frames=1)
+    assert node.load_image(img_path.name, memory_budget_mb=1, output_dtype="uint8")
+
+
+def test_load_image_memory_budget_downscale(
+    mocker: MockerFixture, tmp_path: Path
+) -> None:
+    img_path = tmp_path / "wide.tiff"
+    PIL.Image.new("RGBA", (1000, 300), color=(255, 0, 0, 128)).save(img_path)
+    mocker.patch(
+        "comfyui_jh_xmp_metadata_nodes.jh_load_image_with_xmp_metadata_node.folder_paths.get_annotated_filepath",
+        return_value=str(img_path),
+    )
+
+    output = JHLoadImageWithXMPMetadataNode().load_image(
+        img_path.name, memory_budget_mb=1, over_budget="downscale"
+    )
+
+    # As large as fits in 1 MB at the same aspect ratio; 469x141 wouldn't
+    assert output.IMAGE.shape == (1, 140, 468, 3)
+    assert output.MASK.shape == (1, 140, 468)
+    assert output.IMAGE.nbytes + output.MASK.nbytes <= 1 << 20
+
+
+def test_load_image_memory_budget_downscale_impossible(
+    mocker: MockerFixture, tmp_path: Path
+) -> None:
+    img_path = tmp_path / "numbered.tiff"
+    save_numbered_frames(img_path, 3)
+    mocker.patch(
+        "comfyui_jh_xmp_metadata_nodes.jh_load_image_with_xmp_metadata_node.folder_paths.get_annotated_filepath",
+        return_value=str(img_path),
+    )
+    # Not even a single pixel per frame fits in 1 MB
+    mocker.patch.object(
+        JHLoadImageWithXMPMetadataNode,
+        "_frame_indices",
+        return_value=range(100_000),
+    )
+
+    with pytest.raises(ValueError, match="set over_budget to disk"):
+        JHLoadImageWithXMPMetadataNode().load_image(
+            img_path.name, memory_budget_mb=1, over_budget="downscale"
+        )
+
+
+@pytest.mark.parametrize("extension", [".gif", ".tiff", ".png"])
+def test_load_image_memory_budget_disk_matches_ram(
+    mocker: MockerFixture, tmp_path: Path, extension: str
+) -> None:
+    img_path = tmp_path / f"mixed{extension}"
+    save_mixed_frames(img_path, (256, 128))
+    mocker.patch(
+        "comfyui_jh_xmp_metadata_nodes.jh_load_image_with_xmp_metadata_node.folder_paths.get_annotated_filepath",
+        return_value=str(img_path),
+    )
+    node = JHLoadImageWithXMPMetadataNode()
+
+    in_ram = node.load_image(img_path.name)
+    on_disk = node.load_image(
+        img_path.name, memory_budget_mb=1, over_budget=JHOverBudgetPolicy.DISK
+    )
+
+    assert torch.equal(on_disk.IMAGE, in_ram.IMAGE)
+    assert torch.equal(on_disk.MASK, in_ram.MASK)
+    assert is_file_backed(on_disk.IMAGE)
+    assert not is_file_backed(in_ram.IMAGE)
+
+
+def test_load_image_memory_budget_disk_single_frame(
+    mocker: MockerFixture, tmp_path: Path
+) -> None:
+    img_path = tmp_path / "single.png"
+    PIL.Image.new("RGBA", (512, 512), color=(255, 0, 0, 0)).save(img_path)
+    mocker.patch(
+        "comfyui_jh_xmp_metadata_nodes.jh_load_image_with_xmp_metadata_node.folder_paths.get_annotated_filepath",
+        return_value=str(img_path),
+    )
+
+    output = JHLoadImageWithXMPMetadataNode().load_image(
+        img_path.name, memory_budget_mb=1, over_budget="disk"
+    )
+
+    assert is_file_backed(output.IMAGE)
+    assert is_file_backed(output.MASK)
+    assert torch.all(output.IMAGE[..., 0] == 1.0)
+    assert torch.all(output.MASK == 1.0)
+
+
+def test_load_image_memory_budget_disk_spill_directory(
+    mocker: MockerFixture,
+    monkeypatch: pytest.MonkeyPatch,
+    tmp_path: Path,
+) -> None:
+    img_path = tmp_path / "single.png"
+    PIL.Image.new("RGB", (512, 512)).save(img_path)
+    mocker.patch(
+        "comfyui_jh_xmp_metadata_nodes.jh_load_image_with_xmp_metadata_node.folder_paths.get_annotated_filepath",
+        return_value=str(img_path),
+    )
+    comfyui_temp = tmp_path / "comfyui_temp"
+    mocker.patch(
+        "comfyui_jh_xmp_metadata_nodes.jh_load_image_with_xmp_metadata_node.folder_paths.get_temp_directory",
+        return_value=str(comfyui_temp),
+    )
+    temporary_file = mocker.spy(tempfile, "TemporaryFile")
+    node = JHLoadImageWithXMPMetadataNode()
+
+    node.load_image(img_path.name, memory_budget_mb=1, over_budget="disk")
+    monkeypatch.delenv("JH_XMP_SPILL_DIR")
+    node.load_image(img_path.name, memory_budget_mb=1, over_budget="disk")
+
+    directories = [call.kwargs["dir"] for call in temporary_file.call_args_list]
+    assert directories == [str(tmp_path / "spill"), str(comfyui_temp)]
+
+
+@pytest.mark.parametrize("over_budget", ["disk", "downscale"])
+def test_load_image_memory_budget_long_animation(
+    mocker: MockerFixture, tmp_path: Path, over_budget: str
+) -> None:
+    # 400 frames at 256x256 would take 400 MB as float32 IMAGE and MASK
+    img_path = tmp_path / "long.gif"
+    save_long_animation(img_path, 400, 256)
+    mocker.patch(
+        "comfyui_jh_xmp_metadata_nodes.jh_load_image_with_xmp_metadata_node.folder_paths.get_annotated_filepath",
+        return_value=str(img_path),
+    )
+    node = JHLoadImageWithXMPMetadataNode()
+    budget_mb = 64
+
+    output, growth = peak_anonymous_memory_growth(
+        lambda: node.load_image(
+            img_path.name, memory_budget_mb=budget_mb, over_budget=over_budget
+        )
+    )
+
+    assert growth < budget_mb << 20
+    assert frame_numbers(output.IMAGE) == list(range(400))
+
+
+@pytest.mark.benchmark
+def test_benchmark_16_bit_8k_conversion() -> None:
+    node = JHLoadImageWithXMPMetadataNode()
+    pixels = np.random.default_rng(0).integers(0, 65536, (4320, 7680), dtype=np.uint16)
+    frame = PIL.Image.fromarray(pixels)
+    image_out = torch.empty((4320, 7680, 3))
+
+    def vectorized() -> None:
+        node.frame_to_tensors(frame, image_out=image_out)
+
+    def legacy() -> None:
+        legacy_frame_to_tensors(frame)
+
+    vectorized_time = min(timeit.repeat(vectorized, number=1, repeat=2))
+    legacy_time = min(timeit.repeat(legacy, number=1, repeat=2))
+
+    assert vectorized_time < legacy_time
+    # The legacy conversion squeezed everything into 8 bits on the way
+    assert image_out[:64, :64, 0].unique().numel() > 256
+
+
+@pytest.mark.benchmark
+def test_benchmark_max_dimension_40_megapixel_jpeg(
+    mocker: MockerFixture, tmp_path: Path
+) -> None:
+    img_path = tmp_path / "large.jpeg"
+    gradient_image((7680, 5120)).save(img_path, quality=90)
+    mocker.patch(
+        "comfyui_jh_xmp_metadata_nodes.jh_load_image_with_xmp_metadata_node.folder_paths.get_annotated_filepath",
+        return_value=str(img_path),
+    )
+    node = JHLoadImageWithXMPMetadataNode()
+
+    def full() -> None:
+        node.load_image(img_path.name)
+
+    def reduced() -> None:
+        node.load_image(img_path.name, max_dimension=1024)
+
+    full_time = min(timeit.repeat(full, number=1, repeat=2))
+    reduced_time = min(timeit.repeat(reduced, number=1, repeat=2))
+
+    assert reduced_time < full_time / 3
+
+
+@pytest.mark.skipif(
+    (os.cpu_count() or 1) < 4, reason="Needs at least 4 CPUs to run in parallel"
+)
+@pytest.mark.benchmark
+def test_benchmark_decode_workers_200_page_tiff(
+    mocker: MockerFixture, tmp_path: Path
+) -> None:
+    img_path = tmp_path / "pages.tiff"
+    rng = np.random.default_rng(0)
+    pages = [
+        PIL.Image.fromarray(rng.integers(0, 256, (256, 256, 3), dtype=np.uint8))
+        for _ in range(200)
+    ]
+    pages[0].save(
+        img_path,
+        save_all=True,
+        append_images=pages[1:],
+        compression="tiff_deflate",
+    )
+    mocker.patch(
+        "comfyui_jh_xmp_metadata_nodes.jh_load_image_with_xmp_metadata_node.folder_paths.get_annotated_filepath",
+        return_value=str(img_path),
+    )
+    node = JHLoadImageWithXMPMetadataNode()
+
+    def serial() -> None:
+        node.load_image(img_path.name)
+
+    def parallel() -> None:
+        node.load_image(img_path.name, decode_workers=4)
+
+    serial_time = min(timeit.repeat(serial, number=1, repeat=3))
+    parallel_time = min(timeit.repeat(parallel, number=1, repeat=3))
+
+    assert parallel_time < serial_time / 1.5
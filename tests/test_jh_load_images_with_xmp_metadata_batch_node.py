@@ -0,0 +1,432 @@
+import itertools
+import os
+from collections.abc import Callable
+from pathlib import Path
+
+import numpy as np
+import PIL.Image
+import PIL.PngImagePlugin
+import pytest
+import torch
+from pytest_mock import MockerFixture
+
+from comfyui_jh_xmp_metadata_nodes.jh_load_image_with_xmp_metadata_node import (
+    JHLoadImageWithXMPMetadataNode,
+)
+from comfyui_jh_xmp_metadata_nodes.jh_load_images_with_xmp_metadata_batch_node import (
+    JHLoadImagesWithXMPMetadataBatchNode,
+    JHSizePolicy,
+    JHSortOrder,
+)
+from comfyui_jh_xmp_metadata_nodes.jh_save_image_with_xmp_metadata_node import (
+    JHSaveImageWithXMPMetadataNode,
+    JHSupportedImageTypes,
+)
+from comfyui_jh_xmp_metadata_nodes.jh_xmp_metadata import JHXMPMetadata
+
+# region Fixtures
+
+
+@pytest.fixture
+def node() -> JHLoadImagesWithXMPMetadataBatchNode:
+    return JHLoadImagesWithXMPMetadataBatchNode()
+
+
+def random_image(
+    size: tuple[int, int], mode: str = "RGB", seed: int = 0
+) -> PIL.Image.Image:
+    pixels = np.random.default_rng(seed).integers(
+        0, 256, (size[1], size[0], 4), dtype=np.uint8
+    )
+    return PIL.Image.fromarray(pixels, "RGBA").convert(mode)
+
+
+def save_png(path: Path, image: PIL.Image.Image, title: str | None = None) -> Path:
+    pnginfo = PIL.PngImagePlugin.PngInfo()
+    if title is not None:
+        metadata = JHXMPMetadata()
+        metadata.title = title
+        pnginfo.add_text("XML:com.adobe.xmp", metadata.to_wrapped_string())
+    image.save(path, pnginfo=pnginfo)
+    return path
+
+
+def load_single(mocker: MockerFixture, path: Path) -> torch.Tensor:
+    mocker.patch(
+        "comfyui_jh_xmp_metadata_nodes.jh_load_image_with_xmp_metadata_node.folder_paths.get_annotated_filepath",
+        return_value=str(path),
+    )
+    return JHLoadImageWithXMPMetadataNode().load_image(path.name).IMAGE
+
+
+# endregion Fixtures
+
+# region Tests
+
+
+def test_input_types() -> None:
+    input_types = JHLoadImagesWithXMPMetadataBatchNode.INPUT_TYPES()
+    assert input_types.keys() == {"required", "optional"}
+    assert input_types["required"].keys() == {
+        "directory",
+        "pattern",
+        "sort_by",
+        "offset",
+        "limit",
+        "size_policy",
+    }
+    assert input_types["optional"].keys() == {"output_dtype", "decode_workers"}
+    assert input_types["required"]["size_policy"][0] == ["pad", "resize", "split"]
+
+
+def test_outputs_are_lists() -> None:
+    node_class = JHLoadImagesWithXMPMetadataBatchNode
+    assert len(node_class.OUTPUT_IS_LIST) == len(node_class.RETURN_TYPES)
+    assert all(node_class.OUTPUT_IS_LIST)
+    assert len(node_class.RETURN_NAMES) == len(node_class.RETURN_TYPES)
+
+
+def test_outputs_have_one_entry_per_image(
+    node: JHLoadImagesWithXMPMetadataBatchNode, tmp_path: Path
+) -> None:
+    for i, size in enumerate([(40, 24), (16, 16), (40, 24)]):
+        save_png(tmp_path / f"{i}.png", random_image(size, seed=i))
+
+    for size_policy in JHSizePolicy:
+        output = node.load_images(str(tmp_path), "*.png", size_policy=size_policy)
+        assert {len(values) for values in output} == {3}
+        assert all(image.shape[0] == 1 for image in output.IMAGE)
+        assert all(mask.shape[0] == 1 for mask in output.MASK)
+
+
+def map_over_lists(function: Callable[..., dict], **inputs: list) -> list[dict]:
+    # How ComfyUI runs a node whose inputs are connected to list outputs:
+    # once per entry of the longest list, reusing the last entry of shorter
+    # ones
+    runs: int = max(len(values) for values in inputs.values())
+    return [
+        function(
+            **{name: values[min(i, len(values) - 1)] for name, values in inputs.items()}
+        )
+        for i in range(runs)
+    ]
+
+
+def test_load_images_into_save_node(
+    mocker: MockerFixture, node: JHLoadImagesWithXMPMetadataBatchNode, tmp_path: Path
+) -> None:
+    source = tmp_path / "source"
+    source.mkdir()
+    for i, size in enumerate([(40, 24), (16, 16), (40, 24)]):
+        save_png(source / f"{i}.png", random_image(size, seed=i), f"Image {i}")
+    output_dir = tmp_path / "output"
+    output_dir.mkdir()
+    counter = itertools.count(1)
+    mocker.patch(
+        "comfyui_jh_xmp_metadata_nodes.jh_save_image_with_xmp_metadata_node.folder_paths.get_save_image_path",
+        side_effect=lambda *args: (output_dir, "ComfyUI", next(counter), "", "ComfyUI"),
+    )
+    output = node.load_images(str(source), "*.png")
+
+    map_over_lists(
+        JHSaveImageWithXMPMetadataNode().save_images,
+        images=output.IMAGE,
+        title=output.title,
+        image_type=[JHSupportedImageTypes.PNG],
+    )
+
+    saved = sorted(output_dir.iterdir())
+    assert len(saved) == 3
+    for i, path in enumerate(saved):
+        with PIL.Image.open(path) as image:
+            assert image.size == PIL.Image.open(output.path[i]).size
+            xmp = JHXMPMetadata.from_string(image.info["XML:com.adobe.xmp"])
+        assert xmp.title == f"Image {i}"
+
+
+def test_list_files_sorting(tmp_path: Path) -> None:
+    for name, size, mtime in [
+        ("b.png", 30, 100),
+        ("a.png", 20, 300),
+        ("c.png", 10, 200),
+    ]:
+        path = tmp_path / name
+        path.write_bytes(b"x" * size)
+        os.utime(path, ns=(mtime * 10**9, mtime * 10**9))
+    (tmp_path / "notes.txt").write_text("not an image")
+    (tmp_path / "sub.png").mkdir()
+
+    def names(sort_by: JHSortOrder, **kwargs: int) -> list[str]:
+        files = JHLoadImagesWithXMPMetadataBatchNode.list_files(
+            str(tmp_path), "*.png", sort_by, **kwargs
+        )
+        return [Path(path).name for path in files]
+
+    assert names(JHSortOrder.NAME) == ["a.png", "b.png", "c.png"]
+    assert names(JHSortOrder.MODIFIED) == ["b.png", "c.png", "a.png"]
+    assert names(JHSortOrder.SIZE) == ["c.png", "a.png", "b.png"]
+    assert names(JHSortOrder.NAME, offset=1) == ["b.png", "c.png"]
+    assert names(JHSortOrder.NAME, limit=2) == ["a.png", "b.png"]
+    assert names(JHSortOrder.NAME, offset=1, limit=1) == ["b.png"]
+    assert names(JHSortOrder.NAME, offset=5) == []
+
+
+def test_list_files_recursive_pattern(tmp_path: Path) -> None:
+    (tmp_path / "sub").mkdir()
+    (tmp_path / "top.png").touch()
+    (tmp_path / "sub" / "nested.png").touch()
+
+    files = JHLoadImagesWithXMPMetadataBatchNode.list_files(str(tmp_path), "**/*.png")
+
+    assert files == [str(tmp_path / "sub" / "nested.png"), str(tmp_path / "top.png")]
+
+
+def test_list_files_relative_to_input_directory(
+    mocker: MockerFixture, tmp_path: Path
+) -> None:
+    (tmp_path / "batch").mkdir()
+    (tmp_path / "batch" / "image.png").touch()
+    mocker.patch(
+        "comfyui_jh_xmp_metadata_nodes.jh_load_images_with_xmp_metadata_batch_node.folder_paths.get_input_directory",
+        return_value=str(tmp_path),
+    )
+
+    files = JHLoadImagesWithXMPMetadataBatchNode.list_files("batch", "*.png")
+
+    assert files == [str(tmp_path / "batch" / "image.png")]
+
+
+def test_load_images_without_matches(
+    node: JHLoadImagesWithXMPMetadataBatchNode, tmp_path: Path
+) -> None:
+    with pytest.raises(FileNotFoundError, match="No files matching"):
+        node.load_images(str(tmp_path), "*.png")
+
+
+def test_load_images_same_size(
+    mocker: MockerFixture, node: JHLoadImagesWithXMPMetadataBatchNode, tmp_path: Path
+) -> None:
+    paths = [
+        save_png(tmp_path / "a.png", random_image((40, 24), seed=0), "First"),
+        save_png(tmp_path / "b.png", random_image((40, 24), seed=1)),
+        save_png(tmp_path / "c.png", random_image((40, 24), seed=2), "Third"),
+    ]
+
+    output = node.load_images(str(tmp_path), "*.png")
+
+    assert [image.shape for image in output.IMAGE] == [(1, 24, 40, 3)] * 3
+    assert [mask.shape for mask in output.MASK] == [(1, 24, 40)] * 3
+    for image, path in zip(output.IMAGE, paths, strict=True):
+        assert torch.equal(image, load_single(mocker, path))
+    assert not any(mask.any() for mask in output.MASK)
+    assert output.path == [str(path) for path in paths]
+    assert output.title == ["First", None, "Third"]
+    assert output.creator == [None, None, None]
+    assert output.xml_string[1] == ""
+    assert "First" in output.xml_string[0]
+
+
+def test_load_images_split(
+    node: JHLoadImagesWithXMPMetadataBatchNode, tmp_path: Path
+) -> None:
+    sizes = [(40, 24), (40, 24), (16, 16), (40, 24)]
+    for i, size in enumerate(sizes):
+        save_png(tmp_path / f"{i}.png", random_image(size, seed=i), f"Image {i}")
+
+    output = node.load_images(str(tmp_path), "*.png", size_policy=JHSizePolicy.SPLIT)
+
+    assert [image.shape for image in output.IMAGE] == [
+        (1, 24, 40, 3),
+        (1, 24, 40, 3),
+        (1, 16, 16, 3),
+        (1, 24, 40, 3),
+    ]
+    assert [mask.shape for mask in output.MASK] == [
+        (1, 24, 40),
+        (1, 24, 40),
+        (1, 16, 16),
+        (1, 24, 40),
+    ]
+    assert output.title == [f"Image {i}" for i in range(4)]
+
+
+def test_load_images_pad(
+    mocker: MockerFixture, node: JHLoadImagesWithXMPMetadataBatchNode, tmp_path: Path
+) -> None:
+    wide = save_png(tmp_path / "a.png", random_image((40, 16), seed=0))
+    tall = save_png(tmp_path / "b.png", random_image((16, 30), "RGBA", seed=1))
+
+    output = node.load_images(str(tmp_path), "*.png", size_policy=JHSizePolicy.PAD)
+
+    image, mask = torch.cat(output.IMAGE), torch.cat(output.MASK)
+    assert image.shape == (2, 30, 40, 3)
+    assert torch.equal(image[0, :16, :40], load_single(mocker, wide)[0])
+    assert torch.equal(image[1, :30, :16], load_single(mocker, tall)[0])
+    # The padding is black and masked out
+    assert not image[0, 16:].any() and not image[1, :, 16:].any()
+    assert torch.equal(mask[0, :16], torch.zeros((16, 40)))
+    assert torch.equal(mask[0, 16:], torch.ones((14, 40)))
+    assert torch.equal(mask[1, :, 16:], torch.ones((30, 24)))
+    alpha = np.asarray(PIL.Image.open(tall).getchannel("A")) / 255
+    assert torch.allclose(mask[1, :, :16], torch.from_numpy(1 - alpha).float())
+
+
+def test_load_images_pad_uint8(
+    node: JHLoadImagesWithXMPMetadataBatchNode, tmp_path: Path
+) -> None:
+    save_png(tmp_path / "a.png", random_image((40, 16)))
+    save_png(tmp_path / "b.png", random_image((16, 30)))
+
+    output = node.load_images(
+        str(tmp_path), "*.png", size_policy=JHSizePolicy.PAD, output_dtype="uint8"
+    )
+
+    assert output.IMAGE[0].dtype == torch.uint8
+    assert output.MASK[0][0, 16:].eq(255).all()
+    assert output.MASK[0][0, :16].eq(0).all()
+
+
+def test_load_images_resize(
+    node: JHLoadImagesWithXMPMetadataBatchNode, tmp_path: Path
+) -> None:
+    save_png(tmp_path / "a.png", PIL.Image.new("RGB", (40, 20), (255, 0, 0)))
+    save_png(tmp_path / "b.png", PIL.Image.new("RGB", (200, 50), (0, 0, 255)))
+    save_png(tmp_path / "c.png", PIL.Image.new("RGBA", (10, 10), (0, 255, 0, 128)))
+
+    output = node.load_images(str(tmp_path), "*.png", size_policy=JHSizePolicy.RESIZE)
+
+    image, mask = torch.cat(output.IMAGE), torch.cat(output.MASK)
+    assert image.shape == (3, 20, 40, 3)
+    assert torch.allclose(image[1], torch.tensor([0.0, 0.0, 1.0]), atol=1e-6)
+    assert torch.allclose(image[2], torch.tensor([0.0, 1.0, 0.0]), atol=1e-6)
+    assert torch.allclose(mask[2], torch.tensor(1 - 128 / 255))
+
+
+def test_load_images_resize_16_bit_png(
+    node: JHLoadImagesWithXMPMetadataBatchNode, tmp_path: Path
+) -> None:
+    PIL.Image.new("I;16", (40, 20), 65535).save(tmp_path / "a.png")
+    PIL.Image.new("I;16", (200, 100), 32768).save(tmp_path / "b.png")
+
+    output = node.load_images(str(tmp_path), "*.png", size_policy=JHSizePolicy.RESIZE)
+
+    image = torch.cat(output.IMAGE)
+    assert image.shape == (2, 20, 40, 3)
+    assert torch.allclose(image[0], torch.tensor(1.0))
+    assert torch.allclose(image[1], torch.tensor(32768 / 65535), atol=1e-4)
+
+
+def test_load_images_resize_32_bit_tiff(
+    node: JHLoadImagesWithXMPMetadataBatchNode, tmp_path: Path
+) -> None:
+    maximum = np.iinfo(np.int32).max
+    PIL.Image.new("I", (40, 20), maximum).save(tmp_path / "a.tiff")
+    PIL.Image.new("I", (200, 100), maximum - 1).save(tmp_path / "b.tiff")
+
+    output = node.load_images(str(tmp_path), "*.tiff", size_policy=JHSizePolicy.RESIZE)
+
+    image = torch.cat(output.IMAGE)
+    assert image.shape == (2, 20, 40, 3)
+    # Scaled by the 32-bit maximum the TIFF declares, not 16 bits
+    assert torch.allclose(image, torch.tensor(1.0), atol=1e-4)
+
+
+def test_load_images_resize_jpeg_uses_draft(
+    mocker: MockerFixture, node: JHLoadImagesWithXMPMetadataBatchNode, tmp_path: Path
+) -> None:
+    PIL.Image.new("RGB", (100, 50), (255, 0, 0)).save(tmp_path / "a.jpeg")
+    PIL.Image.new("RGB", (800, 400), (255, 0, 0)).save(tmp_path / "b.jpeg")
+    resize = mocker.spy(PIL.Image.Image, "resize")
+
+    output = node.load_images(str(tmp_path), "*.jpeg", size_policy=JHSizePolicy.RESIZE)
+
+    # 800x400 decodes at an eighth of its size, which is just right
+    resize.assert_not_called()
+    assert torch.cat(output.IMAGE).shape == (2, 50, 100, 3)
+
+
+def test_load_images_exif_rotation(
+    node: JHLoadImagesWithXMPMetadataBatchNode, tmp_path: Path
+) -> None:
+    exif = PIL.Image.Exif()
+    exif[0x0112] = 6  # Rotate 90° clockwise
+    PIL.Image.new("RGB", (60, 30), (255, 0, 0)).save(tmp_path / "a.jpeg", exif=exif)
+    PIL.Image.new("RGB", (30, 60), (0, 0, 255)).save(tmp_path / "b.jpeg")
+    PIL.Image.new("RGB", (120, 60), (0, 255, 0)).save(tmp_path / "c.jpeg", exif=exif)
+
+    split = node.load_images(str(tmp_path), "*.jpeg", size_policy=JHSizePolicy.SPLIT)
+    resized = node.load_images(str(tmp_path), "*.jpeg", size_policy=JHSizePolicy.RESIZE)
+
+    assert [image.shape for image in split.IMAGE] == [
+        (1, 60, 30, 3),
+        (1, 60, 30, 3),
+        (1, 120, 60, 3),
+    ]
+    assert torch.cat(resized.IMAGE).shape == (3, 60, 30, 3)
+    assert resized.IMAGE[2][0, 30, 15, 1] > 0.9
+
+
+def test_load_images_workers_match_serial(
+    node: JHLoadImagesWithXMPMetadataBatchNode, tmp_path: Path
+) -> None:
+    for i in range(20):
+        size = (32, 32) if i % 4 else (24, 40)
+        save_png(tmp_path / f"{i:02}.png", random_image(size, "RGBA", seed=i))
+
+    for size_policy in JHSizePolicy:
+        serial = node.load_images(
+            str(tmp_path), "*.png", size_policy=size_policy, decode_workers=1
+        )
+        parallel = node.load_images(
+            str(tmp_path), "*.png", size_policy=size_policy, decode_workers=4
+        )
+        assert len(serial.IMAGE) == len(parallel.IMAGE)
+        for a, b in zip(serial.IMAGE, parallel.IMAGE, strict=True):
+            assert torch.equal(a, b)
+        for a, b in zip(serial.MASK, parallel.MASK, strict=True):
+            assert torch.equal(a, b)
+
+
+def test_load_images_corrupted_file(
+    node: JHLoadImagesWithXMPMetadataBatchNode, tmp_path: Path
+) -> None:
+    save_png(tmp_path / "a.png", random_image((16, 16)))
+    (tmp_path / "b.png").write_bytes(b"This is not a valid image file.")
+
+    with pytest.raises(PIL.UnidentifiedImageError):
+        node.load_images(str(tmp_path), "*.png")
+
+
+def test_load_images_multiframe_loads_first_frame(
+    node: JHLoadImagesWithXMPMetadataBatchNode, tmp_path: Path
+) -> None:
+    frames = [
+        PIL.Image.new("RGB", (16, 16), (255, 0, 0)),
+        PIL.Image.new("RGB", (16, 16), (0, 255, 0)),
+    ]
+    frames[0].save(tmp_path / "a.tiff", save_all=True, append_images=frames[1:])
+
+    output = node.load_images(str(tmp_path), "*.tiff")
+
+    assert output.IMAGE[0].shape == (1, 16, 16, 3)
+    assert torch.allclose(output.IMAGE[0], torch.tensor([1.0, 0.0, 0.0]))
+
+
+def test_is_changed(tmp_path: Path) -> None:
+    save_png(tmp_path / "a.png", random_image((16, 16)))
+    node_class = JHLoadImagesWithXMPMetadataBatchNode
+
+    first = node_class.IS_CHANGED(str(tmp_path), "*.png", size_policy="pad")
+    assert node_class.IS_CHANGED(str(tmp_path), "*.png") == first
+
+    save_png(tmp_path / "b.png", random_image((16, 16)))
+    second = node_class.IS_CHANGED(str(tmp_path), "*.png")
+    assert second != first
+
+    os.utime(tmp_path / "b.png", ns=(10**9, 10**9))
+    assert node_class.IS_CHANGED(str(tmp_path), "*.png") != second
+    # Only the selected files count
+    assert node_class.IS_CHANGED(str(tmp_path), "*.png", limit=1) == first
+
+
+# endregion Tests
@@ -1,3 +1,8 @@
+import json
+import threading
+import time
+import timeit
+import tracemalloc
 from pathlib import Path
 
 import numpy as np
@@ -6,10 +11,12 @@ import torch
 from PIL import Image
 from pytest_mock import MockerFixture
 
+from comfyui_jh_xmp_metadata_nodes import jh_save_image_with_xmp_metadata_node
 from comfyui_jh_xmp_metadata_nodes.jh_save_image_with_xmp_metadata_node import (
     JHSaveImageWithXMPMetadataNode,
     JHSupportedImageTypes,
 )
+from comfyui_jh_xmp_metadata_nodes.jh_xmp_metadata import JHXMPMetadata
 
 # region Fixtures
 
@@ -178,6 +185,513 @@ def test_inputs_to_xml_with_list_metadata_fields(
     assert "Ext Description 2" in result
 
 
+def test_inputs_to_xml_batch_with_xml_string(
+    node: JHSaveImageWithXMPMetadataNode,
+) -> None:
+    xml_string = "<xmpmeta>Test XML</xmpmeta>"
+    result = node.inputs_to_xml_batch(
+        creator="Ignored",
+        rights=None,
+        title=None,
+        description=None,
+        subject=None,
+        instructions=None,
+        comment=None,
+        alt_text=None,
+        ext_description=None,
+        xml_string=xml_string,
+        batch_size=3,
+    )
+    assert result == [xml_string] * 3
+
+
+def test_inputs_to_xml_batch_matches_inputs_to_xml(
+    node: JHSaveImageWithXMPMetadataNode,
+) -> None:
+    inputs = {
+        "creator": "Test Creator",
+        "rights": None,
+        "title": ["Title 1", "Title 2", "Title 3"],
+        "description": "Test Description",
+        "subject": ["a, b", "c", "a, b"],
+        "instructions": None,
+        "comment": ["Same", "Same", "Same"],
+        "alt_text": "Test Alt Text",
+        "ext_description": None,
+        "xml_string": None,
+    }
+    result = node.inputs_to_xml_batch(**inputs, batch_size=3)
+    assert result == [
+        node.inputs_to_xml(**inputs, batch_number=batch_number)
+        for batch_number in range(3)
+    ]
+
+
+def test_inputs_to_xml_batch_broadcast_renders_once(
+    mocker: MockerFixture, node: JHSaveImageWithXMPMetadataNode
+) -> None:
+    build_packets = mocker.spy(
+        jh_save_image_with_xmp_metadata_node.JHXMPMetadata, "build_packets"
+    )
+    result = node.inputs_to_xml_batch(
+        creator="Test Creator",
+        rights="Test Rights",
+        title="Test Title",
+        description=None,
+        subject="a, b",
+        instructions=None,
+        comment=None,
+        alt_text=None,
+        ext_description=None,
+        xml_string=None,
+        batch_size=64,
+    )
+
+    assert len(result) == 64
+    assert all(packet is result[0] for packet in result)
+    build_packets.assert_called_once()
+    assert build_packets.call_args.args[1] == 1
+    assert node.xmp_cache_misses == 1
+    assert node.xmp_cache_hits == 63
+
+
+def test_inputs_to_xml_batch_memoizes_identical_rows(
+    node: JHSaveImageWithXMPMetadataNode,
+) -> None:
+    result = node.inputs_to_xml_batch(
+        creator="Test Creator",
+        rights=None,
+        title=["A", "B", "A", "C", "B", "A"],
+        description=None,
+        subject=["x", "y", "x", "x", "y", "x"],
+        instructions=None,
+        comment=None,
+        alt_text=None,
+        ext_description=None,
+        xml_string=None,
+        batch_size=6,
+    )
+
+    # Rows are (A, x), (B, y), (A, x), (C, x), (B, y), (A, x)
+    assert node.xmp_cache_misses == 3
+    assert node.xmp_cache_hits == 3
+    assert result[0] is result[2] is result[5]
+    assert result[1] is result[4]
+    assert result[3] is not result[0]
+    assert '<rdf:li xml:lang="x-default">C</rdf:li>' in result[3]
+
+    node.inputs_to_xml_batch(
+        creator=None,
+        rights=None,
+        title=None,
+        description=None,
+        subject=None,
+        instructions=None,
+        comment=None,
+        alt_text=None,
+        ext_description=None,
+        xml_string=None,
+        batch_size=4,
+    )
+    assert node.xmp_cache_misses == 4
+    assert node.xmp_cache_hits == 6
+
+
+def test_inputs_to_xml_batch_rejects_short_lists(
+    node: JHSaveImageWithXMPMetadataNode,
+) -> None:
+    with pytest.raises(ValueError, match="Input 'title' has 1 values"):
+        node.inputs_to_xml_batch(
+            creator=None,
+            rights=None,
+            title=["Only one"],
+            description=None,
+            subject=None,
+            instructions=None,
+            comment=None,
+            alt_text=None,
+            ext_description=None,
+            xml_string=None,
+            batch_size=2,
+        )
+
+
+def test_encode_xmp_packets_encodes_shared_packets_once(
+    node: JHSaveImageWithXMPMetadataNode,
+) -> None:
+    shared = "<x:xmpmeta>\u00e9</x:xmpmeta>"
+    other = "<x:xmpmeta>other</x:xmpmeta>"
+    encoded = node.encode_xmp_packets([shared, other, shared, shared])
+    assert encoded[0] == shared.encode("utf-8")
+    assert encoded[1] == other.encode("utf-8")
+    assert encoded[0] is encoded[2] is encoded[3]
+
+
+@pytest.mark.parametrize(
+    "image_type",
+    [JHSupportedImageTypes.JPEG, JHSupportedImageTypes.PNG],
+)
+def test_save_image_accepts_encoded_xmp(
+    node: JHSaveImageWithXMPMetadataNode,
+    image: torch.Tensor,
+    tmp_path: Path,
+    image_type: JHSupportedImageTypes,
+) -> None:
+    img = Image.fromarray((image.numpy() * 255).astype(np.uint8))
+    to_path = tmp_path / f"test_image.{node.extension_for_type(image_type)}"
+    xmp = JHXMPMetadata.build_packets({"title": "Caf\u00e9 \u65e5"}, 1)[0]
+
+    node.save_image(img, image_type, to_path, xmp.encode("utf-8"))
+
+    with Image.open(to_path) as saved:
+        saved_xmp = saved.info["xmp"]
+    if isinstance(saved_xmp, bytes):
+        saved_xmp = saved_xmp.decode("utf-8")
+    assert saved_xmp == xmp
+
+
+def test_save_images_encodes_workflow_once_per_batch(
+    mocker: MockerFixture,
+    tmp_path: Path,
+    node: JHSaveImageWithXMPMetadataNode,
+    image: torch.Tensor,
+) -> None:
+    mocker.patch(
+        "comfyui_jh_xmp_metadata_nodes.jh_save_image_with_xmp_metadata_node.folder_paths.get_save_image_path",
+        return_value=(
+            tmp_path,
+            "ComfyUI",
+            1,
+            "",
+            "ComfyUI",
+        ),
+    )
+    dumps = mocker.spy(jh_save_image_with_xmp_metadata_node.json, "dumps")
+    prompt = {"1": {"inputs": {"text": "caf\u00e9"}, "class_type": "Node"}}
+    workflow = {"nodes": [{"id": i} for i in range(100)]}
+
+    result = node.save_images(
+        [image] * 4,
+        image_type=JHSupportedImageTypes.PNG_WITH_WORKFLOW,
+        prompt=prompt,
+        extra_pnginfo={"workflow": workflow},
+    )
+
+    assert dumps.call_count == 2
+    for item in result["ui"]["images"]:
+        with Image.open(tmp_path / item["filename"]) as saved:
+            assert saved.text["prompt"] == json.dumps(prompt)
+            assert saved.text["workflow"] == json.dumps(workflow)
+
+
+def test_save_image_pnginfo_texts_match_legacy_encoding(
+    node: JHSaveImageWithXMPMetadataNode,
+    image: torch.Tensor,
+    tmp_path: Path,
+) -> None:
+    img = Image.fromarray((image.numpy() * 255).astype(np.uint8))
+    xmp = JHXMPMetadata.build_packets({"title": "Test Title"}, 1)[0]
+    prompt = {"1": {"inputs": {"text": "\u65e5\u672c \U0001f305"}}}
+    extra_pnginfo = {"workflow": {"nodes": [], "extra": {"note": "\u00e9"}}}
+
+    per_image_path = tmp_path / "per_image.png"
+    node.save_image(
+        img,
+        JHSupportedImageTypes.PNG_WITH_WORKFLOW,
+        per_image_path,
+        xmp,
+        prompt,
+        extra_pnginfo,
+    )
+
+    shared_path = tmp_path / "shared.png"
+    node.save_image(
+        img,
+        JHSupportedImageTypes.PNG_WITH_WORKFLOW,
+        shared_path,
+        xmp,
+        pnginfo_texts=node.encode_pnginfo_texts(prompt, extra_pnginfo),
+    )
+
+    assert per_image_path.read_bytes() == shared_path.read_bytes()
+
+
+def test_encode_pnginfo_texts_accepts_pre_encoded_bytes(
+    node: JHSaveImageWithXMPMetadataNode,
+) -> None:
+    prompt = b'{"1": {}}'
+    workflow = b'{"nodes": []}'
+    texts = node.encode_pnginfo_texts(prompt, {"workflow": workflow})
+    assert texts["prompt"] is prompt
+    assert texts["workflow"] is workflow
+
+    assert node.encode_pnginfo_texts(None, None) == {}
+    assert node.encode_pnginfo_texts("Test Prompt", None) == {
+        "prompt": b'"Test Prompt"'
+    }
+
+
+@pytest.mark.parametrize("image_type", list(JHSupportedImageTypes))
+def test_save_images_parallel_matches_serial(
+    mocker: MockerFixture,
+    tmp_path: Path,
+    node: JHSaveImageWithXMPMetadataNode,
+    image_type: JHSupportedImageTypes,
+) -> None:
+    images = torch.rand(6, 32, 48, 3)
+    titles = [f"Title {i}" for i in range(6)]
+    outputs = {}
+
+    for save_workers in (1, 4):
+        output_dir = tmp_path / str(save_workers)
+        output_dir.mkdir()
+        mocker.patch(
+            "comfyui_jh_xmp_metadata_nodes.jh_save_image_with_xmp_metadata_node.folder_paths.get_save_image_path",
+            return_value=(output_dir, "ComfyUI", 1, "", "ComfyUI"),
+        )
+        result = node.save_images(
+            images,
+            image_type=image_type,
+            title=titles,
+            save_workers=save_workers,
+            prompt={"1": {}},
+            extra_pnginfo={"workflow": {"nodes": []}},
+        )
+        outputs[save_workers] = result["ui"]["images"]
+
+    assert outputs[1] == outputs[4]
+    assert [item["filename"] for item in outputs[4]] == [
+        f"ComfyUI_{i:05}_.{node.extension_for_type(image_type)}" for i in range(1, 7)
+    ]
+    for item in outputs[4]:
+        assert (tmp_path / "1" / item["filename"]).read_bytes() == (
+            tmp_path / "4" / item["filename"]
+        ).read_bytes()
+
+
+def test_save_images_parallel_runs_concurrently(
+    mocker: MockerFixture,
+    tmp_path: Path,
+    node: JHSaveImageWithXMPMetadataNode,
+) -> None:
+    mocker.patch(
+        "comfyui_jh_xmp_metadata_nodes.jh_save_image_with_xmp_metadata_node.folder_paths.get_save_image_path",
+        return_value=(tmp_path, "ComfyUI", 1, "", "ComfyUI"),
+    )
+    lock = threading.Lock()
+    in_flight = 0
+    max_in_flight = 0
+    saved_paths: list[Path] = []
+
+    def slow_save_image(
+        image: Image.Image,
+        image_type: str,
+        to_path: Path,
+        *args: object,
+        **kwargs: object,
+    ) -> None:
+        nonlocal in_flight, max_in_flight
+        with lock:
+            in_flight += 1
+            max_in_flight = max(max_in_flight, in_flight)
+        time.sleep(0.05)
+        with lock:
+            in_flight -= 1
+            saved_paths.append(to_path)
+
+    mocker.patch.object(node, "save_image", side_effect=slow_save_image)
+
+    result = node.save_images(torch.rand(8, 16, 16, 3), save_workers=4)
+
+    assert max_in_flight == 4
+    assert sorted(saved_paths) == [
+        tmp_path / item["filename"] for item in result["ui"]["images"]
+    ]
+    assert [item["filename"] for item in result["ui"]["images"]] == [
+        f"ComfyUI_{i:05}_.png" for i in range(1, 9)
+    ]
+
+
+def test_save_images_parallel_propagates_errors(
+    mocker: MockerFixture,
+    tmp_path: Path,
+    node: JHSaveImageWithXMPMetadataNode,
+) -> None:
+    mocker.patch(
+        "comfyui_jh_xmp_metadata_nodes.jh_save_image_with_xmp_metadata_node.folder_paths.get_save_image_path",
+        return_value=(tmp_path / "does-not-exist", "ComfyUI", 1, "", "ComfyUI"),
+    )
+    with pytest.raises(FileNotFoundError):
+        node.save_images(torch.rand(4, 16, 16, 3), save_workers=2)
+
+
+@pytest.fixture
+def slow_filesystem(
+    mocker: MockerFixture, tmp_path: Path, node: JHSaveImageWithXMPMetadataNode
+) -> threading.Event:
+    """
+    Makes every write wait for the returned event before it really writes
+    the file, so a test can check what happens while writes are in flight.
+    """
+    mocker.patch(
+        "comfyui_jh_xmp_metadata_nodes.jh_save_image_with_xmp_metadata_node.folder_paths.get_save_image_path",
+        side_effect=lambda *args: (
+            tmp_path,
+            "ComfyUI",
+            len(list(tmp_path.iterdir())) + 1,
+            "",
+            "ComfyUI",
+        ),
+    )
+    gate = threading.Event()
+    save_image = node.save_image
+
+    def slow_save_image(*args: object, **kwargs: object) -> None:
+        gate.wait(5)
+        save_image(*args, **kwargs)
+
+    mocker.patch.object(node, "save_image", side_effect=slow_save_image)
+    return gate
+
+
+def test_save_images_background_write_returns_before_writing(
+    tmp_path: Path,
+    node: JHSaveImageWithXMPMetadataNode,
+    slow_filesystem: threading.Event,
+) -> None:
+    images = torch.rand(3, 16, 16, 3)
+    result = node.save_images(images, background_write=True, title="Title")
+
+    # The node has returned, but none of the files have been written yet
+    assert result["result"] == (images,)
+    assert list(tmp_path.iterdir()) == []
+    assert node.background_writer is not None
+    assert node.background_writer.pending_images == 3
+
+    # So there's nothing the frontend could show a preview of yet
+    assert result["ui"]["images"] == []
+
+    slow_filesystem.set()
+    node.background_writer.flush(timeout=5)
+    assert len(list(tmp_path.iterdir())) == 3
+    for path in tmp_path.iterdir():
+        with Image.open(path) as img:
+            assert JHXMPMetadata.from_string(img.info["xmp"]).title == "Title"
+
+
+def test_save_images_background_write_does_not_reuse_counters(
+    tmp_path: Path,
+    node: JHSaveImageWithXMPMetadataNode,
+    slow_filesystem: threading.Event,
+) -> None:
+    node.save_images(torch.rand(2, 16, 16, 3), background_write=True)
+    node.save_images(torch.rand(2, 16, 16, 3), background_write=True)
+    slow_filesystem.set()
+    node.background_writer.flush(timeout=5)
+
+    assert sorted(path.name for path in tmp_path.iterdir()) == [
+        f"ComfyUI_{i:05}_.png" for i in range(1, 5)
+    ]
+
+
+def test_save_images_background_write_backpressure(
+    node: JHSaveImageWithXMPMetadataNode,
+    slow_filesystem: threading.Event,
+) -> None:
+    node.max_pending_images = 2
+    returned = threading.Event()
+    thread = threading.Thread(
+        target=lambda: (
+            node.save_images(torch.rand(4, 16, 16, 3), background_write=True),
+            returned.set(),
+        )
+    )
+    thread.start()
+
+    # Blocked on the third image until the writer makes room
+    assert not returned.wait(0.1)
+    assert node.background_writer.pending_images == 2
+
+    slow_filesystem.set()
+    assert returned.wait(5)
+    thread.join()
+    node.background_writer.flush(timeout=5)
+
+
+def test_save_images_background_write_reports_errors_on_next_call(
+    mocker: MockerFixture,
+    tmp_path: Path,
+    node: JHSaveImageWithXMPMetadataNode,
+) -> None:
+    mocker.patch(
+        "comfyui_jh_xmp_metadata_nodes.jh_save_image_with_xmp_metadata_node.folder_paths.get_save_image_path",
+        return_value=(tmp_path / "does-not-exist", "ComfyUI", 1, "", "ComfyUI"),
+    )
+    node.save_images(torch.rand(1, 16, 16, 3), background_write=True)
+    while node.background_writer.pending_images:
+        time.sleep(0.01)
+
+    with pytest.raises(RuntimeError, match="background image write") as exc_info:
+        node.save_images(torch.rand(1, 16, 16, 3))
+    assert isinstance(exc_info.value.__cause__, FileNotFoundError)
+
+
+def test_get_background_writer(node: JHSaveImageWithXMPMetadataNode) -> None:
+    writer = node.get_background_writer(2)
+    assert node.get_background_writer(2) is writer
+
+    replacement = node.get_background_writer(3)
+    assert replacement is not writer
+    assert replacement.max_workers == 3
+    with pytest.raises(RuntimeError, match="closed"):
+        writer.submit(lambda: None)
+    replacement.close()
+
+
+def test_save_images_with_list_metadata(
+    mocker: MockerFixture,
+    tmp_path: Path,
+    node: JHSaveImageWithXMPMetadataNode,
+    image: torch.Tensor,
+) -> None:
+    mocker.patch(
+        "comfyui_jh_xmp_metadata_nodes.jh_save_image_with_xmp_metadata_node.folder_paths.get_save_image_path",
+        return_value=(
+            tmp_path,
+            "ComfyUI",
+            1,
+            "",
+            "ComfyUI",
+        ),
+    )
+
+    result = node.save_images(
+        [image, image, image],
+        image_type=JHSupportedImageTypes.WEBP,
+        creator="Test Creator",
+        title=["Title 1", "Title 2", "Title 3"],
+    )
+
+    assert node.xmp_cache_misses == 3
+    assert node.xmp_cache_hits == 0
+
+    filenames = [item["filename"] for item in result["ui"]["images"]]
+    assert filenames == [
+        "ComfyUI_00001_.webp",
+        "ComfyUI_00002_.webp",
+        "ComfyUI_00003_.webp",
+    ]
+    for i, filename in enumerate(filenames):
+        with Image.open(tmp_path / filename) as saved:
+            xmp = saved.info["xmp"].decode("utf-8")
+        assert "Test Creator" in xmp
+        assert f"Title {i + 1}" in xmp
+
+
+def test_input_types_is_memoized(node: JHSaveImageWithXMPMetadataNode) -> None:
+    assert node.INPUT_TYPES() is JHSaveImageWithXMPMetadataNode.INPUT_TYPES()
+
+
 def test_input_types(node: JHSaveImageWithXMPMetadataNode) -> None:
     input_types = node.INPUT_TYPES()
 
@@ -209,10 +723,148 @@ def test_input_types(node: JHSaveImageWithXMPMetadataNode) -> None:
     assert "comment" in optional_inputs
     assert "alt_text" in optional_inputs
     assert "xml_string" in optional_inputs
+    assert "save_workers" in optional_inputs
+    assert "background_write" in optional_inputs
 
     # Check hidden inputs
     assert "prompt" in hidden_inputs
     assert "extra_pnginfo" in hidden_inputs
 
 
+def legacy_to_uint8(image: torch.Tensor) -> np.ndarray:
+    return np.clip(255.0 * image.cpu().numpy(), 0, 255).astype(np.uint8)
+
+
+@pytest.mark.parametrize("chunk_size", [1, 1000, 1 << 20])
+@pytest.mark.parametrize("channels", [1, 3, 4])
+def test_images_to_uint8_matches_legacy_conversion(
+    node: JHSaveImageWithXMPMetadataNode, chunk_size: int, channels: int
+) -> None:
+    node.UINT8_CONVERSION_CHUNK_SIZE = chunk_size
+    images = torch.randn(3, 17, 23, channels) * 0.6 + 0.5  # Some out of [0, 1]
+    images[0, 0, 0] = 1.0
+    images[0, 0, 1] = 0.0
+
+    arrays = node.images_to_uint8(images)
+
+    assert len(arrays) == 3
+    for array, image in zip(arrays, images, strict=True):
+        assert array.dtype == np.uint8
+        np.testing.assert_array_equal(array, legacy_to_uint8(image))
+    # All the images share one buffer
+    assert arrays[0].base is arrays[2].base
+
+
+def test_images_to_uint8_list_of_tensors(node: JHSaveImageWithXMPMetadataNode) -> None:
+    images = [torch.rand(8, 8, 3), torch.rand(8, 8, 3)]
+    arrays = node.images_to_uint8(images)
+    for array, image in zip(arrays, images, strict=True):
+        np.testing.assert_array_equal(array, legacy_to_uint8(image))
+
+
+def test_images_to_uint8_ragged_list(node: JHSaveImageWithXMPMetadataNode) -> None:
+    images = [torch.rand(8, 8, 3), torch.rand(5, 9, 4)]
+    arrays = node.images_to_uint8(images)
+    assert [array.shape for array in arrays] == [(8, 8, 3), (5, 9, 4)]
+    for array, image in zip(arrays, images, strict=True):
+        np.testing.assert_array_equal(array, legacy_to_uint8(image))
+
+
+def test_images_to_uint8_non_contiguous(node: JHSaveImageWithXMPMetadataNode) -> None:
+    images = torch.rand(2, 3, 10, 12).permute(0, 2, 3, 1)
+    assert not images.is_contiguous()
+    for array, image in zip(node.images_to_uint8(images), images, strict=True):
+        np.testing.assert_array_equal(array, legacy_to_uint8(image))
+
+
+def img_shape(img: Image.Image) -> tuple[int, ...]:
+    channels = len(img.getbands())
+    return (
+        (img.height, img.width) if channels == 1 else (img.height, img.width, channels)
+    )
+
+
+@pytest.mark.parametrize(
+    "shape,mode",
+    [
+        ((6, 7), "L"),
+        ((6, 7, 1), "L"),
+        ((6, 7, 2), "LA"),
+        ((6, 7, 3), "RGB"),
+        ((6, 7, 4), "RGBA"),
+    ],
+)
+def test_uint8_to_pil_image(
+    node: JHSaveImageWithXMPMetadataNode, shape: tuple[int, ...], mode: str
+) -> None:
+    array = np.random.randint(0, 256, shape, dtype=np.uint8)
+    img = node.uint8_to_pil_image(array)
+    assert img.mode == mode
+    assert img.size == (7, 6)
+    np.testing.assert_array_equal(np.asarray(img), array.reshape(img_shape(img)))
+
+
+def test_uint8_to_pil_image_shares_memory(
+    node: JHSaveImageWithXMPMetadataNode,
+) -> None:
+    array = np.zeros((4, 4, 4), dtype=np.uint8)
+    img = node.uint8_to_pil_image(array)
+    array[1, 2] = (10, 20, 30, 40)
+    assert img.getpixel((2, 1)) == (10, 20, 30, 40)
+
+
+@pytest.mark.parametrize("channels", [1, 3, 4])
+def test_save_images_channels(
+    mocker: MockerFixture,
+    tmp_path: Path,
+    node: JHSaveImageWithXMPMetadataNode,
+    channels: int,
+) -> None:
+    mocker.patch(
+        "comfyui_jh_xmp_metadata_nodes.jh_save_image_with_xmp_metadata_node.folder_paths.get_save_image_path",
+        return_value=(tmp_path, "ComfyUI", 1, "", "ComfyUI"),
+    )
+    images = torch.rand(2, 16, 16, channels)
+    result = node.save_images(images, image_type=JHSupportedImageTypes.PNG)
+    for item, image in zip(result["ui"]["images"], images, strict=True):
+        with Image.open(tmp_path / item["filename"]) as img:
+            np.testing.assert_array_equal(
+                np.asarray(img).reshape(image.shape), legacy_to_uint8(image)
+            )
+
+
+def test_images_to_uint8_peak_memory(node: JHSaveImageWithXMPMetadataNode) -> None:
+    images = torch.rand(2, 2160, 3840, 3)  # A batch of two 4K images
+
+    tracemalloc.start()
+    try:
+        [legacy_to_uint8(image) for image in images]
+        legacy_peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.reset_peak()
+        node.images_to_uint8(images)
+        # The float scratch buffer is a torch tensor, which tracemalloc
+        # doesn't see, so count it by hand.
+        vectorized_peak = (
+            tracemalloc.get_traced_memory()[1] + node.UINT8_CONVERSION_CHUNK_SIZE * 4
+        )
+    finally:
+        tracemalloc.stop()
+    assert vectorized_peak < legacy_peak / 2
+
+
+@pytest.mark.benchmark
+def test_benchmark_images_to_uint8_beats_legacy(
+    node: JHSaveImageWithXMPMetadataNode,
+) -> None:
+    images = torch.rand(2, 2160, 3840, 3)  # A batch of two 4K images
+
+    def legacy() -> list[np.ndarray]:
+        return [legacy_to_uint8(image) for image in images]
+
+    vectorized = min(
+        timeit.repeat(lambda: node.images_to_uint8(images), number=1, repeat=3)
+    )
+    assert vectorized < min(timeit.repeat(legacy, number=1, repeat=3))
+
+
 # endregion Tests
@@ -1,10 +1,19 @@
+import os
+import random
+import subprocess
+import sys
 import textwrap
+import timeit
 from dataclasses import dataclass
 
 import pytest
 from lxml import etree
+from pytest_mock import MockerFixture
 
-from comfyui_jh_xmp_metadata_nodes.jh_xmp_metadata import JHXMPMetadata
+from comfyui_jh_xmp_metadata_nodes.jh_xmp_metadata import (
+    JHXMPMetadata,
+    JHXMPSerializer,
+)
 
 # region Type Definitions
 
@@ -150,6 +159,50 @@ def invalid_xml_string() -> str:
     return "This is not valid XML."
 
 
+@pytest.fixture
+def out_of_order_xml_string() -> str:
+    return textwrap.dedent("""
+        <x:xmpmeta
+            xmlns:x="adobe:ns:meta/"
+            xmlns:rdf="http://www.w3.org/1999/02/22-rdf-syntax-ns#"
+            xmlns:dc="http://purl.org/dc/elements/1.1/"
+            xmlns:photoshop="http://ns.adobe.com/photoshop/1.0/"
+            xmlns:Iptc4xmpCore="http://iptc.org/std/Iptc4xmpCore/1.0/xmlns/">
+            <rdf:RDF>
+                <rdf:Description rdf:about="">
+                    <dc:title>
+                        <rdf:Bag>
+                            <rdf:li>Not an Alt</rdf:li>
+                        </rdf:Bag>
+                    </dc:title>
+                    <dc:subject>
+                        <rdf:Bag>
+                            <rdf:li>first</rdf:li>
+                        </rdf:Bag>
+                    </dc:subject>
+                    <photoshop:Instructions>First Instructions</photoshop:Instructions>
+                </rdf:Description>
+                <rdf:Description rdf:about="">
+                    <dc:title>
+                        <rdf:Alt>
+                            <rdf:li xml:lang="x-default">Second Title</rdf:li>
+                            <rdf:li xml:lang="de">Zweiter Titel</rdf:li>
+                        </rdf:Alt>
+                    </dc:title>
+                    <dc:subject>
+                        <rdf:Bag>
+                            <rdf:li>second</rdf:li>
+                            <rdf:li>third</rdf:li>
+                        </rdf:Bag>
+                    </dc:subject>
+                    <photoshop:Instructions>Second Instructions</photoshop:Instructions>
+                    <Iptc4xmpCore:AltTextAccessibility>Alt</Iptc4xmpCore:AltTextAccessibility>
+                </rdf:Description>
+            </rdf:RDF>
+        </x:xmpmeta>
+        """).strip()
+
+
 @pytest.fixture
 def empty_metadata_object() -> JHXMPMetadata:
     return JHXMPMetadata()
@@ -172,6 +225,66 @@ def sample_metadata_object(sample_metadata: MetadataDataclass) -> JHXMPMetadata:
 
 # endregion Fixtures
 
+# region Helpers
+
+
+def xpath_fields(root: etree._Element) -> dict[str, str | None]:
+    """
+    The original nine-query XPath lookup, kept here as the reference the
+    single-pass parser is checked (and benchmarked) against.
+    """
+    ns = JHXMPMetadata.NAMESPACES
+    values: dict[str, str | None] = {}
+
+    for name, path, is_list in (
+        ("creator", "//dc:creator/rdf:Seq/rdf:li", True),
+        ("rights", "//dc:rights/rdf:Alt/rdf:li", False),
+        ("title", "//dc:title/rdf:Alt/rdf:li", False),
+        ("description", "//dc:description/rdf:Alt/rdf:li", False),
+        ("subject", "//dc:subject/rdf:Bag/rdf:li", True),
+        ("instructions", "//photoshop:Instructions", False),
+        ("comment", "//exif:UserComment/rdf:Alt/rdf:li", False),
+        ("alt_text", "//Iptc4xmpCore:AltTextAccessibility", False),
+        ("ext_description", "//Iptc4xmpCore:ExtDescrAccessibility", False),
+    ):
+        elements = root.xpath(path, namespaces=ns)
+        if len(elements) > 0:
+            if is_list:
+                values[name] = ", ".join(element.text for element in elements)
+            else:
+                values[name] = elements[0].text
+
+    return values
+
+
+def make_padded_xml_string(xml_string: str, target_size: int) -> str:
+    """
+    Pads a packet out to roughly `target_size` bytes with the sort of
+    vendor block Lightroom leaves behind: a long develop history of
+    rdf:li entries plus a big blob of text.
+    """
+    history_entry = (
+        '<rdf:li rdf:parseType="Resource">'
+        "<stEvt:action>saved</stEvt:action>"
+        "<stEvt:softwareAgent>Adobe Photoshop Lightroom Classic</stEvt:softwareAgent>"
+        "<stEvt:changed>/metadata</stEvt:changed>"
+        "</rdf:li>"
+    )
+    entries = max(1, (target_size - len(xml_string)) // (2 * len(history_entry)))
+    vendor_block = (
+        '<rdf:Description rdf:about=""'
+        ' xmlns:xmpMM="http://ns.adobe.com/xap/1.0/mm/"'
+        ' xmlns:stEvt="http://ns.adobe.com/xap/1.0/sType/ResourceEvent#"'
+        ' xmlns:comfy="urn:example:comfy/">'
+        f"<xmpMM:History><rdf:Seq>{history_entry * entries}</rdf:Seq></xmpMM:History>"
+        f"<comfy:workflow>{'x' * (entries * len(history_entry))}</comfy:workflow>"
+        "</rdf:Description>"
+    )
+    return xml_string.replace("</rdf:RDF>", f"{vendor_block}</rdf:RDF>")
+
+
+# endregion Helpers
+
 
 def test_initialization(empty_metadata_object: JHXMPMetadata) -> None:
     assert empty_metadata_object.creator is None
@@ -226,6 +339,35 @@ def test_from_string_with_invalid_xml(invalid_xml_string: str) -> None:
     assert metadata.ext_description is None
 
 
+def test_from_string_matches_xpath(
+    valid_xml_string: str,
+    incomplete_xml_string: str,
+    out_of_order_xml_string: str,
+) -> None:
+    for xml_string in (
+        valid_xml_string,
+        incomplete_xml_string,
+        out_of_order_xml_string,
+        make_padded_xml_string(valid_xml_string, 100_000),
+    ):
+        root = etree.fromstring(xml_string, parser=etree.XMLParser())
+        expected = xpath_fields(root)
+        assert JHXMPMetadata._fields_from_tree(root) == expected
+
+        metadata = JHXMPMetadata.from_string(xml_string)
+        for name, value in expected.items():
+            assert getattr(metadata, name) == value
+
+
+def test_from_string_with_out_of_order_xml(out_of_order_xml_string: str) -> None:
+    metadata = JHXMPMetadata.from_string(out_of_order_xml_string)
+    assert metadata.creator is None
+    assert metadata.title == "Second Title"
+    assert metadata.subject == "first, second, third"
+    assert metadata.instructions == "First Instructions"
+    assert metadata.alt_text == "Alt"
+
+
 def test_property_creator(
     empty_metadata_object: JHXMPMetadata, sample_metadata: MetadataDataclass
 ) -> None:
@@ -484,3 +626,401 @@ def test_to_wrapped_string_with_empty_metadata(
     rdf_description[0].remove(digital_source_type_element[0])
     children = rdf_description[0].getchildren()
     assert len(children) == 0
+
+
+def test_from_string_does_not_build_tree(
+    mocker: MockerFixture, valid_xml_string: str
+) -> None:
+    build_tree = mocker.spy(JHXMPMetadata, "_build_tree")
+    metadata = JHXMPMetadata.from_string(valid_xml_string)
+    assert metadata.title is not None
+    build_tree.assert_not_called()
+
+
+def test_to_string_builds_tree_once(
+    mocker: MockerFixture, sample_metadata: MetadataDataclass
+) -> None:
+    build_tree = mocker.spy(JHXMPMetadata, "_build_tree")
+    metadata = JHXMPMetadata()
+    metadata.creator = sample_metadata.creator
+    metadata.title = sample_metadata.title
+    metadata.subject = sample_metadata.subject
+    build_tree.assert_not_called()
+
+    first = metadata.to_string()
+    assert metadata.to_wrapped_string().endswith(f'{first}<?xpacket end="w"?>')
+    assert build_tree.call_count == 1
+
+
+def test_to_string_cache_invalidated_on_change(
+    mocker: MockerFixture, sample_metadata_object: JHXMPMetadata
+) -> None:
+    build_tree = mocker.spy(JHXMPMetadata, "_build_tree")
+    before = sample_metadata_object.to_string()
+
+    # Setting a property to the value it already has keeps the cache
+    sample_metadata_object.title = sample_metadata_object.title
+    assert sample_metadata_object.to_string() == before
+    assert build_tree.call_count == 1
+
+    sample_metadata_object.title = "A Different Title"
+    after = sample_metadata_object.to_string()
+    assert build_tree.call_count == 2
+    assert "A Different Title" in after
+    assert "My Title" not in after
+
+    sample_metadata_object.title = None
+    assert "dc:title" not in sample_metadata_object.to_string()
+    assert build_tree.call_count == 3
+
+
+# region Template Serializer
+
+PROPERTY_NAMES = [
+    "creator",
+    "rights",
+    "title",
+    "description",
+    "subject",
+    "instructions",
+    "comment",
+    "alt_text",
+    "ext_description",
+]
+
+TRICKY_VALUES = [
+    "plain",
+    "  leading and trailing whitespace  ",
+    "Fish & Chips <with> \"quotes\" and 'apostrophes'",
+    "]]> &amp; already escaped &#169;",
+    "line one\nline two\r\nline three\ttabbed",
+    "© 2024 Jöhn Dœ",
+    "日本語のタイトル",
+    "emoji 🌅 and astral 𝄞",
+    "a,b;c, d; e",
+    "trailing separator, ",
+    "empty,,items;;here",
+    "\u2028 line separator \x85 next line \x7f delete",
+]
+
+
+def make_metadata(serializer: JHXMPSerializer, **values: str | None) -> JHXMPMetadata:
+    metadata = JHXMPMetadata(serializer=serializer)
+    for name, value in values.items():
+        setattr(metadata, name, value)
+    return metadata
+
+
+def assert_serializers_match(**values: str | None) -> None:
+    lxml_metadata = make_metadata(JHXMPSerializer.LXML, **values)
+    template_metadata = make_metadata(JHXMPSerializer.TEMPLATE, **values)
+    assert template_metadata.to_string() == lxml_metadata.to_string()
+    assert template_metadata.to_wrapped_string().encode(
+        "utf-8"
+    ) == lxml_metadata.to_wrapped_string().encode("utf-8")
+
+
+def test_template_serializer_matches_lxml_empty() -> None:
+    assert_serializers_match()
+
+
+def test_template_serializer_matches_lxml_sample(
+    sample_metadata: MetadataDataclass,
+) -> None:
+    assert_serializers_match(**vars(sample_metadata))
+
+
+@pytest.mark.parametrize("name", PROPERTY_NAMES)
+@pytest.mark.parametrize("value", TRICKY_VALUES)
+def test_template_serializer_matches_lxml(name: str, value: str) -> None:
+    assert_serializers_match(**{name: value})
+
+
+@pytest.mark.parametrize("value", TRICKY_VALUES)
+def test_template_serializer_matches_lxml_all_properties(value: str) -> None:
+    assert_serializers_match(**{name: value for name in PROPERTY_NAMES})
+
+
+def test_template_serializer_matches_lxml_every_bmp_character() -> None:
+    # Every character XML allows outside the surrogate block, in chunks
+    # small enough that one bad character is easy to spot in a failure.
+    for start in range(0x20, 0xFFFE, 0x400):
+        text = "".join(
+            chr(cp)
+            for cp in range(start, min(start + 0x400, 0xFFFE))
+            if not 0xD800 <= cp <= 0xDFFF
+        )
+        assert_serializers_match(title=f"x{text}x")
+
+
+@pytest.mark.parametrize("value", ["null \x00 byte", "bell \x07", "\ufffe", "\ud800"])
+def test_template_serializer_rejects_invalid_characters(value: str) -> None:
+    with pytest.raises(ValueError):
+        make_metadata(JHXMPSerializer.LXML, title=value).to_string()
+    with pytest.raises(ValueError):
+        make_metadata(JHXMPSerializer.TEMPLATE, title=value).to_string()
+
+
+def test_template_serializer_round_trip(sample_metadata: MetadataDataclass) -> None:
+    metadata = make_metadata(JHXMPSerializer.TEMPLATE, **vars(sample_metadata))
+    validate_xml_string(metadata.to_wrapped_string(), sample_metadata)
+    parsed = JHXMPMetadata.from_string(metadata.to_string())
+    for name in PROPERTY_NAMES:
+        assert getattr(parsed, name) == getattr(sample_metadata, name)
+
+
+def test_serializer_from_environment_variable() -> None:
+    code = (
+        "from comfyui_jh_xmp_metadata_nodes.jh_xmp_metadata import JHXMPMetadata; "
+        "print(JHXMPMetadata().serializer)"
+    )
+    for env_value, expected in (
+        ("template", "template"),
+        ("lxml", "lxml"),
+        (" TEMPLATE ", "template"),
+        ("LXML", "lxml"),
+        ("bogus", "lxml"),
+    ):
+        result = subprocess.run(
+            [sys.executable, "-c", code],
+            capture_output=True,
+            text=True,
+            check=True,
+            env={**os.environ, "JH_XMP_SERIALIZER": env_value},
+        )
+        assert result.stdout.strip() == expected
+
+
+def test_serializer_argument_overrides_default() -> None:
+    metadata = JHXMPMetadata(serializer=JHXMPSerializer.TEMPLATE)
+    assert metadata.serializer == JHXMPSerializer.TEMPLATE
+    assert JHXMPMetadata.serializer == JHXMPSerializer.from_environment()
+
+
+def test_serializer_from_environment_unknown_value(
+    monkeypatch: pytest.MonkeyPatch, caplog: pytest.LogCaptureFixture
+) -> None:
+    monkeypatch.setenv("JH_XMP_SERIALIZER", "lxml2")
+
+    assert JHXMPSerializer.from_environment() == JHXMPSerializer.LXML
+    assert "Unknown JH_XMP_SERIALIZER 'lxml2'" in caplog.text
+
+
+# endregion Template Serializer
+
+
+# region In-Place Updates
+
+
+def fresh_to_string(metadata: JHXMPMetadata) -> str:
+    return make_metadata(
+        metadata.serializer,
+        **{name: getattr(metadata, name) for name in PROPERTY_NAMES},
+    ).to_string()
+
+
+@pytest.mark.parametrize("serializer", list(JHXMPSerializer))
+def test_reassignment_updates_in_place(serializer: JHXMPSerializer) -> None:
+    metadata = make_metadata(serializer)
+    values = ["Alpha", "Beta, Gamma", "Delta; Epsilon, Zeta", None, "  "]
+
+    for i in range(10_000):
+        for name in PROPERTY_NAMES:
+            setattr(metadata, name, values[(i + len(name)) % len(values)])
+        metadata.to_string()
+
+    assert metadata.to_string() == fresh_to_string(metadata)
+    # One DigitalSourceType plus at most one element per property, and
+    # never more list items than the longest value above.
+    if serializer == JHXMPSerializer.LXML:
+        description = metadata._build_tree()[0][0]
+        assert len(description) <= 1 + len(PROPERTY_NAMES)
+        # Description + DigitalSourceType, then per property at most the
+        # property element, its container and three rdf:li items.
+        assert sum(1 for _ in description.iter()) <= 2 + 5 * len(PROPERTY_NAMES)
+    else:
+        assert len(metadata._property_fragments) <= len(PROPERTY_NAMES)
+
+
+@pytest.mark.parametrize("serializer", list(JHXMPSerializer))
+def test_reassignment_without_serializing_in_between(
+    serializer: JHXMPSerializer,
+) -> None:
+    metadata = make_metadata(serializer, title="First")
+    metadata.to_string()
+
+    for i in range(10_000):
+        metadata.title = f"Title {i}"
+        metadata.subject = f"{i}, {i + 1}" if i % 2 else None
+
+    assert len(metadata._stale_elements) <= len(PROPERTY_NAMES)
+    assert len(metadata._stale_fragments) <= len(PROPERTY_NAMES)
+    result = metadata.to_string()
+    assert result == fresh_to_string(metadata)
+    assert result.count("<dc:title>") == 1
+    assert "Title 9999" in result
+    assert "<dc:subject>" in result
+
+
+@pytest.mark.parametrize("serializer", list(JHXMPSerializer))
+def test_random_reassignment_keeps_canonical_order(
+    serializer: JHXMPSerializer,
+) -> None:
+    rng = random.Random(12345)
+    metadata = make_metadata(serializer)
+    for _ in range(2_000):
+        name = rng.choice(PROPERTY_NAMES)
+        setattr(
+            metadata,
+            name,
+            rng.choice(["x", "y & z", "a, b, c", "d; e", "", None]),
+        )
+        if rng.random() < 0.3:
+            assert metadata.to_string() == fresh_to_string(metadata)
+    assert metadata.to_string() == fresh_to_string(metadata)
+
+
+# endregion In-Place Updates
+
+
+# region Batch Packets
+
+
+def test_build_packets_broadcasts_scalars(sample_metadata: MetadataDataclass) -> None:
+    packets = JHXMPMetadata.build_packets(vars(sample_metadata), 4)
+    expected = make_metadata(
+        JHXMPSerializer.LXML, **vars(sample_metadata)
+    ).to_wrapped_string()
+    assert packets == [expected] * 4
+
+
+def test_build_packets_with_lists() -> None:
+    n = 6
+    fields: dict[str, str | list[str] | None] = {
+        "creator": "Jane Doe; John Doe",
+        "title": [f"Title {i % 3}" for i in range(n)],
+        "subject": ["a, b", None, "", "c; d", "a, b", "  "],
+        "comment": ["Same"] * n,
+        "alt_text": None,
+    }
+    packets = JHXMPMetadata.build_packets(fields, n)
+
+    assert len(packets) == n
+    for i, packet in enumerate(packets):
+        expected = make_metadata(
+            JHXMPSerializer.LXML,
+            **{
+                name: value[i] if isinstance(value, list) else value
+                for name, value in fields.items()
+            },
+        ).to_wrapped_string()
+        assert packet == expected
+
+
+def test_build_packets_ignores_extra_list_values() -> None:
+    packets = JHXMPMetadata.build_packets({"title": ["One", "Two", "Three"]}, 2)
+    assert len(packets) == 2
+    assert "Three" not in "".join(packets)
+
+
+def test_build_packets_rejects_short_lists() -> None:
+    with pytest.raises(ValueError, match="has 1 values but the batch has 2"):
+        JHXMPMetadata.build_packets({"title": ["One"]}, 2)
+
+
+def test_build_packets_rejects_unknown_properties() -> None:
+    with pytest.raises(ValueError, match="Unsupported XMP properties"):
+        JHXMPMetadata.build_packets({"headline": "Nope"}, 1)
+
+
+@pytest.mark.parametrize("serializer", list(JHXMPSerializer))
+def test_build_packets_uses_default_serializer(
+    mocker: MockerFixture,
+    monkeypatch: pytest.MonkeyPatch,
+    sample_metadata: MetadataDataclass,
+    serializer: JHXMPSerializer,
+) -> None:
+    monkeypatch.setattr(JHXMPMetadata, "serializer", serializer)
+    to_wrapped_string = mocker.spy(JHXMPMetadata, "to_wrapped_string")
+    fields: dict[str, str | list[str] | None] = dict(vars(sample_metadata))
+    fields["title"] = ["One", "Two", "One", "Two"]
+
+    packets = JHXMPMetadata.build_packets(fields, 4)
+
+    # lxml renders each distinct image once; the template shares fragments
+    assert to_wrapped_string.call_count == (
+        2 if serializer == JHXMPSerializer.LXML else 0
+    )
+    expected = []
+    for title in fields["title"]:
+        metadata = make_metadata(JHXMPSerializer.LXML, **vars(sample_metadata))
+        metadata.title = title
+        expected.append(metadata.to_wrapped_string())
+    assert packets == expected
+
+
+def test_build_packets_with_no_fields() -> None:
+    assert (
+        JHXMPMetadata.build_packets({}, 3) == [JHXMPMetadata().to_wrapped_string()] * 3
+    )
+
+
+# endregion Batch Packets
+
+
+# region Benchmarks
+
+
+@pytest.mark.benchmark
+@pytest.mark.parametrize("target_size", [1_000, 100_000, 5_000_000])
+def test_benchmark_single_pass_beats_xpath(
+    valid_xml_string: str, target_size: int
+) -> None:
+    xml_string = (
+        valid_xml_string
+        if target_size <= len(valid_xml_string)
+        else make_padded_xml_string(valid_xml_string, target_size)
+    )
+    root = etree.fromstring(xml_string, parser=etree.XMLParser())
+    assert JHXMPMetadata._fields_from_tree(root) == xpath_fields(root)
+
+    number = max(1, 200_000 // len(xml_string))
+    single_pass = min(
+        timeit.repeat(
+            lambda: JHXMPMetadata._fields_from_tree(root), number=number, repeat=5
+        )
+    )
+    nine_queries = min(
+        timeit.repeat(lambda: xpath_fields(root), number=number, repeat=5)
+    )
+    assert single_pass < nine_queries
+
+
+@pytest.mark.benchmark
+def test_benchmark_build_packets_beats_per_image(
+    monkeypatch: pytest.MonkeyPatch, sample_metadata: MetadataDataclass
+) -> None:
+    monkeypatch.setattr(JHXMPMetadata, "serializer", JHXMPSerializer.TEMPLATE)
+    n = 512
+    fields: dict[str, str | list[str] | None] = dict(vars(sample_metadata))
+    fields["title"] = [f"Image {i}" for i in range(n)]
+
+    def per_image() -> list[str]:
+        packets = []
+        for i in range(n):
+            metadata = JHXMPMetadata(serializer=JHXMPSerializer.LXML)
+            for name, value in fields.items():
+                setattr(metadata, name, value[i] if isinstance(value, list) else value)
+            packets.append(metadata.to_wrapped_string())
+        return packets
+
+    assert JHXMPMetadata.build_packets(fields, n) == per_image()
+
+    batched = min(
+        timeit.repeat(lambda: JHXMPMetadata.build_packets(fields, n), number=1)
+    )
+    one_by_one = min(timeit.repeat(per_image, number=1))
+    assert batched < one_by_one
+
+
+# endregion Benchmarks
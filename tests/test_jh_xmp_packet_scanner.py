@@ -0,0 +1,164 @@
+import timeit
+from pathlib import Path
+
+import numpy as np
+import PIL.Image
+import PIL.PngImagePlugin
+import pytest
+
+from comfyui_jh_xmp_metadata_nodes.jh_xmp_metadata import JHXMPMetadata
+from comfyui_jh_xmp_metadata_nodes.jh_xmp_packet_scanner import JHXMPPacketScanner
+
+# region Fixtures
+
+
+@pytest.fixture
+def xmp_packet() -> str:
+    metadata = JHXMPMetadata()
+    metadata.creator = "Test Creator"
+    metadata.title = "Tëst Title ✓"
+    metadata.description = "Test Description"
+    return metadata.to_wrapped_string()
+
+
+def save_with_xmp(
+    path: Path, xmp_packet: str, image: PIL.Image.Image | None = None
+) -> None:
+    if image is None:
+        image = PIL.Image.new("RGB", (32, 32), color=(255, 0, 0))
+    match path.suffix:
+        case ".png":
+            pnginfo = PIL.PngImagePlugin.PngInfo()
+            pnginfo.add_text("XML:com.adobe.xmp", xmp_packet)
+            image.save(path, pnginfo=pnginfo)
+        case ".tiff":
+            image.save(path, tiffinfo={700: xmp_packet.encode("utf-8")})
+        case _:
+            image.save(path, xmp=xmp_packet.encode("utf-8"))
+
+
+# endregion Fixtures
+
+# region Tests
+
+
+@pytest.mark.parametrize("extension", [".png", ".jpeg", ".webp", ".tiff"])
+def test_scan_file_matches_pillow(
+    tmp_path: Path, xmp_packet: str, extension: str
+) -> None:
+    path = tmp_path / f"image{extension}"
+    save_with_xmp(path, xmp_packet)
+
+    packet = JHXMPPacketScanner.scan_file(path)
+
+    assert packet == xmp_packet.encode("utf-8")
+    with PIL.Image.open(path) as image:
+        assert packet == image.info["xmp"]
+
+
+def test_scan_file_unknown_format(tmp_path: Path, xmp_packet: str) -> None:
+    path = tmp_path / "data.bin"
+    path.write_bytes(b"\x00\xff" * 1000 + xmp_packet.encode("utf-8") + b"\x00" * 10)
+
+    assert JHXMPPacketScanner.scan_file(path) == xmp_packet.encode("utf-8")
+    assert JHXMPPacketScanner.scan_file(str(path)) == xmp_packet.encode("utf-8")
+
+
+def test_scan_file_returns_first_packet(tmp_path: Path, xmp_packet: str) -> None:
+    second_packet = xmp_packet.replace("Test Creator", "Someone Else")
+    path = tmp_path / "data.bin"
+    path.write_bytes(xmp_packet.encode("utf-8") + second_packet.encode("utf-8"))
+
+    assert JHXMPPacketScanner.scan_file(path) == xmp_packet.encode("utf-8")
+
+
+def test_scan_file_without_packet(tmp_path: Path) -> None:
+    path = tmp_path / "image.png"
+    PIL.Image.new("RGB", (32, 32)).save(path)
+
+    assert JHXMPPacketScanner.scan_file(path) is None
+
+
+def test_scan_file_empty(tmp_path: Path) -> None:
+    path = tmp_path / "empty.png"
+    path.touch()
+
+    assert JHXMPPacketScanner.scan_file(path) is None
+
+
+def test_scan_file_nonexistent(tmp_path: Path) -> None:
+    with pytest.raises(FileNotFoundError):
+        JHXMPPacketScanner.scan_file(tmp_path / "nonexistent.png")
+
+
+def test_scan_bytes_bare_xmpmeta() -> None:
+    xmpmeta = b'<x:xmpmeta xmlns:x="adobe:ns:meta/"><rdf:RDF/></x:xmpmeta>'
+    assert JHXMPPacketScanner.scan_bytes(b"junk" + xmpmeta + b"junk") == xmpmeta
+
+
+@pytest.mark.parametrize(
+    "data",
+    [
+        b"",
+        b"no packet here",
+        b'<?xpacket begin="" id="W5M0MpCehiHzreSzNTczkc9d"?>',
+        b'<?xpacket begin="" id="W5M0MpCehiHzreSzNTczkc9d"?><?xpacket end="w"',
+        b'<x:xmpmeta xmlns:x="adobe:ns:meta/">',
+    ],
+)
+def test_scan_bytes_incomplete(data: bytes) -> None:
+    assert JHXMPPacketScanner.scan_bytes(data) is None
+
+
+def test_scan_bytes_truncated_wrapper_falls_back_to_xmpmeta() -> None:
+    xmpmeta = b'<x:xmpmeta xmlns:x="adobe:ns:meta/"></x:xmpmeta>'
+    data = b'<?xpacket begin="" id="W5M0MpCehiHzreSzNTczkc9d"?>' + xmpmeta
+    assert JHXMPPacketScanner.scan_bytes(data) == xmpmeta
+
+
+def test_scanned_packet_parses(tmp_path: Path, xmp_packet: str) -> None:
+    path = tmp_path / "image.jpeg"
+    save_with_xmp(path, xmp_packet)
+
+    packet = JHXMPPacketScanner.scan_file(path)
+    metadata = JHXMPMetadata.from_string(packet.decode("utf-8"))
+
+    assert metadata.creator == "Test Creator"
+    assert metadata.title == "Tëst Title ✓"
+
+
+# endregion Tests
+
+# region Benchmarks
+
+
+@pytest.mark.benchmark
+def test_benchmark_scan_beats_pillow(tmp_path: Path, xmp_packet: str) -> None:
+    # Noise doesn't compress, so the packet sits behind a realistic amount
+    # of image data (WebP stores it at the end of the file).
+    noise = PIL.Image.fromarray(
+        np.random.default_rng(0).integers(0, 256, (384, 384, 3), dtype=np.uint8)
+    )
+    paths: list[Path] = []
+    for i in range(40):
+        path = tmp_path / f"image_{i}.webp"
+        save_with_xmp(path, xmp_packet, noise)
+        paths.append(path)
+
+    def scan() -> list[bytes | None]:
+        return [JHXMPPacketScanner.scan_file(path) for path in paths]
+
+    def pillow() -> list[bytes | None]:
+        packets = []
+        for path in paths:
+            with PIL.Image.open(path) as image:
+                packets.append(image.info.get("xmp"))
+        return packets
+
+    assert scan() == pillow()
+    assert min(timeit.repeat(scan, number=1, repeat=3)) < min(
+        timeit.repeat(pillow, number=1, repeat=3)
+    )
+
+
+# endregion Benchmarks